@@ -1,8 +1,11 @@
 from django.contrib import admin
 
-from .models import User, Listing, Comment
+from .models import User, Listing, Comment, Notification, Job, MaxBid
 # Register your models here.
 
 admin.site.register(User)
 admin.site.register(Listing)
 admin.site.register(Comment)
+admin.site.register(Notification)
+admin.site.register(Job)
+admin.site.register(MaxBid)
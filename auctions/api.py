@@ -0,0 +1,258 @@
+'''
+read-only JSON API
+
+Rows are read with values() into plain dicts, only for the fields the
+client asked for. Responses about a single listing carry an ETag and
+Last-Modified derived from the listing's cache version, which every write
+to the listing, its bids or its comments bumps, so an unchanged resource
+is answered with 304 without touching the database.
+'''
+
+import hashlib
+import time
+from datetime import datetime, timezone
+
+from django.core.files.storage import default_storage
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import condition, require_GET
+
+from .caching import listing_version, listing_versions
+from .ids import parse_id
+from .images import thumbnail_url
+from .models import Bid, Comment, Listing
+from .pagination import InvalidCursor, keyset_paginate
+
+PER_PAGE = 50
+MAX_BATCH = 100
+
+def image_url(row, variant):
+    '''
+    the same fallbacks as Listing.card_image and Listing.detail_image
+    '''
+    if row["thumbnail_key"]:
+        return thumbnail_url(row["thumbnail_key"], variant)
+    if variant != "card" and row["image"]:
+        return default_storage.url(row["image"])
+    return row["imageURL"]
+
+
+# field name -> (columns read, function building the value from the row)
+LISTING_FIELDS = {
+    "id": (("id",), lambda row: row["id"]),
+    "title": (("title",), lambda row: row["title"]),
+    "description": (("description",), lambda row: row["description"]),
+    "category": (("category",), lambda row: row["category"]),
+    "starting_bid": (("starting_bid",), lambda row: row["starting_bid"]),
+    "current_bid": (("current_bid",), lambda row: row["current_bid"]),
+    "price": (("price",), lambda row: row["price"]),
+    "image": (("thumbnail_key", "image", "imageURL"), lambda row: image_url(row, "detail")),
+    "thumbnail": (("thumbnail_key", "imageURL"), lambda row: image_url(row, "card")),
+    "created": (("created",), lambda row: row["created"]),
+    "ends_at": (("ends_at",), lambda row: row["ends_at"]),
+    "active": (("active",), lambda row: row["active"]),
+    "bid_count": (("bid_count",), lambda row: row["bid_count"]),
+    "last_bid_at": (("last_bid_at",), lambda row: row["last_bid_at"]),
+    "view_count": (("view_count",), lambda row: row["view_count"]),
+    "watcher_count": (("watcher_count",), lambda row: row["watcher_count"]),
+    "seller": (("seller__username",), lambda row: row["seller__username"]),
+    "highest_bidder": (("highest_bidder__username",), lambda row: row["highest_bidder__username"]),
+    "winner": (("winner__username",), lambda row: row["winner__username"]),
+    "final_price": (("final_price",), lambda row: row["final_price"]),
+    "closed_at": (("closed_at",), lambda row: row["closed_at"]),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def compact(data, status=200):
+    return JsonResponse(data, status=status, json_dumps_params={"separators": (",", ":")})
+
+
+def api_view(view):
+    '''
+    GET only, with BadRequest turned into a JSON 400
+    '''
+    @require_GET
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as e:
+            return compact({"error": str(e)}, status=400)
+        except InvalidCursor:
+            return compact({"error": "Invalid cursor."}, status=400)
+    wrapper.__name__ = view.__name__
+    wrapper.__doc__ = view.__doc__
+    return wrapper
+
+
+def selected_fields(request):
+    requested = request.GET.get("fields")
+    if not requested:
+        return list(LISTING_FIELDS)
+    fields = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in LISTING_FIELDS]
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}.")
+    return fields
+
+
+def listing_columns(fields, *extra):
+    columns = dict.fromkeys(extra)
+    for name in fields:
+        columns.update(dict.fromkeys(LISTING_FIELDS[name][0]))
+    return list(columns)
+
+
+def serialize(row, fields):
+    return {name: LISTING_FIELDS[name][1](row) for name in fields}
+
+
+def page_response(request, page, results):
+    next_url = None
+    if page.has_next:
+        query = request.GET.copy()
+        query["cursor"] = page.next_cursor
+        next_url = f"{request.path}?{query.urlencode()}"
+    return compact({"results": results, "next": next_url})
+
+
+def etag_matches(etag, if_none_match):
+    '''
+    whether an If-None-Match header names ``etag``; a GET compares weakly,
+    so W/ prefixes are ignored
+    '''
+    tags = parse_etags(if_none_match)
+    if tags == ["*"]:
+        return True
+    strip = lambda tag: tag[2:] if tag.startswith("W/") else tag  # noqa: E731
+    return strip(etag) in map(strip, tags)
+
+
+def listing_etag(request, listing_id, *args, **kwargs):
+    # field selection changes the body, so it is part of the tag
+    return f"{listing_id}-{listing_version(listing_id)}-{request.GET.urlencode()}"
+
+
+def last_modified(version):
+    '''
+    Last-Modified only has whole seconds, so it is left out while a write
+    in the same second could still follow unnoticed; the ETag still works
+    '''
+    seconds = version // 10**9
+    if seconds >= int(time.time()):
+        return None
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+def listing_last_modified(request, listing_id, *args, **kwargs):
+    return last_modified(listing_version(listing_id))
+
+
+listing_condition = condition(etag_func=listing_etag, last_modified_func=listing_last_modified)
+
+
+@api_view
+def listings(request):
+    '''
+    active listings, newest first; ?category= and ?status=closed|all
+    narrow it down
+    '''
+    fields = selected_fields(request)
+    status = request.GET.get("status", "active")
+    if status not in ("active", "closed", "all"):
+        raise BadRequest("status must be active, closed or all.")
+
+    queryset = Listing.objects.all()
+    if status != "all":
+        queryset = queryset.filter(active=status == "active")
+    category = request.GET.get("category")
+    if category:
+        if category not in Listing.Category.values:
+            raise BadRequest("Unknown category.")
+        queryset = queryset.filter(category=category)
+
+    queryset = queryset.values(*listing_columns(fields, "id", "created"))
+    page = keyset_paginate(queryset, ("-created", "-id"), request.GET.get("cursor"), PER_PAGE)
+    return page_response(request, page, [serialize(row, fields) for row in page])
+
+
+@api_view
+@listing_condition
+def listing(request, listing_id):
+    fields = selected_fields(request)
+    row = Listing.objects.filter(pk=listing_id).values(*listing_columns(fields)).first()
+    if row is None:
+        return compact({"error": "No such listing."}, status=404)
+    return compact(serialize(row, fields))
+
+
+@api_view
+def batch(request):
+    '''
+    many listings by id in one primary key lookup: ?ids=1,2,3
+    '''
+    fields = selected_fields(request)
+    ids = [parse_id(i.strip()) for i in request.GET.get("ids", "").split(",") if i.strip()]
+    if None in ids:
+        raise BadRequest("ids must be a comma separated list of listing ids.")
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise BadRequest("No ids given.")
+    if len(ids) > MAX_BATCH:
+        raise BadRequest(f"At most {MAX_BATCH} ids per request.")
+
+    versions = listing_versions(ids)
+    etag = '"%s"' % hashlib.md5(
+        repr((sorted(versions.items()), request.GET.urlencode())).encode()
+    ).hexdigest()
+    if etag_matches(etag, request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+        response["ETag"] = etag
+        return response
+
+    rows = Listing.objects.filter(pk__in=ids).values(*listing_columns(fields, "id"))
+    found = {row["id"]: serialize(row, fields) for row in rows}
+    response = compact({
+        "results": [found[i] for i in ids if i in found],
+        "missing": [i for i in ids if i not in found],
+    })
+    response["ETag"] = etag
+    modified = last_modified(max(versions.values()))
+    if modified:
+        response["Last-Modified"] = http_date(modified.timestamp())
+    return response
+
+
+@api_view
+@listing_condition
+def bids(request, listing_id):
+    '''
+    bids on a listing by amount, highest first; when a maximum is matched
+    both bids have the same amount and the later one, which leads, is first
+    '''
+    queryset = Bid.objects.filter(listing_id=listing_id).values("id", "amount", "placed", "automatic", "user__username")
+    page = keyset_paginate(queryset, ("-amount", "-id"), request.GET.get("cursor"), PER_PAGE)
+    return page_response(request, page, [
+        {
+            "id": row["id"], "amount": row["amount"], "placed": row["placed"], "automatic": row["automatic"],
+            "user": row["user__username"],
+        }
+        for row in page
+    ])
+
+
+@api_view
+@listing_condition
+def comments(request, listing_id):
+    '''
+    comments on a listing, newest first
+    '''
+    queryset = Comment.objects.filter(listing_id=listing_id).values("id", "datetime", "content", "author__username")
+    page = keyset_paginate(queryset, ("-datetime", "-id"), request.GET.get("cursor"), PER_PAGE)
+    return page_response(request, page, [
+        {"id": row["id"], "datetime": row["datetime"], "content": row["content"], "author": row["author__username"]}
+        for row in page
+    ])
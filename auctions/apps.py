@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class AuctionsConfig(AppConfig):
     name = 'auctions'
+
+    def ready(self):
+        from . import checks, search, signals  # noqa: F401
+
+        # altering auctions_listing on SQLite rebuilds it and drops the
+        # search triggers, so put them back after every migrate
+        post_migrate.connect(search.ensure_installed, sender=self)
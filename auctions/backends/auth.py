@@ -0,0 +1,45 @@
+'''
+authentication backend that keeps signed in users in the cache
+
+AuthenticationMiddleware loads request.user from the database on every
+request. This backend keeps the row in the session cache instead; the
+signal handlers in auctions/signals.py drop it whenever the user is saved
+(a password change, last_login, an admin edit), deleted or logs out, so
+session verification always sees the current password hash.
+
+They drop it from the cache of the process that made the change. With a
+per-process cache (local memory) every other process keeps the old row,
+and accepts sessions signed with the old password or of a deactivated
+user, for up to USER_CACHE_TIMEOUT seconds. More than one process
+therefore needs a shared SESSION_CACHE_ALIAS; ``check --deploy`` warns
+about a local memory one (see auctions/checks.py).
+'''
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+
+
+def user_cache():
+    return caches[settings.SESSION_CACHE_ALIAS]
+
+
+def user_cache_key(user_id):
+    return f"user:{user_id}"
+
+
+def forget_user(user_id):
+    user_cache().delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = user_cache().get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                user_cache().set(key, user, getattr(settings, "USER_CACHE_TIMEOUT", 300))
+            return user
+        return user if self.user_can_authenticate(user) else None
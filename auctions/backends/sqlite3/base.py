@@ -0,0 +1,50 @@
+'''
+SQLite backend tuned for a web server
+
+Adds two OPTIONS to the stock backend:
+
+    "pragmas": {"journal_mode": "wal", "busy_timeout": 5000, ...}
+        run on every new connection, in order
+    "read_only": True
+        the connection refuses writes (PRAGMA query_only)
+
+Transactions start with BEGIN IMMEDIATE, so a transaction that reads and
+then writes takes the write lock up front and waits out busy_timeout,
+instead of failing with "database is locked" when it tries to upgrade.
+
+The price is that every atomic() on a writable connection holds the
+write lock, even one that turns out only to read, and queues behind
+other writers for it. The backend can't tell the two apart when the
+block opens. auctions.routers sends reads made outside a transaction to
+the read-only alias, so atomic() on the primary is left to code that
+writes; a read that needs a consistent snapshot should open its block
+on the read-only alias, where a plain deferred BEGIN is used.
+'''
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.pragmas = params.pop("pragmas", {})
+        self.read_only = params.pop("read_only", False)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            # journal_mode is a property of the file; only writers set it
+            if self.read_only and name == "journal_mode":
+                continue
+            conn.execute(f"PRAGMA {name} = {value}")
+        if self.read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.read_only:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute("BEGIN IMMEDIATE")
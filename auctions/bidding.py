@@ -0,0 +1,132 @@
+'''
+bid placement and proxy bidding
+
+Every bid is a maximum: the most the bidder will pay. The engine bids on
+their behalf, one step of the increment ladder above whoever they are up
+against and never past their maximum, so nobody has to come back to the
+form each time they are outbid. A new maximum is resolved against the
+leader's in one transaction:
+
+- the listing is locked and read with its price and leader, and the
+  maximums that can still take part are read in one query;
+- the contest is settled in Python, and only its outcome is written: the
+  listing's new price (current_bid and the stored price) and leader in
+  one UPDATE, and at most two Bid rows, the losing maximum and the
+  winning price.
+
+After every resolution only the leader's maximum can lie above the price,
+since every other one was beaten, so a new maximum only ever competes with
+that one. The write lock is held from the first statement (BEGIN IMMEDIATE
+on SQLite, SELECT ... FOR UPDATE elsewhere), so concurrent bids on a
+listing are resolved one after the other and never both win.
+'''
+
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .caching import invalidate_listing
+from .live import listing_changed
+from .models import Bid, Listing, MaxBid
+
+# (prices below, increment) from the bottom up; the last applies above all
+INCREMENTS = ((10, 1), (100, 5), (1000, 10), (5000, 50), (None, 100))
+
+Outcome = namedtuple("Outcome", "price leading")
+
+
+class BidRejected(Exception):
+    pass
+
+
+def increment(price):
+    '''
+    the smallest raise over ``price``
+    '''
+    for below, step in INCREMENTS:
+        if below is None or price < below:
+            return step
+
+
+def open_for_bids(now):
+    '''
+    condition matching listings still taking bids; an expired auction
+    stops taking them even before the sweeper has closed it
+    '''
+    return Q(active=True) & (Q(ends_at__isnull=True) | Q(ends_at__gt=now))
+
+
+def save_maximum(listing_id, user, amount, current, now):
+    if current is None:
+        MaxBid.objects.create(listing_id=listing_id, user=user, amount=amount, placed=now)
+    elif amount > current.amount:
+        MaxBid.objects.filter(pk=current.pk).update(amount=amount, placed=now)
+
+
+def place_bid(listing_id, user, amount):
+    '''
+    Bid up to ``amount`` for ``user`` and return the Outcome: the price
+    afterwards and whether the user leads. Raise BidRejected if the
+    listing is closed or the user's own, or if the amount does not beat
+    the current price.
+    '''
+    now = timezone.now()
+    with transaction.atomic():
+        listing = (
+            Listing.objects.filter(open_for_bids(now), pk=listing_id)
+            .select_for_update(of=("self",))
+            .values("price", "seller_id", "highest_bidder_id", "highest_bidder__username")
+            .first()
+        )
+        if listing is None:
+            raise BidRejected("This listing is closed.")
+        if listing["seller_id"] == user.pk:
+            raise BidRejected("You can't bid on your own listing.")
+        price = listing["price"]
+        leader = listing["highest_bidder_id"]
+        maximums = {
+            maximum.user_id: maximum
+            for maximum in MaxBid.objects.filter(Q(user=user) | Q(amount__gt=price), listing_id=listing_id)
+        }
+        mine = maximums.get(user.pk)
+
+        if leader == user.pk:
+            # the leader raising their maximum moves nothing
+            save_maximum(listing_id, user, amount, mine, now)
+            return Outcome(price, True)
+        if amount <= price:
+            raise BidRejected("Your bid must be higher than the current bid.")
+        save_maximum(listing_id, user, amount, mine, now)
+
+        if leader is None:
+            winner, new_price = user.pk, min(amount, price + increment(price))
+            bids = [Bid(user=user, amount=new_price, automatic=new_price != amount)]
+        else:
+            # bids placed before maximums existed count as maximums
+            held = maximums[leader].amount if leader in maximums else price
+            if amount > held:
+                winner, new_price = user.pk, min(amount, held + increment(held))
+                bids = [Bid(user_id=leader, amount=held, automatic=True)] if held > price else []
+                bids.append(Bid(user=user, amount=new_price, automatic=new_price != amount))
+            else:
+                # the earlier of two equal maximums wins
+                winner, new_price = leader, min(held, amount + increment(amount))
+                bids = [Bid(user=user, amount=amount), Bid(user_id=leader, amount=new_price, automatic=True)]
+
+        for bid in bids:
+            bid.listing_id, bid.placed = listing_id, now
+        Listing.objects.filter(pk=listing_id).update(
+            current_bid=new_price,
+            price=new_price,
+            highest_bidder_id=winner,
+            bid_count=F("bid_count") + len(bids),
+            last_bid_at=now,
+        )
+        # bulk_create sends no post_save, so the cached pages are retired here
+        Bid.objects.bulk_create(bids)
+        invalidate_listing(listing_id)
+        bidder = user.username if winner == user.pk else listing["highest_bidder__username"]
+        listing_changed(listing_id, id=listing_id, price=new_price, bidder=bidder, active=True)
+    return Outcome(new_price, winner == user.pk)
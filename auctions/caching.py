@@ -0,0 +1,67 @@
+'''
+versioned cache keys for listings
+
+Every listing has a version number kept in the cache. Anything rendered
+from a listing is cached under a key that includes the version, so a write
+only has to bump the version to retire every cached copy at once.
+'''
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _version_key(listing_id):
+    return f"listing:{listing_id}:version"
+
+
+def listing_version(listing_id):
+    '''
+    Return the current version of a listing. A missing version (first use
+    or evicted) is seeded from the clock, so it can never fall back to a
+    number that old entries were stored under.
+    '''
+    key = _version_key(listing_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def listing_versions(listing_ids):
+    '''
+    return {listing id: version} for many listings with one cache round trip
+    '''
+    keys = {_version_key(listing_id): listing_id for listing_id in listing_ids}
+    found = cache.get_many(keys)
+    versions = {keys[key]: version for key, version in found.items()}
+    for listing_id in listing_ids:
+        if listing_id not in versions:
+            versions[listing_id] = listing_version(listing_id)
+    return versions
+
+
+def bump_listing_version(listing_id):
+    key = _version_key(listing_id)
+    cache.set(key, max(time.time_ns(), (cache.get(key) or 0) + 1), None)
+
+
+def invalidate_listing(listing_id):
+    '''
+    Bump the listing version once the current transaction commits, so
+    readers never re-cache data from before the write under the new version.
+    '''
+    transaction.on_commit(lambda: bump_listing_version(listing_id))
+
+
+def listing_cache_key(listing_id, name, version=None):
+    if version is None:
+        version = listing_version(listing_id)
+    return f"listing:{listing_id}:{version}:{name}"
+
+
+def listing_cache_timeout():
+    return getattr(settings, "LISTING_CACHE_TIMEOUT", 300)
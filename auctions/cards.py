@@ -0,0 +1,57 @@
+'''
+listing cards rendered once per listing version
+
+The index, category, search and watchlist pages show the same card for a
+listing to every visitor, so each card is cached under the listing's
+version (see auctions/caching.py). A page fetches all its versions and
+then all its cards with one get_many each, renders only the cards that
+were missing and joins the rest. The view and watcher counts on a card
+are as of its render; a count going up does not retire the card, so they
+lag by up to LISTING_CACHE_TIMEOUT plus COUNTER_FLUSH_INTERVAL seconds
+(the card says so).
+'''
+
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+from .caching import listing_cache_key, listing_cache_timeout, listing_versions
+
+CARD_TEMPLATE = "auctions/listingCard.html"
+
+
+def card_name(listing, starting_price):
+    # the badge is per user, so watched cards are a variant of their own
+    name = "card:starting" if starting_price else "card"
+    if getattr(listing, "is_watched", False):
+        name += ":watched"
+    return name
+
+
+def render_cards(listings, starting_price=False):
+    '''
+    return the joined card markup of ``listings``; ``starting_price``
+    shows the starting bid instead of the current price
+    '''
+    listings = list(listings)
+    versions = listing_versions([listing.id for listing in listings])
+    keys = [
+        listing_cache_key(listing.id, card_name(listing, starting_price), versions[listing.id])
+        for listing in listings
+    ]
+    cached = cache.get_many(keys)
+
+    template = None
+    rendered = {}
+    cards = []
+    for listing, key in zip(listings, keys):
+        card = cached.get(key)
+        if card is None:
+            if template is None:
+                template = get_template(CARD_TEMPLATE)
+            card = template.render({"listing": listing, "starting_price": starting_price})
+            rendered[key] = card
+        cards.append(card)
+    if rendered:
+        cache.set_many(rendered, listing_cache_timeout())
+    return mark_safe("".join(cards))
@@ -0,0 +1,41 @@
+'''
+system checks for settings the app relies on
+'''
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+
+
+@register(Tags.caches, deploy=True)
+def check_session_cache(app_configs, **kwargs):
+    '''
+    signed in users are cached next to the sessions (see
+    auctions/backends/auth.py), so that cache must be shared
+    '''
+    alias = settings.SESSION_CACHE_ALIAS
+    if not isinstance(caches[alias], LocMemCache):
+        return []
+    return [Warning(
+        f"The '{alias}' cache, which holds sessions and signed in users, is local to each process.",
+        hint="Use a cache shared by every process (memcached, redis), or a password change, "
+             "deactivation or logout is only seen by the process that served it.",
+        id="auctions.W001",
+    )]
+
+
+@register(Tags.caches, deploy=True)
+def check_default_cache(app_configs, **kwargs):
+    '''
+    listing versions live in the default cache (see auctions/caching.py);
+    a process that misses another's bump keeps serving the old pages
+    '''
+    if not isinstance(caches["default"], LocMemCache):
+        return []
+    return [Warning(
+        "The 'default' cache, which holds the listing versions, is local to each process.",
+        hint="Use a cache shared by every process (memcached, redis), or a bid or comment only "
+             "retires the cached pages of the process that served it.",
+        id="auctions.W002",
+    )]
@@ -0,0 +1,18 @@
+'''
+template context shared by every page
+'''
+
+from .notifications import unread_count
+
+
+def notifications(request):
+    '''
+    the signed in user's unread notification count for the badge, only
+    looked up when a template shows it
+    '''
+    def count():
+        user = getattr(request, "user", None)
+        if user is None or not user.is_authenticated:
+            return 0
+        return unread_count(user)
+    return {"unread_notifications": count}
@@ -0,0 +1,129 @@
+'''
+write-behind listing counters
+
+Counting every page view and watch as it happens would make each of them
+a write queued behind SQLite's single writer. Instead each process adds
+them up in memory and a background thread writes the totals every
+COUNTER_FLUSH_INTERVAL seconds: one ``UPDATE ... SET n = n + ?`` per
+listing and counter, executed as a batch in one transaction. Increments
+commute, so any number of threads and processes can buffer side by side.
+A crash loses at most the counts of the interval in progress; a process
+that exits normally flushes them first.
+
+Each flush bumps the cache version of the listings it wrote, so cached
+cards and pages and the API validators pick up the new counts.
+'''
+
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+
+from .caching import bump_listing_version
+from .models import Listing
+
+logger = logging.getLogger(__name__)
+
+
+def flush_interval():
+    return getattr(settings, "COUNTER_FLUSH_INTERVAL", 5.0)
+
+
+class CounterBuffer:
+    '''
+    increments of integer ``fields`` of ``model`` rows, held until flushed;
+    ``written`` is called with the pk of each row a flush changed
+    '''
+    def __init__(self, model, fields, written=None):
+        self.model = model
+        self.fields = fields
+        self.written = written
+        self.lock = threading.Lock()
+        self.pending = defaultdict(int)
+        self.flusher = None
+        if hasattr(os, "register_at_fork"):
+            # the parent flushes what it buffered; the child starts empty
+            os.register_at_fork(after_in_child=self._forget)
+
+    def _forget(self):
+        self.lock = threading.Lock()
+        self.pending = defaultdict(int)
+        self.flusher = None
+
+    def add(self, field, pk, amount=1):
+        if field not in self.fields:
+            raise ValueError(f"{field} is not a buffered counter")
+        with self.lock:
+            self.pending[(field, pk)] += amount
+            if self.flusher is None:
+                self._start()
+
+    def _start(self):
+        interval = flush_interval()
+        if not interval:
+            # only explicit calls of flush() write the counts
+            self.flusher = False
+            return
+        self.flusher = threading.Thread(target=self._run, args=(interval,), daemon=True)
+        self.flusher.start()
+        atexit.register(self.flush)
+
+    def _run(self, interval):
+        while True:
+            time.sleep(interval)
+            self.flush()
+            close_old_connections()
+
+    def flush(self):
+        '''
+        write the buffered increments and return how many rows changed
+        '''
+        with self.lock:
+            pending, self.pending = self.pending, defaultdict(int)
+        by_field = defaultdict(list)
+        for (field, pk), amount in pending.items():
+            if amount:
+                by_field[field].append((amount, pk))
+        if not by_field:
+            return 0
+        try:
+            self.write(by_field)
+        except Exception:
+            logger.exception("could not write %s counters, keeping them for the next flush", self.model.__name__)
+            with self.lock:
+                for key, amount in pending.items():
+                    self.pending[key] += amount
+            return 0
+        if self.written:
+            for pk in {pk for rows in by_field.values() for _, pk in rows}:
+                self.written(pk)
+        return sum(len(rows) for rows in by_field.values())
+
+    def write(self, by_field):
+        connection = connections[router.db_for_write(self.model)]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        pk = qn(self.model._meta.pk.column)
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            for field, rows in by_field.items():
+                column = qn(self.model._meta.get_field(field).column)
+                cursor.executemany(f"UPDATE {table} SET {column} = {column} + %s WHERE {pk} = %s", rows)
+
+
+listing_counters = CounterBuffer(Listing, ("view_count", "watcher_count"), written=bump_listing_version)
+
+
+def count_view(listing_id):
+    listing_counters.add("view_count", listing_id)
+
+
+def count_watchers(listing_id, change):
+    '''
+    count ``change`` watchers once the current transaction commits
+    '''
+    transaction.on_commit(lambda: listing_counters.add("watcher_count", listing_id, change))
@@ -0,0 +1,49 @@
+'''
+closing auctions whose end time has passed
+
+Expired listings are found through a partial index holding only open
+listings with an end time, oldest deadline first, and closed a bounded
+batch per transaction so the write lock is never held for long. Each
+batch is settled like a seller's close (see auctions/settlement.py).
+'''
+
+import time
+
+from django.utils import timezone
+
+from .models import Listing
+from .settlement import settle_listings
+
+
+def expired_listings(now):
+    return Listing.objects.filter(active=True, ends_at__isnull=False, ends_at__lte=now)
+
+
+def close_expired_batch(batch_size=500, now=None):
+    '''
+    Close up to ``batch_size`` expired listings and return how many were
+    closed.
+    '''
+    now = now or timezone.now()
+    ids = list(expired_listings(now).order_by("ends_at", "id").values_list("id", flat=True)[:batch_size])
+    if not ids:
+        return 0
+
+    # a seller may have closed some of them in the meantime
+    return len(settle_listings(ids, now))
+
+
+def sweep(batch_size=500, pause=0.0, now=None):
+    '''
+    Close every listing expired at ``now``, one batch at a time, sleeping
+    ``pause`` seconds between batches to let other writers in.
+    '''
+    now = now or timezone.now()
+    total = 0
+    while True:
+        closed = close_expired_batch(batch_size, now)
+        if not closed:
+            return total
+        total += closed
+        if pause:
+            time.sleep(pause)
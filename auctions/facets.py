@@ -0,0 +1,61 @@
+'''
+cached active-listing counts per category
+
+Each category's count lives under its own cache key so a new listing is
+one atomic increment. Closing, editing or deleting a listing drops the
+counts instead, and the next reader recomputes them with one aggregate
+over the active-listings index. The timeout bounds any drift.
+'''
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .models import Listing
+
+
+def _key(category):
+    return f"category-count:{category}"
+
+
+def _timeout():
+    return getattr(settings, "CATEGORY_COUNTS_TIMEOUT", 300)
+
+
+def category_counts():
+    '''
+    return {category value: number of active listings}
+    '''
+    keys = {_key(value): value for value in Listing.Category.values}
+    cached = cache.get_many(keys)
+    if len(cached) == len(keys):
+        return {keys[key]: count for key, count in cached.items()}
+
+    counts = dict.fromkeys(Listing.Category.values, 0)
+    rows = (
+        Listing.objects.filter(active=True)
+        .values("category")
+        .annotate(count=Count("id"))
+        .order_by()
+    )
+    for row in rows:
+        counts[row["category"]] = row["count"]
+    cache.set_many({_key(value): count for value, count in counts.items()}, _timeout())
+    return counts
+
+
+def _incr(category):
+    try:
+        cache.incr(_key(category))
+    except ValueError:
+        # not cached; the next read recomputes it
+        pass
+
+
+def listing_opened(category):
+    transaction.on_commit(lambda: _incr(category))
+
+
+def invalidate_category_counts():
+    transaction.on_commit(lambda: cache.delete_many([_key(value) for value in Listing.Category.values]))
@@ -0,0 +1,36 @@
+'''
+row ids taken from URLs and forms
+
+SQLite integers are 64 bit. A larger id does not simply match nothing,
+the driver raises OverflowError, so ids from outside are checked against
+the range before they reach a query.
+'''
+
+MAX_ID = 2 ** 63 - 1
+
+
+def parse_id(value):
+    '''
+    ``value`` as a positive id, or None if it isn't one
+    '''
+    value = str(value or "")
+    if not value.isdigit() or len(value) > len(str(MAX_ID)):
+        return None
+    value = int(value)
+    return value if 1 <= value <= MAX_ID else None
+
+
+class IdConverter:
+    '''
+    path converter for ids; anything out of range is a 404
+    '''
+    regex = "[0-9]+"
+
+    def to_python(self, value):
+        value = parse_id(value)
+        if value is None:
+            raise ValueError("not an id")
+        return value
+
+    def to_url(self, value):
+        return str(value)
@@ -0,0 +1,160 @@
+'''
+uploaded listing images and their thumbnails
+
+Uploads are stored under a name derived from their content. Thumbnails
+are rendered by a background job (see auctions/jobs.py) after the listing
+is committed, so the decoding and resizing never holds up a request or
+the server's GIL; make_thumbnails backfills in a process pool. Each
+variant is written once under a name hashed from the original and the
+variant sizes, so it can be cached by browsers forever; the listing's
+thumbnail_key is set when they are all on disk.
+
+Pillow is only imported where images are actually handled.
+'''
+
+import hashlib
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+
+# name -> (width, height) the image is fitted into
+VARIANTS = {
+    "card": (320, 240),
+    "detail": (800, 600),
+    "retina": (1600, 1200),
+}
+THUMBNAIL_DIR = "thumbs"
+ORIGINAL_DIR = "listings"
+FORMATS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def max_upload_size():
+    return getattr(settings, "MAX_IMAGE_UPLOAD_SIZE", 5 * 1024 * 1024)
+
+
+def validate_image(upload):
+    '''
+    check that ``upload`` is an image we can thumbnail, return its extension
+    '''
+    try:
+        from PIL import Image
+    except ImportError:
+        raise ValidationError("Image uploads are not available.")
+
+    if upload.size > max_upload_size():
+        raise ValidationError(f"Images can be at most {max_upload_size() // (1024 * 1024)} MB.")
+    try:
+        with Image.open(upload) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        raise ValidationError("Upload a valid image.")
+    finally:
+        upload.seek(0)
+    if image_format not in FORMATS:
+        raise ValidationError("Upload a JPEG, PNG, GIF or WebP image.")
+    return FORMATS[image_format]
+
+
+def store_original(upload, extension):
+    '''
+    save ``upload`` under a name hashed from its content and return the
+    name; identical uploads share one file
+    '''
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    name = f"{ORIGINAL_DIR}/{digest.hexdigest()[:32]}.{extension}"
+    if not default_storage.exists(name):
+        upload.seek(0)
+        name = default_storage.save(name, upload)
+    return name
+
+
+def thumbnail_name(key, variant):
+    return f"{THUMBNAIL_DIR}/{key}-{variant}.jpg"
+
+
+def thumbnail_url(key, variant):
+    return default_storage.url(thumbnail_name(key, variant))
+
+
+def render_thumbnails(source, media_root):
+    '''
+    Write every variant of the image at ``source`` below ``media_root`` and
+    return their key. Runs in a worker process, so it only touches files.
+    '''
+    from PIL import Image, ImageOps
+
+    with open(source, "rb") as f:
+        data = f.read()
+    key = hashlib.sha256(data + repr(sorted(VARIANTS.items())).encode()).hexdigest()[:32]
+    os.makedirs(os.path.join(media_root, THUMBNAIL_DIR), exist_ok=True)
+
+    # largest first, each variant is resized from the one before
+    variants = sorted(VARIANTS.items(), key=lambda item: -item[1][0])
+    with Image.open(source) as image:
+        # let the JPEG decoder downscale while decoding
+        image.draft("RGB", variants[0][1])
+        image = ImageOps.exif_transpose(image)
+        if image.mode in ("RGBA", "LA", "P"):
+            # transparent areas become white rather than black
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, "white")
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+        for variant, size in variants:
+            path = os.path.join(media_root, thumbnail_name(key, variant))
+            if os.path.exists(path):
+                continue
+            image.thumbnail(size, Image.LANCZOS)
+            # write then rename, so a half written file is never served
+            partial = f"{path}.{os.getpid()}.part"
+            image.save(partial, "JPEG", quality=82, optimize=True, progressive=True)
+            os.replace(partial, path)
+    return key
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawned, not forked: forking a threaded server can deadlock
+            _executor = ProcessPoolExecutor(
+                max_workers=getattr(settings, "THUMBNAIL_WORKERS", None),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def thumbnail_listing(listing_id, image_name):
+    '''
+    the job rendering a listing's thumbnails and recording their key
+    '''
+    from .caching import bump_listing_version
+    from .models import Listing
+
+    key = render_thumbnails(default_storage.path(image_name), settings.MEDIA_ROOT)
+    Listing.objects.filter(pk=listing_id).update(thumbnail_key=key)
+    bump_listing_version(listing_id)
+
+
+def schedule_thumbnails(listing_id, image_name):
+    '''
+    queue the rendering of a listing's thumbnails; it runs on a worker
+    once the current transaction commits, until then the listing shows
+    the original
+    '''
+    from .jobs import enqueue
+
+    enqueue(thumbnail_listing, listing_id, image_name)
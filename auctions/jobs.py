@@ -0,0 +1,222 @@
+'''
+a background job queue kept in the database
+
+Work that need not hold up a response is enqueued as a Job row naming a
+function by its dotted path and the JSON arguments to call it with. The
+row is written in the caller's transaction, so a job exists exactly when
+the work that asked for it commits, and it survives restarts; no broker
+is involved. ``manage.py run_workers`` runs the queue.
+
+A worker claims a batch of due jobs in one short transaction, marking
+them running under a lease. A job that raises is queued again with
+exponential backoff until it has used max_attempts, then kept as failed
+for inspection; one whose worker died is claimed again once its lease
+runs out, or failed if that was its last attempt, so a job that kills
+its worker is not retried forever. Jobs may therefore run more than
+once and must be idempotent.
+Finished jobs are deleted, a batch at a time.
+'''
+
+import logging
+import random
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, router, transaction
+from django.db.models import Case, Count, F, Value, When
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .models import Job
+
+logger = logging.getLogger(__name__)
+# seconds between queue depth counts by a busy worker
+DEPTH_INTERVAL = 5.0
+
+
+def lease():
+    return getattr(settings, "JOB_LEASE", 300)
+
+
+def backoff(attempts):
+    '''
+    seconds to wait before retrying a job that has failed ``attempts``
+    times, jittered so jobs that failed together don't retry together
+    '''
+    base = getattr(settings, "JOB_BACKOFF", 2.0)
+    delay = min(base * 2 ** (attempts - 1), getattr(settings, "JOB_BACKOFF_MAX", 600))
+    return delay * random.uniform(0.5, 1.0)
+
+
+def task_name(task):
+    if isinstance(task, str):
+        return task
+    return f"{task.__module__}.{task.__qualname__}"
+
+
+def enqueue(task, *args, delay=0, max_attempts=None, **kwargs):
+    '''
+    Queue a call of ``task``, a function or its dotted path, with JSON
+    serialisable arguments, to run ``delay`` seconds from now at the
+    earliest. Inside a transaction the job is only seen once it commits.
+    '''
+    now = timezone.now()
+    return Job.objects.create(
+        task=task_name(task),
+        args=list(args),
+        kwargs=kwargs,
+        max_attempts=max_attempts or getattr(settings, "JOB_MAX_ATTEMPTS", 5),
+        created=now,
+        run_at=now + timedelta(seconds=delay),
+    )
+
+
+def claim(worker, batch_size=10, now=None):
+    '''
+    mark up to ``batch_size`` due jobs as running for ``worker`` and
+    return them, oldest due first
+    '''
+    now = now or timezone.now()
+    with transaction.atomic():
+        # jobs of a worker that died go back to the queue, unless that was
+        # their last attempt
+        expired = Job.objects.filter(
+            state=Job.State.RUNNING, claimed_at__lte=now - timedelta(seconds=lease()),
+        ).update(
+            state=Case(
+                When(attempts__lt=F("max_attempts"), then=Value(Job.State.QUEUED)),
+                default=Value(Job.State.FAILED),
+            ),
+            last_error=Case(
+                When(attempts__lt=F("max_attempts"), then=F("last_error")),
+                default=Value("The lease ran out on the last attempt; the worker running it died."),
+            ),
+        )
+        if expired:
+            logger.warning("%s jobs outlived their lease, requeued unless out of attempts", expired)
+        due = Job.objects.filter(state=Job.State.QUEUED, run_at__lte=now).order_by("run_at", "id")
+        if connections[router.db_for_write(Job)].features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        # elsewhere the write lock taken at BEGIN keeps claims apart
+        jobs = list(due[:batch_size])
+        if jobs:
+            Job.objects.filter(id__in=[job.id for job in jobs]).update(
+                state=Job.State.RUNNING, claimed_at=now, claimed_by=worker, attempts=F("attempts") + 1,
+            )
+    for job in jobs:
+        job.state, job.claimed_at, job.claimed_by = Job.State.RUNNING, now, worker
+        job.attempts += 1
+    return jobs
+
+
+def run(job):
+    '''
+    run a claimed ``job`` and return whether it succeeded; a failed job is
+    put back for a retry, finished ones are left for finish()
+    '''
+    started = timezone.now()
+    metrics.job_wait.observe(job.task, value=max((started - job.run_at).total_seconds(), 0.0))
+    began = time.perf_counter()
+    try:
+        import_string(job.task)(*job.args, **job.kwargs)
+    except Exception:
+        metrics.job_duration.observe(job.task, value=time.perf_counter() - began)
+        fail(job, traceback.format_exc())
+        return False
+    metrics.job_duration.observe(job.task, value=time.perf_counter() - began)
+    metrics.jobs_total.inc(job.task, "done")
+    return True
+
+
+def finish(jobs):
+    '''
+    delete the finished ``jobs``, claimed together, in one statement
+    '''
+    if jobs:
+        # unless the lease ran out and another worker has them now
+        Job.objects.filter(
+            id__in=[job.id for job in jobs], claimed_by=jobs[0].claimed_by, claimed_at=jobs[0].claimed_at,
+        ).delete()
+
+
+def fail(job, error):
+    mine = Job.objects.filter(pk=job.pk, claimed_by=job.claimed_by, claimed_at=job.claimed_at)
+    if job.attempts >= job.max_attempts:
+        logger.error("job %s (%s) failed for good after %s attempts:\n%s", job.pk, job.task, job.attempts, error)
+        metrics.jobs_total.inc(job.task, "failed")
+        mine.update(state=Job.State.FAILED, last_error=error)
+        return
+    delay = backoff(job.attempts)
+    logger.warning("job %s (%s) failed, retrying in %.1f s:\n%s", job.pk, job.task, delay, error)
+    metrics.jobs_total.inc(job.task, "retried")
+    mine.update(state=Job.State.QUEUED, run_at=timezone.now() + timedelta(seconds=delay), last_error=error)
+
+
+def queue_depth(now=None):
+    '''
+    jobs by state, plus ``due``: the queued jobs ready to run now
+    '''
+    now = now or timezone.now()
+    depth = dict.fromkeys(Job.State.values, 0)
+    depth.update(Job.objects.values_list("state").annotate(Count("id")).order_by())
+    depth["due"] = Job.objects.filter(state=Job.State.QUEUED, run_at__lte=now).count()
+    return depth
+
+
+def record_queue_depth():
+    for state, count in queue_depth().items():
+        metrics.job_queue_depth.set(state, value=count)
+
+
+class Worker:
+    '''
+    claims and runs jobs until ``stop`` is set; with ``burst`` it returns
+    as soon as nothing is due instead of polling
+    '''
+    def __init__(self, name, stop=None, batch_size=10, poll_interval=1.0):
+        self.name = name
+        self.stop = stop or threading.Event()
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.done = self.failed = 0
+        self.depth_recorded = 0.0
+
+    def run_once(self):
+        '''
+        claim and run one batch, return how many jobs it held
+        '''
+        close_old_connections()
+        jobs = claim(self.name, self.batch_size)
+        finished = []
+        for job in jobs:
+            # a batch is short, it is finished even when asked to stop
+            if run(job):
+                finished.append(job)
+            else:
+                self.failed += 1
+        finish(finished)
+        self.done += len(finished)
+        return len(jobs)
+
+    def run(self, burst=False):
+        try:
+            while not self.stop.is_set():
+                try:
+                    claimed = self.run_once()
+                    if not claimed or time.monotonic() - self.depth_recorded >= DEPTH_INTERVAL:
+                        record_queue_depth()
+                        self.depth_recorded = time.monotonic()
+                    if claimed:
+                        continue
+                except Exception:
+                    # the database was busy or away, try again later
+                    logger.exception("worker %s could not claim jobs", self.name)
+                if burst:
+                    return
+                self.stop.wait(self.poll_interval)
+        finally:
+            connections.close_all()
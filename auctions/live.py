@@ -0,0 +1,247 @@
+'''
+live listing updates over server-sent events
+
+Subscribers of a listing share one channel holding the latest state (price,
+highest bidder, open or closed). A single publisher per listing updates
+that state and wakes every waiting subscriber at once; a subscriber that
+falls behind skips straight to the newest state, so idle connections cost
+a suspended coroutine each and nothing more.
+
+Writes reach the broker through notify(), which is safe to call from the
+threads Django runs sync views in. InMemoryBroker only sees writes made by
+its own process; PollingBroker also picks up writes made elsewhere by
+polling the listing row, one query per watched listing per interval.
+'''
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .models import Listing
+
+MISSING = object()
+KEEPALIVE = b": keepalive\n\n"
+
+
+def listing_state(listing_id):
+    row = (
+        Listing.objects.filter(pk=listing_id)
+        .values("id", "price", "highest_bidder__username", "active")
+        .first()
+    )
+    if row is None:
+        return MISSING
+    return {
+        "id": row["id"],
+        "price": row["price"],
+        "bidder": row["highest_bidder__username"],
+        "active": row["active"],
+    }
+
+
+class Channel:
+    '''
+    latest state of one listing, already encoded as an event, plus an
+    asyncio event set on every change or heartbeat
+    '''
+    def __init__(self):
+        self.state = None
+        self.body = None
+        self.seq = 0
+        self.state_seq = 0
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.publisher = None
+
+    def _wake(self):
+        self.seq += 1
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+    def publish(self, state):
+        if state == self.state:
+            return
+        self.state = state
+        self.body = None if state is MISSING else encode(self.seq + 1, state)
+        self.state_seq = self.seq + 1
+        self._wake()
+
+    def beat(self):
+        self._wake()
+
+
+class Subscription:
+    def __init__(self, broker, listing_id, channel):
+        self.broker = broker
+        self.listing_id = listing_id
+        self.channel = channel
+        self.seq = 0
+        self.state_seq = 0
+
+    async def next(self):
+        '''
+        Wait for the channel to change and return the encoded event, or
+        a keepalive comment if it was only a heartbeat.
+        '''
+        channel = self.channel
+        while channel.seq == self.seq:
+            await channel.changed.wait()
+        self.seq = channel.seq
+        if channel.state_seq == self.state_seq:
+            return KEEPALIVE
+        self.state_seq = channel.state_seq
+        return channel.body
+
+    @property
+    def state(self):
+        return self.channel.state
+
+    def close(self):
+        self.broker.release(self.listing_id)
+
+
+class InMemoryBroker:
+
+    def __init__(self):
+        self.loop = None
+        self.channels = {}
+        self.heartbeat = getattr(settings, "LIVE_HEARTBEAT", 15.0)
+
+    def subscribe(self, listing_id):
+        '''
+        must be called on the event loop serving the subscribers
+        '''
+        self.loop = asyncio.get_running_loop()
+        channel = self.channels.get(listing_id)
+        if channel is None:
+            channel = self.channels[listing_id] = Channel()
+            channel.publisher = self.loop.create_task(self.publisher(listing_id, channel))
+        channel.subscribers += 1
+        return Subscription(self, listing_id, channel)
+
+    def release(self, listing_id):
+        channel = self.channels.get(listing_id)
+        if channel is None:
+            return
+        channel.subscribers -= 1
+        if channel.subscribers <= 0:
+            del self.channels[listing_id]
+            channel.publisher.cancel()
+
+    async def publisher(self, listing_id, channel):
+        channel.publish(await sync_to_async(listing_state)(listing_id))
+        while True:
+            await asyncio.sleep(self.heartbeat)
+            channel.beat()
+
+    def notify(self, listing_id, state=None):
+        '''
+        Announce a change to a listing; ``state`` is its new state, or None
+        to have it read back from the database. Safe to call from any thread.
+        '''
+        loop = self.loop
+        if loop is None or loop.is_closed() or listing_id not in self.channels:
+            return
+        loop.call_soon_threadsafe(self._deliver, listing_id, state)
+
+    def _deliver(self, listing_id, state):
+        channel = self.channels.get(listing_id)
+        if channel is None:
+            return
+        if state is None:
+            self.loop.create_task(self.refresh(listing_id, channel))
+        else:
+            channel.publish(state)
+
+    async def refresh(self, listing_id, channel):
+        channel.publish(await sync_to_async(listing_state)(listing_id))
+
+
+class PollingBroker(InMemoryBroker):
+
+    def __init__(self, interval=None):
+        super().__init__()
+        self.interval = interval or getattr(settings, "LIVE_POLL_INTERVAL", 1.0)
+
+    async def publisher(self, listing_id, channel):
+        loop = asyncio.get_running_loop()
+        beat = loop.time() + self.heartbeat
+        while True:
+            channel.publish(await sync_to_async(listing_state)(listing_id))
+            await asyncio.sleep(self.interval)
+            if loop.time() >= beat:
+                beat = loop.time() + self.heartbeat
+                channel.beat()
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        _broker = import_string(getattr(settings, "LIVE_BROKER", "auctions.live.InMemoryBroker"))()
+    return _broker
+
+
+def listing_changed(listing_id, **state):
+    '''
+    Tell subscribers about a listing once the current transaction commits.
+    Pass the full new state when it is known to save a read.
+    '''
+    transaction.on_commit(lambda: get_broker().notify(listing_id, state or None))
+
+
+def encode(seq, state):
+    return f"id: {seq}\ndata: {json.dumps(state, separators=(',', ':'))}\n\n".encode()
+
+
+async def events(scope, receive, send, listing_id, broker=None):
+    '''
+    ASGI handler streaming a listing's state as server-sent events
+    '''
+    broker = broker or get_broker()
+    subscription = broker.subscribe(listing_id)
+    handler = asyncio.current_task()
+    disconnected = False
+
+    async def watch():
+        nonlocal disconnected
+        while (await receive())["type"] != "http.disconnect":
+            pass
+        disconnected = True
+        handler.cancel()
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        body = await subscription.next()
+        if subscription.state is MISSING:
+            await send({"type": "http.response.start", "status": 404, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+            ],
+        })
+        while True:
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+            body = await subscription.next()
+            if subscription.state is MISSING:
+                # deleted while streaming; a reconnecting client gets the 404
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+                return
+    except asyncio.CancelledError:
+        if not disconnected:
+            raise
+    finally:
+        watcher.cancel()
+        subscription.close()
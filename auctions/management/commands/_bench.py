@@ -0,0 +1,43 @@
+'''
+helpers shared by the benchmark commands
+'''
+
+import math
+
+from django.conf import settings
+from django.core.management.base import CommandError
+from django.db import connections
+
+
+def percentile(samples, p):
+    '''
+    nearest-rank percentile of ``samples`` (0 < p <= 100)
+    '''
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def ms(seconds):
+    return f"{seconds * 1000:.2f} ms"
+
+
+def add_scratch_argument(parser):
+    parser.add_argument("--yes", action="store_true",
+                        help="run even though the database is not marked as a scratch database")
+
+
+def require_scratch(options):
+    '''
+    benchmarks write (and delete) rows; refuse to run against a database
+    that is not marked as scratch by SCRATCH_DATABASE unless told --yes
+    '''
+    if options["yes"] or getattr(settings, "SCRATCH_DATABASE", False):
+        return
+    name = connections["default"].settings_dict["NAME"]
+    raise CommandError(
+        f"this benchmark writes to {name}; run it against a scratch copy with SCRATCH_DATABASE = True, "
+        "or pass --yes"
+    )
@@ -0,0 +1,115 @@
+'''
+read latency during a burst of bids, with and without admission control
+
+Requests arrive at a fixed rate, whatever the server's progress, and are
+served by a fixed pool of threads like a threaded app server's. Most of
+them are bids on one listing, the rest signed in page views. Latency is
+measured from arrival, so it includes waiting for a thread. The burst is
+run once with write admission switched off and once as configured.
+'''
+
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from auctions.models import Listing, User
+
+from ._bench import add_scratch_argument, ms, percentile, require_scratch
+
+UNPROTECTED = {"RATE_LIMITS": {}, "WRITE_CONCURRENCY": None}
+
+
+class Command(BaseCommand):
+    help = "Benchmark read latency during a bidding burst with and without write admission control."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=5.0, help="length of each burst")
+        parser.add_argument("--rate", type=float, default=200, help="requests arriving per second")
+        parser.add_argument("--write-share", type=float, default=0.7, help="fraction of requests that bid")
+        parser.add_argument("--server-threads", type=int, default=16)
+        parser.add_argument("--bidders", type=int, default=50)
+        add_scratch_argument(parser)
+
+    def handle(self, *args, **options):
+        require_scratch(options)
+        tag = f"bench-{uuid.uuid4().hex[:8]}"
+        users = [User.objects.create_user(f"{tag}-{i}") for i in range(options["bidders"] + 1)]
+        listing = Listing.objects.create(
+            title=tag, description="admission benchmark", starting_bid=1, created=timezone.now(), seller=users[0],
+        )
+        reads = [reverse("listing", args=[listing.id]), reverse("bidHistory", args=[listing.id]), reverse("index")]
+
+        with override_settings(ALLOWED_HOSTS=["*"]):
+            cookies = {}
+            for user in users:
+                client = Client()
+                client.force_login(user)
+                cookies[user.pk] = client.cookies[settings.SESSION_COOKIE_NAME].value
+
+            self.stdout.write(
+                f"{'mode':<14}{'read p50':>10}{'read p99':>11}{'write p99':>11}{'bids':>7}{'shed':>7}{'errors':>8}"
+            )
+            try:
+                for mode, overrides in (("unprotected", UNPROTECTED), ("admission", {})):
+                    with override_settings(**overrides):
+                        self.burst(mode, options, listing, users[1:], cookies, reads)
+            finally:
+                listing.delete()
+                User.objects.filter(username__startswith=tag).delete()
+
+    def burst(self, mode, options, listing, bidders, cookies, reads):
+        results = {"read": [], "write": [], "shed": 0, "errors": 0}
+        lock = threading.Lock()
+        price = [Listing.objects.values_list("current_bid", flat=True).get(pk=listing.pk) or 1.0]
+        # a client per server thread; a new one would load the middleware again
+        local = threading.local()
+
+        def serve(arrived, write):
+            if not hasattr(local, "client"):
+                local.client = Client()
+            client = local.client
+            client.cookies[settings.SESSION_COOKIE_NAME] = cookies[random.choice(bidders).pk]
+            try:
+                if write:
+                    price[0] += random.randint(1, 3)
+                    response = client.post(reverse("bid"), {"listing": listing.id, "amount": price[0]})
+                else:
+                    response = client.get(random.choice(reads))
+                status = response.status_code
+            except Exception:
+                status = 500
+            elapsed = time.perf_counter() - arrived
+            with lock:
+                if status == 429:
+                    results["shed"] += 1
+                elif status >= 500:
+                    results["errors"] += 1
+                else:
+                    results["write" if write else "read"].append(elapsed)
+
+        interval = 1.0 / options["rate"]
+        with ThreadPoolExecutor(options["server_threads"]) as pool:
+            began = time.perf_counter()
+            n = 0
+            while time.perf_counter() - began < options["seconds"]:
+                # arrivals keep their schedule however far behind the server is
+                arrival = began + n * interval
+                delay = arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(serve, arrival, random.random() < options["write_share"])
+                n += 1
+
+        self.stdout.write(
+            f"{mode:<14}{ms(percentile(results['read'], 50)):>10}{ms(percentile(results['read'], 99)):>11}"
+            f"{ms(percentile(results['write'], 99)):>11}{len(results['write']):>7}{results['shed']:>7}"
+            f"{results['errors']:>8}"
+        )
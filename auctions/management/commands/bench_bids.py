@@ -0,0 +1,121 @@
+'''
+hammer a single listing with concurrent bids
+
+Every bid is a maximum, resolved by the proxy bidding engine, so an
+accepted bid writes up to two Bid rows, or none when the leader raises
+their own maximum. An accepted bid either leads or is outbid at once by
+the leader's higher maximum; the two are counted apart.
+'''
+
+import random
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.utils import timezone
+
+from auctions.bidding import BidRejected, place_bid
+from auctions.models import Bid, Listing, MaxBid, User
+
+from ._bench import add_scratch_argument, ms, percentile, require_scratch
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent bidding on one listing and check no bid was lost."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--bids", type=int, default=200, help="bids per thread")
+        parser.add_argument("--keep", action="store_true", help="keep the benchmark rows")
+        add_scratch_argument(parser)
+
+    def handle(self, *args, **options):
+        require_scratch(options)
+        tag = f"bench-{uuid.uuid4().hex[:8]}"
+        seller = User.objects.create_user(f"{tag}-seller")
+        bidders = [User.objects.create_user(f"{tag}-{i}") for i in range(options["threads"])]
+        listing = Listing.objects.create(
+            title=tag,
+            description="bid benchmark",
+            starting_bid=1,
+            created=timezone.now(),
+            seller=seller,
+        )
+
+        latencies, leading, outbid, rejected, errors = [], [0], [0], [0], [0]
+        lock = threading.Lock()
+        start = threading.Barrier(options["threads"])
+
+        def worker(user):
+            local = []
+            led = lost = no = failed = 0
+            price = 1.0
+            start.wait()
+            try:
+                for _ in range(options["bids"]):
+                    # bid a little above the last price this thread saw, so
+                    # threads keep racing each other for the same increment
+                    amount = price + random.randint(1, 5)
+                    began = time.perf_counter()
+                    try:
+                        if place_bid(listing.id, user, amount).leading:
+                            led += 1
+                        else:
+                            lost += 1
+                    except BidRejected:
+                        no += 1
+                    except OperationalError:
+                        failed += 1
+                    local.append(time.perf_counter() - began)
+                    price = Listing.objects.values_list("current_bid", flat=True).get(pk=listing.id) or price
+            finally:
+                connections.close_all()
+            with lock:
+                latencies.extend(local)
+                leading[0] += led
+                outbid[0] += lost
+                rejected[0] += no
+                errors[0] += failed
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in bidders]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        listing.refresh_from_db()
+        bids = list(Bid.objects.filter(listing=listing).order_by("id").values_list("amount", "user_id"))
+        try:
+            if len(bids) != listing.bid_count:
+                raise CommandError(f"the listing counts {listing.bid_count} bids but {len(bids)} are stored")
+            if any(later < earlier for (earlier, _), (later, _) in zip(bids, bids[1:])):
+                raise CommandError("a bid was stored below the one before it")
+            if bids and (listing.current_bid, listing.highest_bidder_id) != bids[-1]:
+                raise CommandError("listing price does not match the highest bid")
+            if listing.highest_bidder_id:
+                maximum = MaxBid.objects.filter(listing=listing, user_id=listing.highest_bidder_id).first()
+                if maximum is None:
+                    raise CommandError("the leader has no maximum bid")
+                if listing.current_bid > maximum.amount:
+                    raise CommandError("the price is above the leader's maximum")
+            elif bids:
+                raise CommandError("bids were stored but the listing has no leader")
+        finally:
+            if not options["keep"]:
+                listing.delete()
+                User.objects.filter(username__startswith=tag).delete()
+
+        self.stdout.write(f"threads:        {options['threads']}")
+        self.stdout.write(f"attempts:       {len(latencies)} in {elapsed:.2f} s")
+        self.stdout.write(f"leading:        {leading[0]} ({leading[0] / elapsed:.1f} bids/s)")
+        self.stdout.write(f"outbid:         {outbid[0]} ({outbid[0] / elapsed:.1f} bids/s)")
+        self.stdout.write(f"bid rows:       {len(bids)}")
+        self.stdout.write(f"rejected:       {rejected[0]}")
+        self.stdout.write(f"lock errors:    {errors[0]}")
+        self.stdout.write(f"latency p50:    {ms(percentile(latencies, 50))}")
+        self.stdout.write(f"latency p99:    {ms(percentile(latencies, 99))}")
+        self.stdout.write(self.style.SUCCESS("final price matches the highest accepted bid"))
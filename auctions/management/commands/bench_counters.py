@@ -0,0 +1,82 @@
+'''
+view counting written through versus written behind
+
+Threads count views of a handful of listings, first with an UPDATE per
+view, then through the write-behind buffer, and the totals are checked
+against the number of views counted.
+'''
+
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.db.models import F
+
+from auctions.counters import CounterBuffer
+from auctions.models import Listing
+
+from ._bench import add_scratch_argument, ms, percentile, require_scratch
+
+
+class Command(BaseCommand):
+    help = "Benchmark counting listing views with an UPDATE per view and write-behind."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--views", type=int, default=500, help="views per thread")
+        parser.add_argument("--listings", type=int, default=10)
+        add_scratch_argument(parser)
+
+    def handle(self, *args, **options):
+        require_scratch(options)
+        ids = list(Listing.objects.order_by("-id").values_list("id", flat=True)[:options["listings"]])
+        if not ids:
+            raise CommandError("no listings to count views of")
+        buffer = CounterBuffer(Listing, ("view_count",))
+
+        def direct(listing_id):
+            Listing.objects.filter(pk=listing_id).update(view_count=F("view_count") + 1)
+
+        def buffered(listing_id):
+            buffer.add("view_count", listing_id)
+
+        self.stdout.write(f"{'mode':<10}{'views/s':>10}{'p50':>11}{'p99':>11}{'errors':>8}")
+        for mode, count in (("direct", direct), ("buffered", buffered)):
+            before = sum(Listing.objects.filter(id__in=ids).values_list("view_count", flat=True))
+            latencies, errors = [], [0]
+            lock = threading.Lock()
+
+            def worker(offset):
+                local, failed = [], 0
+                try:
+                    for n in range(options["views"]):
+                        began = time.perf_counter()
+                        try:
+                            count(ids[(offset + n) % len(ids)])
+                        except OperationalError:
+                            failed += 1
+                        local.append(time.perf_counter() - began)
+                finally:
+                    connections.close_all()
+                with lock:
+                    latencies.extend(local)
+                    errors[0] += failed
+
+            threads = [threading.Thread(target=worker, args=(i,)) for i in range(options["threads"])]
+            began = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            buffer.flush()
+            elapsed = time.perf_counter() - began
+
+            after = sum(Listing.objects.filter(id__in=ids).values_list("view_count", flat=True))
+            if after - before != len(latencies) - errors[0]:
+                raise CommandError(f"{mode}: counted {len(latencies) - errors[0]} views but stored {after - before}")
+            self.stdout.write(
+                f"{mode:<10}{len(latencies) / elapsed:>10.0f}{ms(percentile(latencies, 50)):>11}"
+                f"{ms(percentile(latencies, 99)):>11}{errors[0]:>8}"
+            )
+        self.stdout.write(self.style.SUCCESS("every counted view was stored"))
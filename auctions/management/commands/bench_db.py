@@ -0,0 +1,152 @@
+'''
+mixed read/write load against the database configuration
+
+Reader threads run the queries of a page view while writer threads place
+bids, first with the stock SQLite setup (rollback journal, a connection
+per request, every query on the primary) and then with the configured
+one (pragmas, persistent connections, reads on READ_DATABASE).
+'''
+
+import itertools
+import random
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, router
+from django.utils import timezone
+
+from auctions.bidding import BidRejected, place_bid
+from auctions.models import Bid, Listing, User
+
+from ._bench import add_scratch_argument, ms, percentile, require_scratch
+
+STOCK = {
+    "ENGINE": "django.db.backends.sqlite3",
+    "CONN_MAX_AGE": 0,
+    "OPTIONS": {},
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent page views and bids with stock and tuned SQLite settings."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=4)
+        parser.add_argument("--seconds", type=float, default=10.0, help="duration of each run")
+        parser.add_argument("--listings", type=int, default=20, help="listings the writers bid on")
+        parser.add_argument("--mode", choices=["stock", "tuned", "both"], default="both")
+        add_scratch_argument(parser)
+
+    def handle(self, *args, **options):
+        require_scratch(options)
+        tag = f"bench-{uuid.uuid4().hex[:8]}"
+        seller = User.objects.create_user(f"{tag}-seller")
+        bidders = [User.objects.create_user(f"{tag}-{i}") for i in range(options["writers"])]
+        Listing.objects.bulk_create([
+            Listing(title=f"{tag} {i}", description="database benchmark", starting_bid=1, price=1,
+                    created=timezone.now(), seller=seller)
+            for i in range(options["listings"])
+        ])
+        ids = list(Listing.objects.filter(title__startswith=tag).values_list("id", flat=True))
+
+        modes = ["stock", "tuned"] if options["mode"] == "both" else [options["mode"]]
+        saved = {alias: dict(connections.databases[alias]) for alias in connections.databases}
+        try:
+            for mode in modes:
+                self.configure(mode, saved)
+                self.report(mode, self.run(mode, ids, bidders, options))
+        finally:
+            self.configure("tuned", saved)
+            with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                cursor.execute("DELETE FROM auctions_bid WHERE listing_id IN (%s)" % ",".join("%s" for _ in ids), ids)
+                cursor.execute("DELETE FROM auctions_listing WHERE id IN (%s)" % ",".join("%s" for _ in ids), ids)
+            User.objects.filter(username__startswith=tag).delete()
+
+    def configure(self, mode, saved):
+        connections.close_all()
+        for alias, settings_dict in saved.items():
+            connections.databases[alias].clear()
+            connections.databases[alias].update(settings_dict)
+            if mode == "stock":
+                connections.databases[alias].update(STOCK)
+            # threads build their own connections from the new settings
+            try:
+                del connections[alias]
+            except AttributeError:
+                pass
+        if mode == "stock":
+            with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode = delete")
+            connections.close_all()
+
+    def run(self, mode, ids, bidders, options):
+        read_alias = DEFAULT_DB_ALIAS if mode == "stock" else router.db_for_read(Listing)
+        deadline = time.perf_counter() + options["seconds"]
+        amounts = itertools.count(2)
+        results = {"read": [], "write": [], "errors": 0, "elapsed": 0.0}
+        lock = threading.Lock()
+
+        def request_done():
+            # the stock setup opens a connection per request
+            if mode == "stock":
+                connections.close_all()
+
+        def reader():
+            local, failed = [], 0
+            while time.perf_counter() < deadline:
+                listing_id = random.choice(ids)
+                began = time.perf_counter()
+                try:
+                    list(Listing.objects.using(read_alias).filter(active=True)
+                         .only("id", "title", "current_bid", "created").order_by("-created", "-id")[:51])
+                    Listing.objects.using(read_alias).select_related("seller").get(pk=listing_id)
+                    Bid.objects.using(read_alias).filter(listing_id=listing_id).count()
+                    local.append(time.perf_counter() - began)
+                except OperationalError:
+                    failed += 1
+                request_done()
+            connections.close_all()
+            with lock:
+                results["read"].extend(local)
+                results["errors"] += failed
+
+        def writer(user):
+            local, failed = [], 0
+            while time.perf_counter() < deadline:
+                began = time.perf_counter()
+                try:
+                    place_bid(random.choice(ids), user, next(amounts))
+                    local.append(time.perf_counter() - began)
+                except BidRejected:
+                    local.append(time.perf_counter() - began)
+                except OperationalError:
+                    failed += 1
+                request_done()
+            connections.close_all()
+            with lock:
+                results["write"].extend(local)
+                results["errors"] += failed
+
+        threads = [threading.Thread(target=reader) for _ in range(options["readers"])]
+        threads += [threading.Thread(target=writer, args=(user,)) for user in bidders]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        results["elapsed"] = time.perf_counter() - began
+        return results
+
+    def report(self, mode, results):
+        elapsed = results["elapsed"]
+        self.stdout.write(f"{mode}:")
+        for kind in ("read", "write"):
+            latencies = results[kind]
+            self.stdout.write(
+                f"  {kind + 's':<8}{len(latencies) / elapsed:>9.1f}/s"
+                f"   p50 {ms(percentile(latencies, 50))}   p99 {ms(percentile(latencies, 99))}"
+            )
+        self.stdout.write(f"  lock errors: {results['errors']}")
@@ -0,0 +1,69 @@
+'''
+job queue throughput and latency
+
+Enqueues a burst of short jobs that wait like a network call would, then
+drains them with worker pools of growing size, reporting the cost of an
+enqueue, jobs per second, and how long jobs waited to be started.
+'''
+
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from auctions.jobs import Worker, enqueue
+from auctions.models import Job
+
+from ._bench import add_scratch_argument, ms, percentile, require_scratch
+
+_waits = []
+_waits_lock = threading.Lock()
+
+
+def pause(seconds, enqueued):
+    with _waits_lock:
+        _waits.append(time.time() - enqueued)
+    time.sleep(seconds)
+
+
+class Command(BaseCommand):
+    help = "Benchmark enqueueing and running background jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--jobs", type=int, default=2000)
+        parser.add_argument("--job-ms", type=float, default=5.0, help="time each job sleeps")
+        parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+        parser.add_argument("--batch-size", type=int, default=10)
+        add_scratch_argument(parser)
+
+    def handle(self, *args, **options):
+        require_scratch(options)
+        if Job.objects.filter(state=Job.State.QUEUED).exists():
+            self.stderr.write("the queue is not empty, its jobs would be run too")
+            return
+
+        self.stdout.write(f"{'threads':<9}{'enqueue p50':>13}{'jobs/s':>10}{'wait p50':>12}{'wait p99':>12}")
+        for threads in options["threads"]:
+            del _waits[:]
+            costs = []
+            with transaction.atomic():
+                for _ in range(options["jobs"]):
+                    began = time.perf_counter()
+                    enqueue(pause, options["job_ms"] / 1000, time.time())
+                    costs.append(time.perf_counter() - began)
+
+            stop = threading.Event()
+            workers = [Worker(f"bench:{n}", stop, options["batch_size"]) for n in range(threads)]
+            pool = [threading.Thread(target=worker.run, args=(True,)) for worker in workers]
+            began = time.perf_counter()
+            for thread in pool:
+                thread.start()
+            for thread in pool:
+                thread.join()
+            elapsed = time.perf_counter() - began
+
+            self.stdout.write(
+                f"{threads:<9}{ms(percentile(costs, 50)):>13}{len(_waits) / elapsed:>10.0f}"
+                f"{ms(percentile(_waits, 50)):>12}{ms(percentile(_waits, 99)):>12}"
+            )
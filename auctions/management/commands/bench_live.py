@@ -0,0 +1,124 @@
+'''
+load test the live listing event stream
+
+Connects many idle subscribers to one listing through the ASGI handler in
+this process, publishes price changes from another thread the way a bid
+view does, and measures how long each change takes to reach every
+subscriber.
+'''
+
+import asyncio
+import json
+import resource
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.utils import timezone
+
+from auctions.live import InMemoryBroker, PollingBroker, events
+from auctions.models import Listing, User
+
+from ._bench import add_scratch_argument, ms, percentile, require_scratch
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent live-update subscribers and delivery latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=5000)
+        parser.add_argument("--publishes", type=int, default=20)
+        parser.add_argument("--interval", type=float, default=0.2,
+                            help="seconds between published changes")
+        parser.add_argument("--broker", choices=["memory", "polling"], default="memory")
+        add_scratch_argument(parser)
+
+    def handle(self, *args, **options):
+        require_scratch(options)
+        tag = f"bench-{uuid.uuid4().hex[:8]}"
+        seller = User.objects.create_user(tag)
+        listing = Listing.objects.create(
+            title=tag, description="live benchmark", starting_bid=1,
+            created=timezone.now(), seller=seller,
+        )
+        try:
+            asyncio.run(self.run(listing.id, options))
+        finally:
+            listing.delete()
+            seller.delete()
+
+    async def run(self, listing_id, options):
+        broker = InMemoryBroker() if options["broker"] == "memory" else PollingBroker()
+        count = options["subscribers"]
+        published = {}
+        arrivals = []
+        received = [0]
+        connected = asyncio.Event()
+        stop = asyncio.Event()
+
+        def subscriber():
+            first = [True]
+
+            async def receive():
+                await stop.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                body = message.get("body")
+                if not body or not body.startswith(b"id:"):
+                    return
+                if first[0]:
+                    first[0] = False
+                    received[0] += 1
+                    if received[0] == count:
+                        connected.set()
+                else:
+                    # every subscriber is sent the same bytes object, so
+                    # keeping a reference is cheap; decode after the run
+                    arrivals.append((time.perf_counter(), body))
+
+            return events({"type": "http"}, receive, send, listing_id, broker)
+
+        rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        began = time.perf_counter()
+        tasks = [asyncio.ensure_future(subscriber()) for _ in range(count)]
+        await connected.wait()
+        connect_time = time.perf_counter() - began
+        rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        def publish():
+            for i in range(options["publishes"]):
+                time.sleep(options["interval"])
+                price = 1000.0 + i
+                published[price] = time.perf_counter()
+                if options["broker"] == "polling":
+                    # a write from another process: only the poller sees it
+                    Listing.objects.filter(pk=listing_id).update(current_bid=price, price=price)
+                else:
+                    broker.notify(listing_id, {"id": listing_id, "price": price, "bidder": None, "active": True})
+            connections.close_all()
+
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        while publisher.is_alive():
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(max(1.0, options["interval"]))
+        stop.set()
+        await asyncio.gather(*tasks)
+
+        prices = {}
+        latencies = []
+        for arrived, body in arrivals:
+            if body not in prices:
+                prices[body] = json.loads(body.split(b"data: ", 1)[1])["price"]
+            latencies.append(arrived - published[prices[body]])
+
+        expected = count * options["publishes"]
+        self.stdout.write(f"subscribers:     {count} connected in {connect_time:.2f} s")
+        self.stdout.write(f"memory:          ~{max(rss_after - rss_before, 0) / count:.1f} KB per subscriber")
+        self.stdout.write(f"deliveries:      {len(latencies)} of {expected} ({expected - len(latencies)} coalesced)")
+        self.stdout.write(f"latency p50:     {ms(percentile(latencies, 50))}")
+        self.stdout.write(f"latency p99:     {ms(percentile(latencies, 99))}")
+        self.stdout.write(f"latency max:     {ms(max(latencies, default=0))}")
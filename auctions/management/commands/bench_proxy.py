@@ -0,0 +1,97 @@
+'''
+requests per auction with manual bidding versus maximum bids
+
+Bidders with random private valuations compete for one listing through
+the bid view, each submit followed by the listing page it redirects to.
+Bidding by hand, every outbid bidder who can still afford it comes back
+and bids one increment over the price, until only the leader is left.
+With maximum bids each bidder submits their valuation once. Both end at
+about the second highest valuation; the table shows what it took.
+'''
+
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from auctions.bidding import increment
+from auctions.models import Bid, Listing, User
+
+from ._bench import add_scratch_argument, require_scratch
+
+
+class Command(BaseCommand):
+    help = "Compare the requests an auction takes with manual bidding and with maximum bids."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bidders", type=int, default=10)
+        parser.add_argument("--max-valuation", type=float, default=500)
+        parser.add_argument("--seed", type=int, default=None)
+        add_scratch_argument(parser)
+
+    def handle(self, *args, **options):
+        require_scratch(options)
+        rng = random.Random(options["seed"])
+        tag = f"bench-{uuid.uuid4().hex[:8]}"
+        seller = User.objects.create_user(f"{tag}-seller")
+        bidders = [User.objects.create_user(f"{tag}-{i}") for i in range(options["bidders"])]
+        valuations = {user.pk: round(rng.uniform(10, options["max_valuation"])) for user in bidders}
+
+        self.stdout.write(
+            f"{'mode':<9}{'submits':>9}{'requests':>10}{'bid rows':>10}{'price':>9}{'winner':>8}{'seconds':>9}"
+        )
+        try:
+            with override_settings(ALLOWED_HOSTS=["*"], RATE_LIMITS={}, WRITE_CONCURRENCY=None):
+                clients = {}
+                for user in bidders:
+                    clients[user.pk] = Client()
+                    clients[user.pk].force_login(user)
+                for mode in ("manual", "maximum"):
+                    self.auction(mode, rng, tag, seller, bidders, valuations, clients)
+        finally:
+            Listing.objects.filter(title__startswith=tag).delete()
+            User.objects.filter(username__startswith=tag).delete()
+        ranked = sorted(valuations.values(), reverse=True)
+        self.stdout.write(f"highest valuations: {ranked[:2]}")
+
+    def auction(self, mode, rng, tag, seller, bidders, valuations, clients):
+        listing = Listing.objects.create(
+            title=f"{tag}-{mode}", description="proxy bidding benchmark", starting_bid=1,
+            created=timezone.now(), seller=seller,
+        )
+        submits = requests = 0
+
+        def submit(user, amount):
+            nonlocal submits, requests
+            response = clients[user.pk].post(reverse("bid"), {"listing": listing.id, "amount": amount}, follow=True)
+            submits += 1
+            requests += 1 + len(response.redirect_chain)
+
+        began = time.perf_counter()
+        if mode == "manual":
+            while True:
+                listing.refresh_from_db(fields=["current_bid", "highest_bidder"])
+                price = listing.current_bid or listing.starting_bid
+                amount = price + increment(price)
+                contenders = [
+                    user for user in bidders
+                    if user.pk != listing.highest_bidder_id and valuations[user.pk] >= amount
+                ]
+                if not contenders:
+                    break
+                submit(rng.choice(contenders), amount)
+        else:
+            for user in rng.sample(bidders, len(bidders)):
+                submit(user, valuations[user.pk])
+        elapsed = time.perf_counter() - began
+
+        listing.refresh_from_db()
+        winner = bidders.index(next(user for user in bidders if user.pk == listing.highest_bidder_id))
+        rows = Bid.objects.filter(listing=listing).count()
+        self.stdout.write(
+            f"{mode:<9}{submits:>9}{requests:>10}{rows:>10}{listing.current_bid:>9.0f}{winner:>8}{elapsed:>9.2f}"
+        )
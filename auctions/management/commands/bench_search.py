@@ -0,0 +1,96 @@
+'''
+measure search latency as the listing table grows
+
+Run this against a scratch copy of the database: it inserts (and then
+deletes) the synthetic listings in the configured one.
+'''
+
+import random
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from auctions.models import Listing, User
+from auctions.search import search_listings
+
+from ._bench import add_scratch_argument, ms, percentile, require_scratch
+
+# a handful of words every catalog is full of, plus a long tail of
+# product-specific ones that grows with the catalog
+COMMON = ["vintage", "new", "used", "set", "large", "small", "black", "white"]
+
+
+def words(rng, tail):
+    return [rng.choice(COMMON), f"w{rng.randrange(tail)}", f"w{rng.randrange(tail)}"]
+
+
+class Command(BaseCommand):
+    help = "Benchmark full-text search latency at growing listing counts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="10000,100000,1000000",
+                            help="comma separated listing counts to measure at")
+        parser.add_argument("--queries", type=int, default=200, help="queries per kind and size")
+        parser.add_argument("--batch", type=int, default=5000)
+        parser.add_argument("--keep", action="store_true", help="keep the benchmark rows")
+        add_scratch_argument(parser)
+
+    def handle(self, *args, **options):
+        require_scratch(options)
+        rng = random.Random(1)
+        tag = f"bench-{uuid.uuid4().hex[:8]}"
+        seller = User.objects.create_user(tag)
+        now = timezone.now()
+        fields = ("id", "title", "description", "starting_bid", "current_bid", "imageURL")
+        inserted = 0
+
+        self.stdout.write(f"{'listings':>10} {'kind':>10} {'p50':>12} {'p95':>12} {'p99':>12}")
+        try:
+            for size in sorted(int(n) for n in options["sizes"].split(",")):
+                # the tail vocabulary scales with the catalog, as real
+                # product names do
+                tail = max(1000, size // 20)
+                while inserted < size:
+                    count = min(options["batch"], size - inserted)
+                    with transaction.atomic():
+                        Listing.objects.bulk_create([
+                            Listing(
+                                title=" ".join(words(rng, tail)),
+                                description=" ".join(words(rng, tail) + words(rng, tail)),
+                                starting_bid=1,
+                                price=1,
+                                created=now,
+                                seller=seller,
+                                category=rng.choice(Listing.Category.values),
+                            )
+                            for _ in range(count)
+                        ])
+                    inserted += count
+
+                kinds = {
+                    "rare": lambda: f"w{rng.randrange(tail)}",
+                    "two-term": lambda: f"{rng.choice(COMMON)} w{rng.randrange(tail)}",
+                    "category": lambda: f"w{rng.randrange(tail)}",
+                }
+                for kind, make_query in kinds.items():
+                    category = rng.choice(Listing.Category.values) if kind == "category" else None
+                    samples = []
+                    for _ in range(options["queries"]):
+                        query = make_query()
+                        began = time.perf_counter()
+                        search_listings(query, fields, category=category, limit=51)
+                        samples.append(time.perf_counter() - began)
+                    self.stdout.write(
+                        f"{size:>10} {kind:>10} {ms(percentile(samples, 50)):>12} "
+                        f"{ms(percentile(samples, 95)):>12} {ms(percentile(samples, 99)):>12}"
+                    )
+        finally:
+            if not options["keep"]:
+                # nothing references these rows, and a queryset delete
+                # would load every one of them to send signals
+                with connection.cursor() as cursor:
+                    cursor.execute("DELETE FROM auctions_listing WHERE seller_id = %s", [seller.id])
+                seller.delete()
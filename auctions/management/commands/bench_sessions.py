@@ -0,0 +1,72 @@
+'''
+request throughput with database and cached sessions
+
+Drives a few pages through the test client as a signed in user, first
+with the stock database session engine and ModelBackend, then with the
+configured cached ones, and reports requests per second and the queries
+each request ran.
+'''
+
+import time
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from auctions.models import Listing, User
+
+from ._bench import add_scratch_argument, ms, percentile, require_scratch
+
+STOCK = {
+    "SESSION_ENGINE": "django.contrib.sessions.backends.db",
+    "AUTHENTICATION_BACKENDS": ["django.contrib.auth.backends.ModelBackend"],
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark signed in page views with database and cached sessions."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=5.0, help="duration of each page run")
+        add_scratch_argument(parser)
+
+    def handle(self, *args, **options):
+        require_scratch(options)
+        user = User.objects.create_user(f"bench-{uuid.uuid4().hex[:8]}")
+        listing = Listing.objects.filter(active=True).order_by("-id").first()
+        pages = [reverse("index"), reverse("categories"), reverse("myWatchList")]
+        if listing:
+            pages.append(reverse("listing", args=[listing.id]))
+
+        self.stdout.write(f"{'':<8}{'page':<24}{'req/s':>9}{'p50':>12}{'queries':>9}")
+        try:
+            for mode, overrides in (("stock", STOCK), ("cached", {})):
+                with override_settings(ALLOWED_HOSTS=["*"], **overrides):
+                    client = Client()
+                    client.force_login(user, overrides.get("AUTHENTICATION_BACKENDS", settings.AUTHENTICATION_BACKENDS)[0])
+                    for page in pages:
+                        self.run(mode, client, page, options["seconds"])
+        finally:
+            user.delete()
+
+    def run(self, mode, client, page, seconds):
+        client.get(page)
+        with ExitStack() as stack:
+            captured = [stack.enter_context(CaptureQueriesContext(c)) for c in connections.all()]
+            client.get(page)
+        queries = sum(len(c) for c in captured)
+        samples = []
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            began = time.perf_counter()
+            client.get(page)
+            samples.append(time.perf_counter() - began)
+        self.stdout.write(
+            f"{mode:<8}{page:<24}{len(samples) / seconds:>9.1f}"
+            f"{ms(percentile(samples, 50)):>12}{queries:>9}"
+        )
@@ -0,0 +1,76 @@
+'''
+settle one auction with a very large watcher list
+'''
+
+import time
+import uuid
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from auctions.models import Bid, Listing, Notification, User
+from auctions.settlement import settle_listings
+
+from ._bench import add_scratch_argument, ms, require_scratch
+
+Watch = User.watchlist.through
+
+
+class Command(BaseCommand):
+    help = "Benchmark settling a listing watched by many users and check every one was notified."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--watchers", type=int, default=50000)
+        parser.add_argument("--bidders", type=int, default=200)
+        parser.add_argument("--keep", action="store_true", help="keep the benchmark rows")
+        add_scratch_argument(parser)
+
+    def handle(self, *args, **options):
+        require_scratch(options)
+        tag = f"bench-{uuid.uuid4().hex[:8]}"
+        password = make_password(None)
+        User.objects.bulk_create(
+            [User(username=f"{tag}-{i}", password=password) for i in range(options["watchers"])],
+            batch_size=2000,
+        )
+        users = list(User.objects.filter(username__startswith=tag).values_list("id", flat=True))
+        seller, bidders = users[0], users[1:options["bidders"] + 1]
+        now = timezone.now()
+        listing = Listing.objects.create(
+            title=tag, description="settlement benchmark", starting_bid=1, created=now, seller_id=seller,
+        )
+        Watch.objects.bulk_create([Watch(user_id=user, listing_id=listing.id) for user in users[1:]], batch_size=2000)
+        Bid.objects.bulk_create(
+            [Bid(listing=listing, user_id=user, amount=2 + n, placed=now) for n, user in enumerate(bidders)],
+            batch_size=2000,
+        )
+        Listing.objects.filter(pk=listing.pk).update(
+            current_bid=1 + len(bidders), price=1 + len(bidders), highest_bidder_id=bidders[-1], bid_count=len(bidders),
+        )
+
+        try:
+            with CaptureQueriesContext(connections["default"]) as queries:
+                began = time.perf_counter()
+                settle_listings([listing.id])
+                elapsed = time.perf_counter() - began
+
+            notified = Notification.objects.filter(listing=listing)
+            kinds = {kind: notified.filter(kind=kind).count() for kind in Notification.Kind.values}
+            if sum(kinds.values()) != len(users):
+                raise CommandError(f"{len(users)} users involved but {sum(kinds.values())} notified")
+            if kinds[Notification.Kind.WON] != 1:
+                raise CommandError("the winner was not notified exactly once")
+        finally:
+            if not options["keep"]:
+                listing.delete()
+                User.objects.filter(username__startswith=tag).delete()
+
+        self.stdout.write(f"watchers:       {len(users) - 1}")
+        self.stdout.write(f"bidders:        {len(bidders)}")
+        self.stdout.write(f"notified:       {kinds}")
+        self.stdout.write(f"queries:        {len(queries)}")
+        self.stdout.write(f"settled in:     {ms(elapsed)}")
+        self.stdout.write(self.style.SUCCESS("every watcher, bidder and the seller was notified once"))
@@ -0,0 +1,69 @@
+'''
+measure thumbnail throughput and what it saves in page weight
+
+Renders synthetic camera-sized photos through the same function and
+process pool the upload path uses, then compares the bytes an index page
+of cards would load with the originals and with the card variant.
+'''
+
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auctions.images import render_thumbnails, thumbnail_name
+
+from ._bench import percentile
+
+
+class Command(BaseCommand):
+    help = "Benchmark thumbnail rendering and the page weight of listing cards."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--images", type=int, default=24)
+        parser.add_argument("--width", type=int, default=4000)
+        parser.add_argument("--height", type=int, default=3000)
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+        parser.add_argument("--cards", type=int, default=50, help="cards on one index page")
+
+    def handle(self, *args, **options):
+        try:
+            from PIL import Image
+        except ImportError:
+            raise CommandError("Pillow is required for thumbnails.")
+
+        root = tempfile.mkdtemp(prefix="bench-thumbnails-")
+        try:
+            sources = []
+            for i in range(options["images"]):
+                path = os.path.join(root, f"photo-{i}.jpg")
+                # noise compresses about as badly as a real photo
+                image = Image.effect_noise((options["width"], options["height"]), 40 + i).convert("RGB")
+                image.save(path, "JPEG", quality=90)
+                sources.append(path)
+
+            with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+                # start the workers before timing
+                list(pool.map(abs, range(options["workers"])))
+                began = time.perf_counter()
+                keys = list(pool.map(render_thumbnails, sources, [root] * len(sources)))
+                elapsed = time.perf_counter() - began
+
+            original = [os.path.getsize(path) for path in sources]
+            card = [os.path.getsize(os.path.join(root, thumbnail_name(key, "card"))) for key in keys]
+            cards = options["cards"]
+            images = len(sources)
+
+            self.stdout.write(f"images:          {images} x {options['width']}x{options['height']}, {options['workers']} workers")
+            self.stdout.write(f"throughput:      {images / elapsed:.1f} images/s, {3 * images / elapsed:.1f} thumbnails/s")
+            self.stdout.write(f"original p50:    {percentile(original, 50) / 1024:.0f} KB")
+            self.stdout.write(f"card p50:        {percentile(card, 50) / 1024:.1f} KB")
+            self.stdout.write(
+                f"index page:      {cards * sum(original) / images / 1024 / 1024:.1f} MB of originals, "
+                f"{cards * sum(card) / images / 1024:.0f} KB of cards"
+            )
+        finally:
+            shutil.rmtree(root)
@@ -0,0 +1,32 @@
+'''
+close auctions whose end time has passed
+'''
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from auctions.expiry import sweep
+
+
+class Command(BaseCommand):
+    help = "Close expired auctions, once or continuously with --loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="listings closed per transaction")
+        parser.add_argument("--pause", type=float, default=0.05,
+                            help="seconds to wait between batches")
+        parser.add_argument("--loop", action="store_true", help="keep sweeping until interrupted")
+        parser.add_argument("--interval", type=float, default=5.0,
+                            help="seconds between sweeps with --loop")
+
+    def handle(self, *args, **options):
+        while True:
+            began = time.perf_counter()
+            closed = sweep(options["batch_size"], options["pause"])
+            if closed or options["verbosity"] > 1:
+                self.stdout.write(f"closed {closed} expired listings in {time.perf_counter() - began:.2f} s")
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,173 @@
+'''
+bulk import listings from CSV or JSON lines
+
+Rows are streamed one at a time, validated against the Listing field rules
+and inserted with bulk_create, so memory use does not depend on the size
+of the file.
+'''
+
+import csv
+import json
+import sys
+import time
+from collections import Counter
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from auctions.facets import invalidate_category_counts
+from auctions.models import Listing, User
+
+# columns read from the file; seller is a username
+FIELDS = ("title", "description", "starting_bid", "category", "imageURL", "created")
+REQUIRED = ("title", "description", "starting_bid")
+
+
+def open_text(path, mode):
+    try:
+        return open(path, mode, newline="", encoding="utf-8")
+    except OSError as e:
+        raise CommandError(f"Can't open {path}: {e.strerror}.")
+
+
+class RowRejected(Exception):
+    def __init__(self, errors):
+        super().__init__("; ".join(f"{field}: {message}" for field, _, message in errors))
+        self.errors = errors
+
+
+class Command(BaseCommand):
+    help = "Import listings from a CSV or JSONL file (use - for stdin)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "jsonl"],
+                            help="file format, guessed from the extension by default")
+        parser.add_argument("--seller", help="username to use for rows without a seller column")
+        parser.add_argument("--batch-size", type=int, default=1000,
+                            help="rows per bulk_create call")
+        parser.add_argument("--transaction-size", type=int, default=20000,
+                            help="rows per transaction")
+        parser.add_argument("--rejects", help="write rejected rows with their errors to this CSV file")
+
+    def handle(self, *args, **options):
+        fmt = options["format"] or ("jsonl" if options["path"].endswith((".jsonl", ".json")) else "csv")
+        self.sellers = {}
+        self.default_seller = None
+        if options["seller"]:
+            self.default_seller = self.seller(options["seller"])
+            if self.default_seller is None:
+                raise CommandError(f"No user named {options['seller']}.")
+        self.now = timezone.now()
+        batch_size = options["batch_size"]
+        transaction_size = max(options["transaction_size"], batch_size)
+
+        stream = sys.stdin if options["path"] == "-" else open_text(options["path"], "r")
+        try:
+            rejects_file = open_text(options["rejects"], "w") if options["rejects"] else None
+        except CommandError:
+            if stream is not sys.stdin:
+                stream.close()
+            raise
+        rejects = csv.writer(rejects_file) if rejects_file else None
+        if rejects:
+            rejects.writerow(["line", "errors"])
+
+        reasons = Counter()
+        imported = rejected = 0
+        began = time.perf_counter()
+        try:
+            rows = self.read(stream, fmt)
+            while True:
+                chunk = list(islice(rows, transaction_size))
+                if not chunk:
+                    break
+                listings = []
+                for line, row in chunk:
+                    try:
+                        listings.append(self.build(row))
+                    except RowRejected as e:
+                        rejected += 1
+                        reasons.update((field, code) for field, code, _ in e.errors)
+                        if rejects:
+                            rejects.writerow([line, str(e)])
+                with transaction.atomic():
+                    Listing.objects.bulk_create(listings, batch_size=batch_size)
+                    invalidate_category_counts()
+                imported += len(listings)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"{imported} imported, {rejected} rejected")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            if rejects_file:
+                rejects_file.close()
+
+        elapsed = time.perf_counter() - began
+        self.stdout.write(f"imported:  {imported}")
+        self.stdout.write(f"rejected:  {rejected}")
+        self.stdout.write(f"elapsed:   {elapsed:.1f} s ({(imported + rejected) / elapsed if elapsed else 0:.0f} rows/s)")
+        for (field, code), count in reasons.most_common(10):
+            self.stdout.write(f"  {count:>8}  {field}: {code}")
+
+    def read(self, stream, fmt):
+        '''
+        yield (line number, row dict) pairs
+        '''
+        if fmt == "csv":
+            reader = csv.DictReader(stream)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line, text in enumerate(stream, 1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError:
+                row = None
+            yield line, row if isinstance(row, dict) else {"__error__": "not a JSON object"}
+
+    def seller(self, username):
+        if username not in self.sellers:
+            user = User.objects.filter(username=username).only("id").first()
+            self.sellers[username] = user.id if user else None
+        return self.sellers[username]
+
+    def build(self, row):
+        '''
+        return an unsaved Listing for the row or raise RowRejected
+        '''
+        if "__error__" in row:
+            raise RowRejected([("row", "invalid", row["__error__"])])
+
+        errors, values = [], {}
+        for name in FIELDS:
+            field = Listing._meta.get_field(name)
+            value = row.get(name)
+            if isinstance(value, str):
+                value = value.strip()
+            if value in ("", None):
+                if name in REQUIRED:
+                    errors.append((name, "required", "This field is required."))
+                    continue
+                # a missing optional value takes the default as it is; the
+                # default is not necessarily valid input (a null imageURL)
+                values[name] = self.now if name == "created" else field.get_default()
+                continue
+            try:
+                values[name] = field.clean(value, None)
+            except ValidationError as e:
+                errors.append((name, e.error_list[0].code or "invalid", " ".join(e.messages)))
+
+        username = row.get("seller")
+        seller_id = self.seller(str(username).strip()) if username else self.default_seller
+        if seller_id is None:
+            errors.append(("seller", "unknown", f"No user named {username}." if username else "No seller given."))
+
+        if errors:
+            raise RowRejected(errors)
+        return Listing(seller_id=seller_id, price=values["starting_bid"], **values)
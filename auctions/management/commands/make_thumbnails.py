@@ -0,0 +1,42 @@
+'''
+render thumbnails that are missing, e.g. because their job failed for
+good, in a process pool
+'''
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.conf import settings
+
+from auctions.caching import bump_listing_version
+from auctions.images import executor, render_thumbnails
+from auctions.models import Listing
+
+
+class Command(BaseCommand):
+    help = "Render thumbnails for uploaded listing images that have none."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="render every listing's thumbnails again")
+
+    def handle(self, *args, **options):
+        listings = Listing.objects.exclude(image="")
+        if not options["all"]:
+            listings = listings.filter(thumbnail_key="")
+
+        pending = {}
+        for listing_id, image in listings.values_list("id", "image").iterator():
+            future = executor().submit(render_thumbnails, default_storage.path(image), settings.MEDIA_ROOT)
+            pending[future] = listing_id
+
+        done = failed = 0
+        for future, listing_id in pending.items():
+            try:
+                key = future.result()
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"listing {listing_id}: {e}")
+                continue
+            Listing.objects.filter(pk=listing_id).update(thumbnail_key=key)
+            bump_listing_version(listing_id)
+            done += 1
+        self.stdout.write(f"rendered thumbnails for {done} listings, {failed} failed")
@@ -0,0 +1,129 @@
+'''
+run background jobs until interrupted
+
+Each process runs --threads workers, which suits jobs that mostly wait on
+the database, storage or the network. Jobs that burn CPU in Python, like
+thumbnails, want --processes. Django is set up in each spawned process,
+so nothing here may touch models at import time.
+'''
+
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+WORKER_OPTIONS = ("threads", "batch_size", "poll_interval", "burst", "metrics_port")
+
+
+def serve_metrics(port):
+    '''
+    serve this process's metrics registry on localhost ``port``
+    '''
+    from auctions import metrics
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = metrics.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", metrics.CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def work(index, options, stop):
+    '''
+    run the workers of process ``index`` until ``stop`` is set and return
+    how many jobs they finished and how many failed
+    '''
+    from auctions.jobs import Worker
+
+    if options["metrics_port"]:
+        serve_metrics(options["metrics_port"] + index)
+    prefix = f"{socket.gethostname()[:40]}:{os.getpid()}"
+    workers = [
+        Worker(f"{prefix}:{n}", stop, options["batch_size"], options["poll_interval"])
+        for n in range(options["threads"])
+    ]
+    threads = [threading.Thread(target=worker.run, args=(options["burst"],)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        # joined with a timeout so signals still reach the main thread
+        while thread.is_alive():
+            thread.join(0.5)
+    return sum(worker.done for worker in workers), sum(worker.failed for worker in workers)
+
+
+def work_in_process(index, options, shutdown):
+    '''
+    run process ``index`` until the parent sets ``shutdown`` or this
+    process is sent SIGINT or SIGTERM
+    '''
+    import django
+
+    django.setup()
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stop.set())
+
+    def relay():
+        shutdown.wait()
+        stop.set()
+
+    threading.Thread(target=relay, daemon=True).start()
+    work(index, options, stop)
+
+
+class Command(BaseCommand):
+    help = "Run background jobs from the database queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", type=int, default=1,
+                            help="worker processes; more than one are spawned")
+        parser.add_argument("--threads", type=int, default=4, help="workers per process")
+        parser.add_argument("--batch-size", type=int, default=10, help="jobs claimed at a time")
+        parser.add_argument("--poll-interval", type=float, default=1.0,
+                            help="seconds an idle worker waits before looking again")
+        parser.add_argument("--burst", action="store_true", help="exit once nothing is due")
+        parser.add_argument("--metrics-port", type=int, default=0,
+                            help="serve metrics on localhost from this port, one port per process")
+
+    def handle(self, *args, **options):
+        worker_options = {name: options[name] for name in WORKER_OPTIONS}
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+
+        if options["processes"] == 1:
+            done, failed = work(0, worker_options, stop)
+            self.stdout.write(f"ran {done} jobs, {failed} failed")
+            return
+
+        context = multiprocessing.get_context("spawn")
+        shutdown = context.Event()
+        processes = [
+            context.Process(target=work_in_process, args=(index, worker_options, shutdown))
+            for index in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+        while any(process.is_alive() for process in processes):
+            if stop.wait(0.5):
+                # each process finishes the batch it holds, then exits;
+                # terminating them would leave their jobs leased
+                shutdown.set()
+                break
+        for process in processes:
+            process.join()
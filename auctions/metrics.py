@@ -0,0 +1,202 @@
+'''
+in-process request, SQL and background job metrics in the Prometheus text format
+
+Each process keeps its own registry; Prometheus scrapes every process
+(or worker) and sums them. Recording is a dictionary update under one
+lock, cheap enough to leave on under load.
+'''
+
+import bisect
+import threading
+from collections import defaultdict
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, registry, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.lock = registry.lock
+        self.values = defaultdict(float)
+        registry.register(self)
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] += amount
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {_number(value)}"
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, registry, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.lock = registry.lock
+        self.values = {}
+        registry.register(self)
+
+    def set(self, *labels, value):
+        with self.lock:
+            self.values[labels] = value
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, registry, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self.lock = registry.lock
+        # labels -> [count per bucket (+Inf last), sum]
+        self.values = {}
+        registry.register(self)
+
+    def observe(self, *labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            state = self.values.get(labels)
+            if state is None:
+                state = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _labels(self.labels, labels, [("le", _number(bound))])
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for metric in self.metrics:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+requests_total = Counter(
+    REGISTRY, "auctions_requests_total",
+    "Requests handled, by view, method and status code.",
+    ("view", "method", "status"),
+)
+request_duration = Histogram(
+    REGISTRY, "auctions_request_duration_seconds",
+    "Time spent handling a request, by view.",
+    ("view",),
+)
+sql_queries_total = Counter(
+    REGISTRY, "auctions_sql_queries_total",
+    "SQL queries executed, by view.",
+    ("view",),
+)
+sql_duration_total = Counter(
+    REGISTRY, "auctions_sql_duration_seconds_total",
+    "Time spent in SQL queries, by view.",
+    ("view",),
+)
+sql_queries_per_request = Histogram(
+    REGISTRY, "auctions_sql_queries_per_request",
+    "SQL queries executed per request, by view.",
+    ("view",), buckets=QUERY_COUNT_BUCKETS,
+)
+slow_queries_total = Counter(
+    REGISTRY, "auctions_slow_queries_total",
+    "SQL queries slower than SLOW_QUERY_THRESHOLD, by view.",
+    ("view",),
+)
+shed_requests_total = Counter(
+    REGISTRY, "auctions_shed_requests_total",
+    "Write requests answered 429, by view and reason (user, listing, concurrency).",
+    ("view", "reason"),
+)
+
+jobs_total = Counter(
+    REGISTRY, "auctions_jobs_total",
+    "Background jobs run, by task and outcome (done, retried, failed).",
+    ("task", "outcome"),
+)
+job_duration = Histogram(
+    REGISTRY, "auctions_job_duration_seconds",
+    "Time spent running a background job, by task.",
+    ("task",),
+)
+job_wait = Histogram(
+    REGISTRY, "auctions_job_wait_seconds",
+    "Time from when a background job was due until a worker started it, by task.",
+    ("task",),
+)
+# the whole queue as a worker last counted it, so every worker process
+# reports the same thing: aggregate with max, not sum
+job_queue_depth = Gauge(
+    REGISTRY, "auctions_job_queue_depth",
+    "Background jobs in the queue, by state; due counts the queued jobs ready to run.",
+    ("state",),
+)
+
+
+def record_request(view, method, status, duration, queries, sql_duration, slow):
+    requests_total.inc(view, method, str(status))
+    request_duration.observe(view, value=duration)
+    sql_queries_total.inc(view, amount=queries)
+    sql_duration_total.inc(view, amount=sql_duration)
+    sql_queries_per_request.observe(view, value=queries)
+    if slow:
+        slow_queries_total.inc(view, amount=slow)
+
+
+def render():
+    return REGISTRY.render()
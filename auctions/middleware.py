@@ -0,0 +1,184 @@
+'''
+request instrumentation and static files
+
+MetricsMiddleware times every request and every SQL query it runs,
+records them in auctions.metrics, logs queries slower than
+SLOW_QUERY_THRESHOLD and reports the numbers to the browser in a
+Server-Timing header. StaticFilesMiddleware serves the collected assets.
+'''
+
+import logging
+import mimetypes
+import os
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from . import metrics
+
+logger = logging.getLogger("auctions.sql")
+
+# Content-Encoding -> suffix of the precompressed file, in order of preference
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+
+def view_name(request):
+    match = request.resolver_match
+    return match.view_name if match else "unmatched"
+
+
+class QueryTimer:
+    '''
+    database execute wrapper counting and timing the queries of one request
+    '''
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+        self.count = 0
+        self.duration = 0.0
+        self.slow = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - began
+            self.count += 1
+            self.duration += elapsed
+            if elapsed >= self.threshold:
+                self.slow += 1
+                # parameters are left out, they can hold passwords
+                logger.warning("slow query (%.1f ms) in %s: %s", elapsed * 1000, view_name(self.request), sql)
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.threshold = getattr(settings, "SLOW_QUERY_THRESHOLD", 0.1)
+        self.server_timing = getattr(settings, "SERVER_TIMING", True)
+
+    def __call__(self, request):
+        timer = QueryTimer(request, self.threshold)
+        began = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        duration = time.perf_counter() - began
+
+        metrics.record_request(
+            view_name(request), request.method, response.status_code,
+            duration, timer.count, timer.duration, timer.slow,
+        )
+        if self.server_timing:
+            response["Server-Timing"] = (
+                f'db;dur={timer.duration * 1000:.2f};desc="{timer.count} queries", '
+                f"app;dur={duration * 1000:.2f}"
+            )
+        return response
+
+
+
+def accepted_encodings(header):
+    accepted = set()
+    for token in header.split(","):
+        encoding, _, params = token.partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(encoding.strip().lower())
+    return accepted
+
+
+class StaticFile:
+    '''
+    one collected asset and its precompressed variants
+    '''
+    def __init__(self, path, content_type, immutable, encodings):
+        self.path = path
+        self.content_type = content_type
+        self.immutable = immutable
+        # [(encoding, path)], best first
+        self.encodings = encodings
+        self.last_modified = os.stat(path).st_mtime
+
+
+class StaticFilesMiddleware:
+    '''
+    serve STATIC_ROOT, preferring the brotli or gzip version of a file when
+    the browser accepts it; files with hashed names never expire
+
+    The directory is scanned once when the server starts, so a request
+    costs a dictionary lookup and requests for anything else under
+    STATIC_URL fall through to the views. Under DEBUG runserver serves the
+    source files itself.
+    '''
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL
+        self.files = {}
+        root = getattr(settings, "STATIC_ROOT", None)
+        if root and os.path.isdir(root):
+            self.files = self.scan(root)
+
+    def scan(self, root):
+        immutable = set(getattr(staticfiles_storage, "hashed_files", {}).values())
+        files = {}
+        for directory, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, root).replace(os.sep, "/")
+                if name.endswith(tuple(ENCODINGS.values())):
+                    continue
+                encodings = [
+                    (encoding, path + suffix) for encoding, suffix in ENCODINGS.items()
+                    if os.path.isfile(path + suffix)
+                ]
+                content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+                files[name] = StaticFile(path, content_type, name in immutable, encodings)
+        return files
+
+    def __call__(self, request):
+        if self.files and request.method in ("GET", "HEAD") and request.path_info.startswith(self.prefix):
+            static = self.files.get(request.path_info[len(self.prefix):])
+            if static is not None:
+                return self.serve(request, static)
+        return self.get_response(request)
+
+    def serve(self, request, static):
+        if static.immutable:
+            cache_control = "public, max-age=31536000, immutable"
+        else:
+            cache_control = "public, max-age=60"
+            if not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), static.last_modified):
+                response = HttpResponseNotModified()
+                response["Cache-Control"] = cache_control
+                return response
+
+        accepted = accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        path, encoding = static.path, None
+        for candidate, candidate_path in static.encodings:
+            if candidate in accepted:
+                path, encoding = candidate_path, candidate
+                break
+
+        response = FileResponse(open(path, "rb"), content_type=static.content_type)
+        if encoding:
+            response["Content-Encoding"] = encoding
+        if static.encodings:
+            patch_vary_headers(response, ["Accept-Encoding"])
+        response["Cache-Control"] = cache_control
+        response["Last-Modified"] = http_date(static.last_modified)
+        return response
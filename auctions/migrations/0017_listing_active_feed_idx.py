@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 16:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0016_auto_20210116_1958'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(active=True), fields=['-created', '-id'], name='listing_active_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from auctions import search
+    search.install(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from auctions import search
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0017_listing_active_feed_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
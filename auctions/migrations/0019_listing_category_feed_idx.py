@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0018_listing_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(active=True), fields=['category', '-created', '-id'], name='listing_category_feed_idx'),
+        ),
+    ]
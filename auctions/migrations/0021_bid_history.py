@@ -0,0 +1,47 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:07
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+
+
+def count_bids(apps, schema_editor):
+    Bid = apps.get_model('auctions', 'Bid')
+    Listing = apps.get_model('auctions', 'Listing')
+    counts = (
+        Bid.objects.filter(listing=OuterRef('pk'))
+        .order_by().values('listing').annotate(n=Count('pk')).values('n')
+    )
+    # one UPDATE with a correlated count; listings without bids keep 0
+    Listing.objects.using(schema_editor.connection.alias).filter(
+        pk__in=Bid.objects.values('listing')
+    ).update(bid_count=Subquery(counts, output_field=IntegerField()))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0020_listing_ends_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bid',
+            name='placed',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='bid_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='last_bid_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='bid',
+            index=models.Index(fields=['listing', 'amount'], name='bid_listing_amount_idx'),
+        ),
+        migrations.RunPython(count_bids, migrations.RunPython.noop),
+    ]
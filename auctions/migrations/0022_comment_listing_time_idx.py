@@ -0,0 +1,17 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0021_bid_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['listing', 'datetime'], name='comment_listing_time_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0022_comment_listing_time_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='image',
+            field=models.FileField(blank=True, upload_to='listings'),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='thumbnail_key',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:33
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+
+
+def record_winners(apps, schema_editor):
+    Listing = apps.get_model('auctions', 'Listing')
+    # closed auctions were won by whoever was highest when they closed
+    Listing.objects.using(schema_editor.connection.alias).filter(active=False).update(
+        winner=F('highest_bidder'), final_price=F('current_bid'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0023_listing_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='closed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='final_price',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='winner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='won', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ended', 'Auction ended'), ('won', 'You won'), ('outbid', 'You were outbid')], max_length=8)),
+                ('created', models.DateTimeField()),
+                ('read', models.BooleanField(default=False)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auctions.listing')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'id'], name='notification_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(read=False), fields=['user'], name='notification_unread_idx'),
+        ),
+        migrations.RunPython(record_winners, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:44
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+
+
+def count_watchers(apps, schema_editor):
+    Listing = apps.get_model('auctions', 'Listing')
+    Watch = apps.get_model('auctions', 'User').watchlist.through
+    watchers = (
+        Watch.objects.filter(listing_id=OuterRef('pk')).order_by()
+        .values('listing_id').annotate(n=Count('id')).values('n')
+    )
+    Listing.objects.using(schema_editor.connection.alias).filter(id__in=Watch.objects.values('listing_id')).update(
+        watcher_count=Subquery(watchers),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0025_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='view_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='listing',
+            name='watcher_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(count_watchers, migrations.RunPython.noop),
+    ]
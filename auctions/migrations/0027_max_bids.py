@@ -0,0 +1,34 @@
+# Generated by Django 3.1.14 on 2026-10-18 17:58
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0026_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bid',
+            name='automatic',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='MaxBid',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.FloatField()),
+                ('placed', models.DateTimeField()),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='auctions.listing')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='maxbid',
+            constraint=models.UniqueConstraint(fields=('listing', 'user'), name='maxbid_listing_user_unique'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.1.14 on 2026-10-18 18:40
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def store_prices(apps, schema_editor):
+    Listing = apps.get_model('auctions', 'Listing')
+    Listing.objects.using(schema_editor.connection.alias).update(price=Coalesce('current_bid', 'starting_bid'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auctions', '0027_max_bids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listing',
+            name='price',
+            field=models.FloatField(default=0, editable=False),
+            preserve_default=False,
+        ),
+        migrations.RunPython(store_prices, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(('active', True), ('ends_at__isnull', False)), fields=['category', 'ends_at', 'id'], name='listing_category_expiry_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(active=True), fields=['price', 'id'], name='listing_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(condition=models.Q(active=True), fields=['category', 'price', 'id'], name='listing_category_price_idx'),
+        ),
+    ]
@@ -4,8 +4,11 @@ models for auction
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from .images import ORIGINAL_DIR, thumbnail_url
+
 class Comment(models.Model):
     author = models.ForeignKey(
         'User',
@@ -21,6 +24,12 @@ class Comment(models.Model):
         on_delete=models.CASCADE,
     )
 
+    class Meta:
+        indexes = [
+            # read backwards for newest first; the rowid breaks ties
+            models.Index(fields=["listing", "datetime"], name="comment_listing_time_idx"),
+        ]
+
 class Listing(models.Model):
 
     class Category(models.TextChoices):
@@ -34,7 +43,14 @@ class Listing(models.Model):
     description = models.CharField(max_length=300)
     starting_bid = models.FloatField()
     current_bid = models.FloatField(null=True, blank=True)
+    # the price shown, current_bid or else starting_bid, stored so price
+    # filters and sorts can use an index; save() and bidding.place_bid
+    # keep it in step, and bulk inserts must set it
+    price = models.FloatField(editable=False)
     imageURL = models.URLField(null=True)
+    # an uploaded original, and the key of its thumbnails once rendered
+    image = models.FileField(upload_to=ORIGINAL_DIR, blank=True)
+    thumbnail_key = models.CharField(max_length=32, blank=True)
     category = models.CharField(
         max_length=2,
         choices=Category.choices,
@@ -54,10 +70,102 @@ class Listing(models.Model):
         blank=True,
     )
     active = models.BooleanField(default=True)
+    ends_at = models.DateTimeField(null=True, blank=True)
+    # kept up to date by bidding.place_bid
+    bid_count = models.PositiveIntegerField(default=0)
+    last_bid_at = models.DateTimeField(null=True, blank=True)
+    # written behind by auctions.counters, a few seconds late; not
+    # positive-only, a check failing one flush would hold back all of them
+    view_count = models.IntegerField(default=0)
+    watcher_count = models.IntegerField(default=0)
+    # recorded by settlement.settle_listings when the auction closes
+    winner = models.ForeignKey(
+        'User',
+        on_delete=models.SET_NULL,
+        related_name="won",
+        null=True,
+        blank=True,
+    )
+    final_price = models.FloatField(null=True, blank=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["-created", "-id"],
+                name="listing_active_feed_idx",
+                condition=models.Q(active=True),
+            ),
+            models.Index(
+                fields=["category", "-created", "-id"],
+                name="listing_category_feed_idx",
+                condition=models.Q(active=True),
+            ),
+            models.Index(
+                fields=["ends_at", "id"],
+                name="listing_expiry_idx",
+                condition=models.Q(active=True, ends_at__isnull=False),
+            ),
+            models.Index(
+                fields=["category", "ends_at", "id"],
+                name="listing_category_expiry_idx",
+                condition=models.Q(active=True, ends_at__isnull=False),
+            ),
+            # read backwards for the most expensive first
+            models.Index(
+                fields=["price", "id"],
+                name="listing_price_idx",
+                condition=models.Q(active=True),
+            ),
+            models.Index(
+                fields=["category", "price", "id"],
+                name="listing_category_price_idx",
+                condition=models.Q(active=True),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.title}"
 
+    def save(self, *args, **kwargs):
+        self.price = self.current_bid if self.current_bid is not None else self.starting_bid
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"current_bid", "starting_bid"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "price"}
+        super().save(*args, **kwargs)
+
+    @property
+    def card_image(self):
+        '''
+        the small thumbnail, never the original; linked images are only
+        left for listings from before uploads
+        '''
+        if self.thumbnail_key:
+            return thumbnail_url(self.thumbnail_key, "card")
+        return self.imageURL
+
+    @property
+    def detail_image(self):
+        if self.thumbnail_key:
+            return thumbnail_url(self.thumbnail_key, "detail")
+        if self.image:
+            return self.image.url
+        return self.imageURL
+
+    @property
+    def retina_image(self):
+        if self.thumbnail_key:
+            return thumbnail_url(self.thumbnail_key, "retina")
+        return None
+
+    @property
+    def taking_bids(self):
+        '''
+        the row-level open_for_bids of auctions/bidding.py: an expired
+        auction takes no bids even before the sweeper has closed it
+        '''
+        return self.active and (self.ends_at is None or self.ends_at > timezone.now())
+
 class User(AbstractUser):
     watchlist = models.ManyToManyField(Listing, default=None, blank=True)
 
@@ -70,4 +178,98 @@ class Bid(models.Model):
     listing = models.ForeignKey(
         'Listing',
         on_delete=models.CASCADE,
-    )
\ No newline at end of file
+    )
+    # unknown for bids placed before it was recorded
+    placed = models.DateTimeField(null=True, blank=True)
+    # raised by the bidding engine up to the bidder's maximum
+    automatic = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["listing", "amount"], name="bid_listing_amount_idx"),
+        ]
+
+class MaxBid(models.Model):
+    '''
+    the most a user will pay for a listing; bidding.place_bid bids on
+    their behalf up to it
+    '''
+    user = models.ForeignKey(
+        'User',
+        on_delete=models.CASCADE,
+    )
+    listing = models.ForeignKey(
+        'Listing',
+        on_delete=models.CASCADE,
+    )
+    amount = models.FloatField()
+    # the earlier of two equal maximums wins
+    placed = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["listing", "user"], name="maxbid_listing_user_unique"),
+        ]
+
+class Notification(models.Model):
+    '''
+    something a user should hear about, shown until they have seen it
+    '''
+    class Kind(models.TextChoices):
+        ENDED = "ended", _("Auction ended")
+        WON = "won", _("You won")
+        OUTBID = "outbid", _("You were outbid")
+
+    user = models.ForeignKey(
+        'User',
+        on_delete=models.CASCADE,
+    )
+    listing = models.ForeignKey(
+        'Listing',
+        on_delete=models.CASCADE,
+    )
+    kind = models.CharField(max_length=8, choices=Kind.choices)
+    created = models.DateTimeField()
+    read = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # a user's notifications newest first, read backwards
+            models.Index(fields=["user", "id"], name="notification_user_idx"),
+            # counts the unread badge without touching read rows
+            models.Index(fields=["user"], name="notification_unread_idx", condition=models.Q(read=False)),
+        ]
+
+class Job(models.Model):
+    '''
+    a call to run outside the request, see auctions/jobs.py
+    '''
+    class State(models.TextChoices):
+        QUEUED = "queued", _("Queued")
+        RUNNING = "running", _("Running")
+        FAILED = "failed", _("Failed")
+
+    # dotted path of the function to call
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    state = models.CharField(max_length=8, choices=State.choices, default=State.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    created = models.DateTimeField()
+    # not run before this; pushed back after each failed attempt
+    run_at = models.DateTimeField()
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    claimed_by = models.CharField(max_length=64, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # due jobs in order, without scanning running or failed ones
+            models.Index(fields=["run_at", "id"], name="job_queued_idx", condition=models.Q(state="queued")),
+            # running jobs whose lease has expired
+            models.Index(fields=["claimed_at"], name="job_running_idx", condition=models.Q(state="running")),
+        ]
+
+    def __str__(self):
+        return f"{self.task} ({self.state})"
@@ -0,0 +1,111 @@
+'''
+notifications and the unread badge
+
+Settling an auction notifies its winner, the other bidders, and the
+watchers and seller who did not bid. The rows are written set-based, one
+INSERT ... SELECT per kind for a whole batch of listings, so a listing
+with tens of thousands of watchers costs two statements rather than a
+round trip per watcher.
+
+Each user's unread count is cached. A missing count is taken from the
+partial index on unread rows; after a fan-out commits, the counts of
+everyone it reached are dropped.
+'''
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, router, transaction
+
+from .models import Bid, Listing, Notification, User
+
+Watch = User.watchlist.through
+# cache keys deleted per round trip when dropping counts
+FORGET_BATCH = 1000
+
+
+def _unread_key(user_id):
+    return f"notifications:{user_id}:unread"
+
+
+def unread_timeout():
+    return getattr(settings, "NOTIFICATION_COUNT_TIMEOUT", 300)
+
+
+def unread_count(user):
+    key = _unread_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(user_id=user.pk, read=False).count()
+        cache.set(key, count, unread_timeout())
+    return count
+
+
+def mark_read(user, ids):
+    '''
+    mark the user's notifications ``ids``, the ones they were shown, read
+    '''
+    Notification.objects.filter(user_id=user.pk, id__in=ids, read=False).update(read=True)
+    # dropped rather than set to 0, a fan-out may have committed meanwhile
+    cache.delete(_unread_key(user.pk))
+
+
+def forget_unread(user_ids):
+    keys = [_unread_key(user_id) for user_id in user_ids]
+    for start in range(0, len(keys), FORGET_BATCH):
+        cache.delete_many(keys[start:start + FORGET_BATCH])
+
+
+def recipients(listing_ids):
+    '''
+    ids of everyone notified about the settlement of ``listing_ids``
+    '''
+    users = set(Watch.objects.filter(listing_id__in=listing_ids).values_list("user_id", flat=True))
+    users.update(Bid.objects.filter(listing_id__in=listing_ids).values_list("user_id", flat=True).distinct())
+    users.update(Listing.objects.filter(id__in=listing_ids).values_list("seller_id", flat=True))
+    return users
+
+
+def notify_settled(listing_ids, now):
+    '''
+    Notify everyone involved in the just settled ``listing_ids``, inside
+    the settling transaction, and return the number of notifications.
+    Every user hears once per listing: the winner that they won, the other
+    bidders that they were outbid, and the watchers and the seller that the
+    auction ended.
+    '''
+    connection = connections[router.db_for_write(Notification)]
+    qn = connection.ops.quote_name
+    notification = qn(Notification._meta.db_table)
+    bid = qn(Bid._meta.db_table)
+    listing = qn(Listing._meta.db_table)
+    watch = qn(Watch._meta.db_table)
+    columns = ", ".join(qn(column) for column in ("user_id", "listing_id", "kind", "created", "read"))
+    ids = ", ".join(["%s"] * len(listing_ids))
+    created = connection.ops.adapt_datetimefield_value(now)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {notification} ({columns}) "
+            f"SELECT DISTINCT b.user_id, b.listing_id, "
+            f"CASE WHEN b.user_id = l.winner_id THEN %s ELSE %s END, %s, %s "
+            f"FROM {bid} b INNER JOIN {listing} l ON l.id = b.listing_id "
+            f"WHERE b.listing_id IN ({ids})",
+            [Notification.Kind.WON, Notification.Kind.OUTBID, created, False, *listing_ids],
+        )
+        written = cursor.rowcount
+        # the ids are bound once, a sweeper batch would otherwise need
+        # three times as many parameters
+        cursor.execute(
+            f"WITH settled (id) AS (SELECT id FROM {listing} WHERE id IN ({ids})) "
+            f"INSERT INTO {notification} ({columns}) "
+            f"SELECT user_id, listing_id, %s, %s, %s FROM ("
+            f"SELECT w.user_id, w.listing_id FROM {watch} w WHERE w.listing_id IN (SELECT id FROM settled) "
+            f"UNION SELECT l.seller_id, l.id FROM {listing} l WHERE l.id IN (SELECT id FROM settled) "
+            f"EXCEPT SELECT b.user_id, b.listing_id FROM {bid} b WHERE b.listing_id IN (SELECT id FROM settled))",
+            [*listing_ids, Notification.Kind.ENDED, created, False],
+        )
+        written += cursor.rowcount
+
+    listing_ids = list(listing_ids)
+    transaction.on_commit(lambda: forget_unread(recipients(listing_ids)))
+    return written
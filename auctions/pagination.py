@@ -0,0 +1,107 @@
+'''
+keyset (cursor) pagination for listing feeds
+
+Pages are fetched with a range condition on an ordered, indexed key
+instead of an OFFSET, so page N costs the same as page 1. A cursor
+names the ordering it was made for and is refused under any other.
+'''
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    '''
+    one page of a keyset paginated queryset
+    '''
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _key_fields(model, ordering):
+    fields = []
+    for key in ordering:
+        name = key.lstrip("-")
+        fields.append((name, key.startswith("-"), model._meta.get_field(name)))
+    return fields
+
+
+def encode_cursor(values, ordering):
+    raw = json.dumps([",".join(ordering)] + [str(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token, model, ordering):
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        fields = _key_fields(model, ordering)
+        # a cursor from another ordering would skip or repeat rows
+        if not isinstance(raw, list) or raw[:1] != [",".join(ordering)] or len(raw) != len(fields) + 1:
+            raise InvalidCursor(token)
+        return [field.to_python(value) for (_, _, field), value in zip(fields, raw[1:])]
+    except (ValueError, TypeError, ValidationError) as e:
+        raise InvalidCursor(token) from e
+
+
+def _after(fields, values):
+    '''
+    Build the condition selecting rows strictly after ``values`` in the
+    ordering. The leading key is bounded on its own (inclusive) so the
+    database can seek into the index instead of scanning from the start.
+    '''
+    def op(descending):
+        return "lt" if descending else "gt"
+
+    (first, first_desc, _), first_value = fields[0], values[0]
+    bound = Q(**{f"{first}__{'lte' if first_desc else 'gte'}": first_value})
+
+    after = Q()
+    for i, (name, descending, _) in enumerate(fields):
+        equal = {fields[j][0]: values[j] for j in range(i)}
+        after |= Q(**equal, **{f"{name}__{op(descending)}": values[i]})
+    return bound & after
+
+
+def keyset_paginate(queryset, ordering, cursor=None, per_page=50):
+    '''
+    Return the page of ``queryset`` following ``cursor`` in ``ordering``.
+    The last key in ``ordering`` must be unique (normally ``id``) so that
+    every row has a distinct position. ``values()`` querysets work too, as
+    long as they include the ordering keys.
+    '''
+    fields = _key_fields(queryset.model, ordering)
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor, queryset.model, ordering)
+        queryset = queryset.filter(_after(fields, values))
+
+    items = list(queryset[:per_page + 1])
+    next_cursor = None
+    if len(items) > per_page:
+        items = items[:per_page]
+        last = items[-1]
+        if isinstance(last, dict):
+            values = [last[name] for name, _, _ in fields]
+        else:
+            values = [getattr(last, name) for name, _, _ in fields]
+        next_cursor = encode_cursor(values, ordering)
+    return KeysetPage(items, next_cursor)
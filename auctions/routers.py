@@ -0,0 +1,34 @@
+'''
+read/write database routing
+
+Reads go to the read-only alias; writes, migrations and any read made
+inside a transaction on the primary (so it sees its own writes and holds
+its locks) go to the primary.
+'''
+
+from django.conf import settings
+from django.db import connections
+
+PRIMARY = "default"
+
+
+def read_database():
+    return getattr(settings, "READ_DATABASE", PRIMARY)
+
+
+class ReadWriteRouter:
+
+    def db_for_read(self, model, **hints):
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return read_database()
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
@@ -0,0 +1,154 @@
+'''
+full-text listing search on an SQLite FTS5 index
+
+The index is an external-content FTS5 table over the listing title and
+description, kept in sync by triggers on auctions_listing. SQLite rebuilds
+a table to alter it, which drops its triggers, so install() is idempotent
+and runs again after every migrate to put them back.
+'''
+
+import re
+
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Listing
+
+FTS_TABLE = "auctions_listing_fts"
+
+_TRIGGERS = {
+    "auctions_listing_fts_insert": f"""
+        CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_insert
+        AFTER INSERT ON auctions_listing BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    """,
+    "auctions_listing_fts_delete": f"""
+        CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_delete
+        AFTER DELETE ON auctions_listing BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+    """,
+    # bids and closes touch other columns and leave the index alone
+    "auctions_listing_fts_update": f"""
+        CREATE TRIGGER IF NOT EXISTS auctions_listing_fts_update
+        AFTER UPDATE OF title, description ON auctions_listing BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+    """,
+}
+
+# a title match counts ten times as much as a description match
+_RANK = f"bm25({FTS_TABLE}, 10.0, 1.0)"
+
+MAX_QUERY_TERMS = 8
+
+
+def is_supported(connection):
+    return connection.vendor == "sqlite"
+
+
+def install(connection):
+    '''
+    Create the index and its triggers if missing. When anything had to be
+    recreated the index is rebuilt from the listing table, since rows may
+    have changed while the triggers were gone.
+    '''
+    if not is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s)" % ", ".join(["%s"] * (len(_TRIGGERS) + 1)),
+            [FTS_TABLE, *_TRIGGERS],
+        )
+        present = {row[0] for row in cursor.fetchall()}
+        if len(present) == len(_TRIGGERS) + 1:
+            return
+
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+                title, description,
+                content='auctions_listing', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+        for sql in _TRIGGERS.values():
+            cursor.execute(sql)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(connection):
+    if not is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        for name in _TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def match_expression(query):
+    '''
+    Turn free text into an FTS5 query: every word must match, as a prefix.
+    Quoting each word keeps FTS5 operators in user input from being parsed.
+    '''
+    words = re.findall(r"\w+", query)[:MAX_QUERY_TERMS]
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def matching(query):
+    '''
+    Condition matching the listings that match ``query``, or None if it
+    has no words. For ordering matches by a column instead of by rank.
+    '''
+    expression = match_expression(query)
+    if not expression:
+        return None
+    return Q(id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression]))
+
+
+def search_listings(query, fields, category=None, active=True, min_price=None, max_price=None,
+                    limit=50, offset=0, using=None):
+    '''
+    Return up to ``limit`` listings matching ``query``, best match first,
+    with only ``fields`` loaded. ``active=None`` includes closed listings.
+    '''
+    expression = match_expression(query)
+    if not expression:
+        return []
+
+    where, params = [f"{FTS_TABLE} MATCH %s"], [expression]
+    if category:
+        where.append("l.category = %s")
+        params.append(category)
+    if active is not None:
+        where.append("l.active = %s")
+        params.append(active)
+    if min_price is not None:
+        where.append("l.price >= %s")
+        params.append(min_price)
+    if max_price is not None:
+        where.append("l.price <= %s")
+        params.append(max_price)
+
+    columns = ", ".join(f"l.{Listing._meta.get_field(name).column}" for name in fields)
+    sql = f"""
+        SELECT {columns}
+        FROM {FTS_TABLE} JOIN auctions_listing l ON l.id = {FTS_TABLE}.rowid
+        WHERE {" AND ".join(where)}
+        ORDER BY {_RANK}, l.id
+        LIMIT %s OFFSET %s
+    """
+    return list(Listing.objects.db_manager(using).raw(sql, [*params, limit, offset]))
+
+
+def ensure_installed(using="default", **kwargs):
+    '''
+    post_migrate handler
+    '''
+    install(connections[using])
@@ -0,0 +1,49 @@
+'''
+settling auctions
+
+Closing an auction is one transaction keyed by listing id. The listing is
+marked closed with its winner and final price, which are its highest
+bidder and bid at that moment since bids are refused from then on, and
+everyone involved is notified. The seller's close button and the expiry
+sweeper both settle through settle_listings.
+'''
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import invalidate_listing
+from .facets import invalidate_category_counts
+from .live import listing_changed
+from .models import Listing
+from .notifications import notify_settled
+
+
+def settle_listings(listing_ids, now=None, seller=None):
+    '''
+    Settle those of ``listing_ids`` that are still open, only ``seller``'s
+    if given, and return the ids that were settled.
+    '''
+    now = now or timezone.now()
+    with transaction.atomic():
+        # the write lock is taken at BEGIN, so nothing closes or bids on
+        # these between the lookup and the update
+        listings = Listing.objects.filter(id__in=listing_ids, active=True)
+        if seller is not None:
+            listings = listings.filter(seller=seller)
+        ids = list(listings.values_list("id", flat=True))
+        if not ids:
+            return []
+
+        Listing.objects.filter(id__in=ids).update(
+            active=False,
+            winner=F("highest_bidder"),
+            final_price=F("current_bid"),
+            closed_at=now,
+        )
+        notify_settled(ids, now)
+        for listing_id in ids:
+            invalidate_listing(listing_id)
+            listing_changed(listing_id)
+        invalidate_category_counts()
+    return ids
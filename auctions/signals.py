@@ -0,0 +1,53 @@
+'''
+signal handlers keeping cached listing and user data current
+'''
+
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends.auth import forget_user
+from .caching import invalidate_listing
+from .facets import invalidate_category_counts, listing_opened
+from .live import listing_changed
+from .models import Bid, Comment, Listing, User
+
+
+@receiver(post_save, sender=Listing)
+def listing_saved(sender, instance, created, **kwargs):
+    invalidate_listing(instance.pk)
+    if created:
+        if instance.active:
+            listing_opened(instance.category)
+    else:
+        invalidate_category_counts()
+        listing_changed(instance.pk)
+
+
+@receiver(post_delete, sender=Listing)
+def listing_deleted(sender, instance, **kwargs):
+    invalidate_listing(instance.pk)
+    invalidate_category_counts()
+
+
+@receiver(post_save, sender=Bid)
+@receiver(post_delete, sender=Bid)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def listing_child_changed(sender, instance, **kwargs):
+    invalidate_listing(instance.listing_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    forget_user(instance.pk)
+    # and again after commit, in case a request cached the old row meanwhile
+    transaction.on_commit(lambda: forget_user(instance.pk))
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        forget_user(user.pk)
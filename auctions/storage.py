@@ -0,0 +1,59 @@
+'''
+static files storage
+
+collectstatic copies every asset under a name containing a hash of its
+content, so it can be cached forever, and writes gzip and (when the
+brotli package is installed) brotli versions next to each text asset.
+StaticFilesMiddleware picks the variant a browser accepts.
+'''
+
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".html", ".xml", ".ico")
+# a variant must save at least this fraction of the bytes to be kept
+MIN_SAVING = 0.05
+
+
+def compressors():
+    '''
+    (suffix, compress function) of every available encoding
+    '''
+    yield ".gz", lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        return
+    yield ".br", lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+
+    def stored_name(self, name):
+        # before collectstatic has run (tests, a fresh checkout) there is no
+        # manifest; fall back to the plain names instead of failing every page
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if name.endswith(COMPRESSIBLE):
+                self.compress(name)
+
+    def compress(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        for suffix, function in compressors():
+            compressed = function(data)
+            if len(compressed) > len(data) * (1 - MIN_SAVING):
+                continue
+            if self.exists(name + suffix):
+                self.delete(name + suffix)
+            self._save(name + suffix, ContentFile(compressed))
@@ -0,0 +1,75 @@
+'''
+tests of the JSON API
+'''
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..bidding import place_bid
+from ..models import Listing, User
+from .utils import clear_caches, on_commit_callbacks
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=None)
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user("seller")
+        cls.first = User.objects.create_user("first")
+        cls.second = User.objects.create_user("second")
+        cls.listing = Listing.objects.create(
+            title="lamp", description="d", starting_bid=1, created=timezone.now(), seller=seller,
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+    def bid(self, user, amount):
+        with on_commit_callbacks():
+            return place_bid(self.listing.id, user, amount)
+
+    def test_unchanged_listings_are_not_modified(self):
+        url = reverse("api_bids", args=[self.listing.id])
+        response = self.client.get(url)
+        etag = response["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.bid(self.first, 5)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_bids_are_listed_highest_first(self):
+        self.bid(self.first, 20)
+        # matched by the leader's maximum: two bids of 20, the leader's first
+        self.bid(self.second, 20)
+        self.bid(self.second, 40)
+        results = self.client.get(reverse("api_bids", args=[self.listing.id])).json()["results"]
+        self.assertEqual(
+            [(bid["user"], bid["amount"], bid["automatic"]) for bid in results],
+            [("second", 25.0, True), ("first", 20.0, True), ("second", 20.0, False), ("first", 2.0, True)],
+        )
+
+    def test_batch_etags_are_matched_in_lists_and_weakly(self):
+        url = reverse("api_batch")
+        etag = self.client.get(url, {"ids": self.listing.id})["ETag"]
+        for header, status in ((etag, 304), (f'"other", W/{etag}', 304), ("*", 304),
+                               ('"other"', 200), (etag[:-2] + '"', 200)):
+            with self.subTest(header=header):
+                response = self.client.get(url, {"ids": self.listing.id}, HTTP_IF_NONE_MATCH=header)
+                self.assertEqual(response.status_code, status)
+
+    def test_ids_beyond_64_bits_are_refused(self):
+        huge = 10 ** 23
+        for name in ("api_listing", "api_bids", "api_comments"):
+            with self.subTest(name=name):
+                self.assertEqual(self.client.get(reverse(name, args=[huge])).status_code, 404)
+        for ids in (str(huge), f"{self.listing.id},{huge}", "-1", "0"):
+            with self.subTest(ids=ids):
+                self.assertEqual(self.client.get(reverse("api_batch"), {"ids": ids}).status_code, 400)
@@ -0,0 +1,66 @@
+'''
+tests of the cached authentication backend
+'''
+
+from django.core.checks import Warning
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..backends.auth import user_cache, user_cache_key
+from ..checks import check_default_cache, check_session_cache
+from ..models import User
+from .utils import clear_caches
+
+
+class CachedUserTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("bidder", password="secret")
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+        self.client.force_login(self.user)
+        self.client.get(reverse("myWatchList"))
+
+    def test_deactivated_users_are_signed_out(self):
+        self.assertIsNotNone(user_cache().get(user_cache_key(self.user.pk)))
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(user_cache().get(user_cache_key(self.user.pk)))
+        self.assertEqual(self.client.get(reverse("myWatchList")).status_code, 302)
+
+    def test_a_local_session_cache_is_warned_about(self):
+        [warning] = check_session_cache(None)
+        self.assertIsInstance(warning, Warning)
+        self.assertEqual(warning.id, "auctions.W001")
+        shared = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+            "sessions": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+        }
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_session_cache(None), [])
+
+    def test_a_local_default_cache_is_warned_about(self):
+        [warning] = check_default_cache(None)
+        self.assertEqual(warning.id, "auctions.W002")
+        shared = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_default_cache(None), [])
+
+    def test_session_and_user_come_from_the_cache(self):
+        self.client.get(reverse("index"))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("index"))
+        tables = " ".join(query["sql"] for query in queries.captured_queries)
+        self.assertNotIn("django_session", tables)
+        self.assertNotIn('"auctions_user"', tables)
+
+        # a password change must reach the next request
+        user = User.objects.get(pk=self.user.pk)
+        user.set_password("changed")
+        user.save()
+        self.assertEqual(self.client.get(reverse("myWatchList")).status_code, 302)
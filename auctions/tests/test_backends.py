@@ -0,0 +1,47 @@
+'''
+tests of the SQLite backend options and the read/write router
+'''
+
+from django.db import OperationalError, connections, router, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..models import Listing
+
+# journal_mode is left out, an in-memory test database has no WAL
+PRAGMAS = {"busy_timeout": 5000, "synchronous": 1, "cache_size": -20000, "temp_store": 2}
+
+
+class BackendTests(TransactionTestCase):
+    databases = {"default", "replica"}
+
+    def pragma(self, alias, name):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_set_on_every_connection(self):
+        for alias in ("default", "replica"):
+            for name, value in PRAGMAS.items():
+                with self.subTest(alias=alias, pragma=name):
+                    self.assertEqual(self.pragma(alias, name), value)
+        self.assertEqual(self.pragma("default", "query_only"), 0)
+        self.assertEqual(self.pragma("replica", "query_only"), 1)
+        with self.assertRaises(OperationalError), connections["replica"].cursor() as cursor:
+            cursor.execute("DELETE FROM auctions_listing")
+
+    def test_only_writable_connections_begin_immediate(self):
+        for alias, begin in (("default", "BEGIN IMMEDIATE"), ("replica", "BEGIN")):
+            with CaptureQueriesContext(connections[alias]) as queries, transaction.atomic(using=alias):
+                Listing.objects.using(alias).exists()
+            with self.subTest(alias=alias):
+                self.assertEqual(queries.captured_queries[0]["sql"], begin)
+
+    def test_reads_outside_transactions_go_to_the_replica(self):
+        self.assertEqual(router.db_for_read(Listing), "replica")
+        self.assertEqual(router.db_for_write(Listing), "default")
+        with transaction.atomic():
+            # sees its own writes
+            self.assertEqual(router.db_for_read(Listing), "default")
+        self.assertTrue(router.allow_migrate("default", "auctions"))
+        self.assertFalse(router.allow_migrate("replica", "auctions"))
@@ -0,0 +1,171 @@
+'''
+tests of bid placement
+'''
+
+import threading
+import time
+from datetime import timedelta
+
+from django.db import OperationalError, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..bidding import BidRejected, place_bid
+from ..models import Bid, Listing, MaxBid, User
+from .utils import clear_caches, on_commit_callbacks
+
+
+def new_listing(seller, **fields):
+    return Listing.objects.create(
+        title="lamp", description="d", starting_bid=1, created=timezone.now(), seller=seller, **fields,
+    )
+
+
+@override_settings(RATE_LIMITS={}, COUNTER_FLUSH_INTERVAL=None)
+class BidViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller")
+        cls.bidder = User.objects.create_user("bidder")
+        cls.listing = new_listing(cls.seller)
+
+    def test_invalid_listing_ids_are_404(self):
+        self.client.force_login(self.bidder)
+        for data in ({"listing": "abc", "amount": "5"}, {"amount": "5"}, {"listing": "999999", "amount": "5"},
+                     {"listing": str(10 ** 23), "amount": "5"}):
+            with self.subTest(data=data):
+                self.assertEqual(self.client.post(reverse("bid"), data).status_code, 404)
+
+    def test_ids_beyond_64_bits_are_refused(self):
+        huge = str(10 ** 23)
+        for path in (f"/auction/{huge}", f"/auction/{huge}/bids", f"/auction/{huge}/events"):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+        self.client.force_login(self.seller)
+        for name, data in (("watchListing", {"listing_id": huge, "is_watched": ""}), ("closeBid", {"listing": huge})):
+            with self.subTest(view=name):
+                self.assertEqual(self.client.post(reverse(name), data).status_code, 400)
+
+    def test_sellers_cannot_bid_on_their_own_listing(self):
+        with self.assertRaises(BidRejected):
+            place_bid(self.listing.id, self.seller, 5)
+        self.client.force_login(self.seller)
+        response = self.client.post(reverse("bid"), {"listing": self.listing.id, "amount": "5"})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Bid.objects.exists())
+        self.assertFalse(MaxBid.objects.exists())
+
+    def test_bids_retire_the_cached_listing_page(self):
+        self.addCleanup(clear_caches)
+        url = reverse("listing", args=[self.listing.id])
+        self.assertContains(self.client.get(url), "<span></span>")
+        with on_commit_callbacks():
+            price, _ = place_bid(self.listing.id, self.bidder, 5)
+        self.assertContains(self.client.get(url), f"<span>{price}</span>")
+
+    def test_closed_listings_take_no_bids(self):
+        Listing.objects.filter(pk=self.listing.pk).update(active=False)
+        with self.assertRaisesMessage(BidRejected, "closed"):
+            place_bid(self.listing.id, self.bidder, 5)
+
+    def test_expired_listings_show_no_bid_form(self):
+        self.addCleanup(clear_caches)
+        self.client.force_login(self.bidder)
+        url = reverse("listing", args=[self.listing.id])
+        self.assertContains(self.client.get(url), f'action="{reverse("bid")}"')
+        # past its end but not yet closed by the sweeper
+        Listing.objects.filter(pk=self.listing.pk).update(ends_at=timezone.now() - timedelta(seconds=1))
+        response = self.client.get(url)
+        self.assertNotContains(response, f'action="{reverse("bid")}"')
+        self.assertContains(response, "Bidding has ended.")
+        with self.assertRaisesMessage(BidRejected, "closed"):
+            place_bid(self.listing.id, self.bidder, 5)
+
+    def test_maximum_bids_are_resolved_in_one_transaction(self):
+        listing = new_listing(self.seller)
+        a, b, c = (User.objects.create_user(f"proxy-{name}") for name in "abc")
+
+        self.assertEqual(place_bid(listing.id, a, 50), (2, True))
+        # outbid at once by a's maximum, and a tie goes to the earlier one
+        self.assertEqual(place_bid(listing.id, b, 30), (35, False))
+        self.assertEqual(place_bid(listing.id, b, 50), (50, False))
+        with self.assertNumQueries(7):
+            self.assertEqual(place_bid(listing.id, c, 120), (55, True))
+        # the leader raising their maximum moves nothing
+        self.assertEqual(place_bid(listing.id, c, 200), (55, True))
+        with self.assertRaises(BidRejected):
+            place_bid(listing.id, a, 55)
+        self.assertEqual(place_bid(listing.id, a, 150), (160, False))
+
+        history = [
+            (bid.user.username[-1], bid.amount, bid.automatic)
+            for bid in Bid.objects.filter(listing=listing).select_related("user").order_by("id")
+        ]
+        self.assertEqual(history, [
+            ("a", 2, True), ("b", 30, False), ("a", 35, True), ("b", 50, False), ("a", 50, True),
+            ("c", 55, True), ("a", 150, False), ("c", 160, True),
+        ])
+        listing.refresh_from_db()
+        # the stored price the listing pages sort by moves with the bids
+        self.assertEqual((listing.current_bid, listing.price, listing.highest_bidder, listing.bid_count),
+                         (160, 160, c, 8))
+
+
+class ConcurrentBidTests(TransactionTestCase):
+    '''
+    bids racing each other from separate threads and connections
+    '''
+    databases = {"default", "replica"}
+    THREADS = 6
+    ROUNDS = 10
+
+    def race(self, listing, bidders, amount):
+        start = threading.Barrier(len(bidders))
+        outcomes = {}
+
+        def bid(user):
+            start.wait()
+            try:
+                while True:
+                    try:
+                        outcomes[user.pk] = place_bid(listing.id, user, amount)
+                        return
+                    except BidRejected as e:
+                        outcomes[user.pk] = e
+                        return
+                    except OperationalError:
+                        # the write lock is taken; try again like a client would
+                        time.sleep(0.001)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=bid, args=(user,)) for user in bidders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_two_concurrent_bids_never_both_win(self):
+        seller = User.objects.create_user("seller")
+        bidders = [User.objects.create_user(f"bidder{i}") for i in range(self.THREADS)]
+        for _ in range(self.ROUNDS):
+            listing = new_listing(seller)
+            # everyone bids the same maximum at once; the first one placed
+            # keeps the lead, ties going to the earlier maximum
+            outcomes = self.race(listing, bidders, 10)
+            leaders = [
+                pk for pk, outcome in outcomes.items()
+                if not isinstance(outcome, Exception) and outcome.leading
+            ]
+            self.assertEqual(len(outcomes), self.THREADS)
+            self.assertEqual(len(leaders), 1)
+
+            listing.refresh_from_db()
+            self.assertEqual((listing.highest_bidder_id, listing.price, listing.current_bid), (leaders[0], 10, 10))
+            bids = list(Bid.objects.filter(listing=listing).order_by("id").values_list("amount", "user_id"))
+            self.assertEqual(listing.bid_count, len(bids))
+            self.assertEqual(bids[-1], (10, leaders[0]))
+            self.assertEqual(bids, sorted(bids, key=lambda bid: bid[0]))
@@ -0,0 +1,76 @@
+'''
+tests of the versioned listing caches
+'''
+
+from unittest import mock
+
+from django.db import transaction
+from django.template import engines
+from django.template.loaders import cached
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import views
+from ..caching import bump_listing_version, listing_version
+from ..models import Listing, User
+from .utils import clear_caches, on_commit_callbacks
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=None)
+class ListingCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller")
+        cls.listing = Listing.objects.create(
+            title="lamp", description="d", starting_bid=1, created=timezone.now(), seller=cls.seller,
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+        self.url = reverse("listing", args=[self.listing.id])
+
+    def test_cached_pages_keep_their_headers(self):
+        render = views.renderListing
+
+        def render_with_link(*args):
+            response = render(*args)
+            response["Link"] = "</static/auctions/styles.css>; rel=preload; as=style"
+            return response
+
+        with mock.patch("auctions.views.renderListing", render_with_link):
+            rendered = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url)
+        self.assertEqual(cached.content, rendered.content)
+        for header in ("Content-Type", "Link"):
+            self.assertEqual(cached[header], rendered[header])
+
+    def test_writes_retire_cached_pages_once_committed(self):
+        self.assertContains(self.client.get(self.url), "lamp")
+        version = listing_version(self.listing.id)
+        with on_commit_callbacks(), transaction.atomic():
+            self.listing.title = "floor lamp"
+            self.listing.save()
+            # readers keep the old page until the write commits
+            self.assertEqual(listing_version(self.listing.id), version)
+        self.assertGreater(listing_version(self.listing.id), version)
+        self.assertContains(self.client.get(self.url), "floor lamp")
+
+    def test_cards_are_cached_and_templates_compiled_once(self):
+        self.assertIsInstance(engines["django"].engine.template_loaders[0], cached.Loader)
+
+        first = self.client.get(reverse("index")).content
+        with mock.patch("auctions.cards.get_template") as get_template:
+            second = self.client.get(reverse("index")).content
+        get_template.assert_not_called()
+        self.assertEqual(first, second)
+
+        # bids, closes and edits bump the version (after commit, which a
+        # TestCase never reaches), retiring the cached card
+        Listing.objects.filter(pk=self.listing.pk).update(current_bid=4321, price=4321)
+        bump_listing_version(self.listing.pk)
+        self.assertNotIn(b"4321", second)
+        self.assertContains(self.client.get(reverse("index")), "<strong>Price:</strong> 4321")
@@ -0,0 +1,79 @@
+'''
+tests of listing comments and their pages
+'''
+
+import re
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Listing, User
+from .utils import clear_caches, on_commit_callbacks
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=None, RATE_LIMITS={})
+class CommentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user("author")
+        cls.listing = Listing.objects.create(
+            title="lamp", description="d", starting_bid=1, created=timezone.now(), seller=cls.author,
+        )
+        now = timezone.now()
+        # two share a time, the id breaks the tie
+        cls.times = [now - timedelta(minutes=i // 2) for i in range(5)]
+        Comment.objects.bulk_create(
+            Comment(listing=cls.listing, author=cls.author, content=f"comment {i}", datetime=time)
+            for i, time in enumerate(cls.times)
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+    def comments(self, response):
+        return re.findall(r"comment \d", response.content.decode())
+
+    def test_comments_load_newest_first_page_by_page(self):
+        expected = list(Comment.objects.order_by("-datetime", "-id").values_list("content", flat=True))
+        seen = []
+        with mock.patch("auctions.views.COMMENTS_PER_PAGE", 2):
+            response = self.client.get(reverse("listing", args=[self.listing.id]))
+            while True:
+                seen.extend(self.comments(response))
+                more = re.search(r'href="([^"]+)">Load more comments', response.content.decode())
+                if not more:
+                    break
+                response = self.client.get(more.group(1).replace("&amp;", "&"))
+                self.assertEqual(response.status_code, 200)
+        self.assertEqual(seen, expected)
+
+    def test_bad_cursors_and_new_comments(self):
+        url = reverse("listingComments", args=[self.listing.id])
+        self.assertEqual(self.client.get(url, {"cursor": "!!!"}).status_code, 400)
+
+        self.assertNotContains(self.client.get(reverse("listing", args=[self.listing.id])), "a new one")
+        self.client.force_login(self.author)
+        with on_commit_callbacks():
+            response = self.client.post(reverse("newComment"), {"listing": self.listing.id, "content": "a new one"})
+        self.assertRedirects(response, reverse("listing", args=[self.listing.id]))
+        self.client.logout()
+        # the cached comments were retired with the listing version
+        self.assertContains(self.client.get(reverse("listing", args=[self.listing.id])), "a new one")
+
+    def test_failed_comments_show_the_listing_again(self):
+        self.client.force_login(self.author)
+        self.assertRedirects(self.client.get(reverse("newComment")), reverse("index"))
+        self.assertNotContains(self.client.get(reverse("listing", args=[self.listing.id])), "This field is required.")
+        response = self.client.post(reverse("newComment"), {"listing": self.listing.id, "content": ""})
+        self.assertContains(response, "This field is required.")
+        self.assertContains(response, 'id="comments"')
+        for listing in ("", "abc", "999999", str(10 ** 23)):
+            with self.subTest(listing=listing):
+                response = self.client.post(reverse("newComment"), {"listing": listing, "content": "hi"})
+                self.assertEqual(response.status_code, 404)
+        self.assertEqual(Comment.objects.count(), 5)
@@ -0,0 +1,72 @@
+'''
+tests of the write-behind listing counters
+'''
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..counters import listing_counters
+from ..models import Listing, User
+from ..watching import set_watching
+from .utils import clear_caches, on_commit_callbacks
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=None)
+class CounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller")
+        cls.listing = Listing.objects.create(
+            title="lamp", description="d", starting_bid=1, created=timezone.now(), seller=cls.seller,
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+        # views buffered by other tests would land on these ids
+        listing_counters.pending.clear()
+
+    def test_views_of_unknown_listings_are_not_buffered(self):
+        for listing_id in (self.listing.id + 1, 10 ** 12):
+            self.assertEqual(self.client.get(reverse("listing", args=[listing_id])).status_code, 404)
+        self.assertEqual(dict(listing_counters.pending), {})
+
+    def test_views_are_counted_from_the_cache_too(self):
+        url = reverse("listing", args=[self.listing.id])
+        # rendered, then served from the cache
+        self.client.get(url)
+        self.client.get(url)
+        self.client.force_login(self.seller)
+        self.client.get(url)
+        self.assertEqual(listing_counters.flush(), 1)
+        self.listing.refresh_from_db()
+        self.assertEqual(self.listing.view_count, 3)
+
+    def test_flushed_counts_are_not_answered_with_304(self):
+        url = reverse("api_listing", args=[self.listing.id])
+        response = self.client.get(url, {"fields": "view_count"})
+        self.assertEqual(response.json(), {"view_count": 0})
+        listing_counters.add("view_count", self.listing.id)
+        listing_counters.flush()
+        response = self.client.get(url, {"fields": "view_count"}, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"view_count": 1})
+
+    def test_counters_are_written_behind_in_one_batch(self):
+        url = reverse("listing", args=[self.listing.id])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            for _ in range(5):
+                self.client.get(url)
+
+        # only an actual change of the watchlist counts
+        with on_commit_callbacks():
+            for watched in (True, True, False, True):
+                set_watching(self.seller, self.listing.id, watched)
+        with self.assertNumQueries(4):
+            self.assertEqual(listing_counters.flush(), 2)
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.view_count, self.listing.watcher_count), (6, 1))
+        self.assertEqual(self.listing.watcher_count, self.listing.user_set.count())
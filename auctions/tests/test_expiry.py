@@ -0,0 +1,69 @@
+'''
+tests of closing expired auctions
+'''
+
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from ..bidding import BidRejected, place_bid
+from ..expiry import close_expired_batch, expired_listings, sweep
+from ..models import Listing, Notification, User
+
+
+class ExpiryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.now = timezone.now()
+        cls.seller = User.objects.create_user("seller")
+        cls.bidder = User.objects.create_user("bidder")
+        cls.expired = [cls.listing(ends_at=cls.now - timedelta(minutes=i)) for i in range(1, 6)]
+        cls.running = cls.listing(ends_at=cls.now + timedelta(hours=1))
+        cls.open_ended = cls.listing()
+
+    @classmethod
+    def listing(cls, **fields):
+        return Listing.objects.create(
+            title="lamp", description="d", starting_bid=1, created=cls.now - timedelta(days=1), seller=cls.seller,
+            **fields,
+        )
+
+    def test_expired_auctions_are_closed_in_batches_oldest_first(self):
+        self.assertEqual(close_expired_batch(2, self.now), 2)
+        closed = set(Listing.objects.filter(active=False).values_list("id", flat=True))
+        self.assertEqual(closed, {self.expired[4].id, self.expired[3].id})
+        self.assertEqual(sweep(2, now=self.now), 3)
+        self.assertEqual(sweep(2, now=self.now), 0)
+        self.assertEqual(set(Listing.objects.filter(active=True)), {self.running, self.open_ended})
+
+    def test_closing_settles_with_the_highest_bidder(self):
+        listing = self.listing(ends_at=timezone.now() + timedelta(minutes=1))
+        place_bid(listing.id, self.bidder, 5)
+        Listing.objects.filter(pk=listing.pk).update(ends_at=timezone.now() - timedelta(seconds=1))
+        # past its end an auction takes no bids, even before it is swept
+        with self.assertRaises(BidRejected):
+            place_bid(listing.id, User.objects.create_user("late"), 9)
+        now = timezone.now()
+        sweep(now=now)
+        listing.refresh_from_db()
+        self.assertEqual((listing.active, listing.winner_id, listing.closed_at), (False, self.bidder.id, now))
+        self.assertEqual(listing.final_price, listing.current_bid)
+        self.assertEqual(Notification.objects.get(listing=listing, user=self.bidder).kind, Notification.Kind.WON)
+
+    def test_expired_listings_are_found_through_the_index(self):
+        with connection.cursor() as cursor:
+            sql, params = expired_listings(self.now).order_by("ends_at", "id").values("id").query.sql_with_params()
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn("listing_expiry_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_the_command(self):
+        out = StringIO()
+        call_command("expire_auctions", "--pause=0", stdout=out)
+        self.assertIn("closed 5 expired listings", out.getvalue())
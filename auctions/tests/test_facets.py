@@ -0,0 +1,62 @@
+'''
+tests of the cached category counts
+'''
+
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..facets import category_counts
+from ..models import Listing, User
+from .utils import clear_caches, on_commit_callbacks
+
+HOME, TOY = Listing.Category.HOME, Listing.Category.TOY
+
+
+class CategoryCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller")
+        cls.lamp = cls.listing(HOME)
+        cls.listing(HOME, active=False)
+        cls.listing(TOY)
+
+    @classmethod
+    def listing(cls, category, **fields):
+        return Listing.objects.create(
+            title="lamp", description="d", starting_bid=1, created=timezone.now(), seller=cls.seller,
+            category=category, **fields,
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+    def test_counts_are_cached_and_follow_committed_writes(self):
+        with self.assertNumQueries(1):
+            counts = category_counts()
+        self.assertEqual(counts, {**dict.fromkeys(Listing.Category.values, 0), HOME: 1, TOY: 1})
+        with self.assertNumQueries(0):
+            category_counts()
+
+        # a new listing is an increment of the cached count
+        with on_commit_callbacks():
+            self.listing(TOY)
+        with self.assertNumQueries(0):
+            self.assertEqual(category_counts()[TOY], 2)
+
+        # closing one drops the counts, the next read recounts
+        with on_commit_callbacks():
+            self.lamp.active = False
+            self.lamp.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(category_counts()[HOME], 0)
+
+    def test_the_category_page(self):
+        response = self.client.get(reverse("categories"))
+        self.assertEqual(
+            response.context["categories"],
+            [(value, label, {HOME: 1, TOY: 1}.get(value, 0)) for value, label in Listing.Category.choices],
+        )
+        self.assertEqual(self.client.get(reverse("category", args=["XX"])).status_code, 404)
@@ -0,0 +1,86 @@
+'''
+tests of listing image uploads and thumbnails
+'''
+
+import os
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..images import VARIANTS, render_thumbnails, store_original, thumbnail_name
+from ..models import Job, Listing, User
+
+
+def image_file(name="lamp.png", color="red", size=(40, 30)):
+    from PIL import Image
+
+    data = BytesIO()
+    Image.new("RGB", size, color).save(data, "PNG")
+    return SimpleUploadedFile(name, data.getvalue(), content_type="image/png")
+
+
+@override_settings(RATE_LIMITS={})
+class ImageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller")
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media_root = media.name
+        settings = override_settings(MEDIA_ROOT=self.media_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def new_listing(self, **data):
+        self.client.force_login(self.seller)
+        return self.client.post(reverse("newListing"), {
+            "title": "lamp", "category": Listing.Category.HOME, "description": "a lamp", "starting_bid": "5",
+            **data,
+        })
+
+    def test_invalid_listings_are_shown_again_with_their_errors(self):
+        upload = SimpleUploadedFile("lamp.png", b"not an image", content_type="image/png")
+        with self.assertLogs(level="WARNING"):
+            response = self.new_listing(image=upload, starting_bid="")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Upload a valid image.")
+        self.assertContains(response, "This field is required.")
+        self.assertContains(response, "a lamp")
+        self.assertFalse(Listing.objects.exists())
+
+    def test_uploads_are_stored_under_their_content_hash(self):
+        response = self.new_listing(image=image_file("first.png"))
+        self.assertRedirects(response, reverse("index"))
+        self.new_listing(image=image_file("second.png"))
+        first, second = Listing.objects.order_by("id")
+        # identical content, one file
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r"^listings/[0-9a-f]{32}\.png$")
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "listings")), [os.path.basename(first.image.name)])
+        self.assertEqual(Job.objects.count(), 2)
+
+        other = store_original(image_file(color="blue"), "png")
+        self.assertNotEqual(other, first.image.name)
+
+        # the web server serves uploads; Django only does under DEBUG
+        self.assertEqual(self.client.get(first.image.url).status_code, 404)
+
+    def test_thumbnail_names_follow_the_image_and_variant_sizes(self):
+        source = os.path.join(self.media_root, "lamp.png")
+        with open(source, "wb") as f:
+            f.write(image_file().read())
+        key = render_thumbnails(source, self.media_root)
+        for variant in VARIANTS:
+            self.assertTrue(os.path.exists(os.path.join(self.media_root, thumbnail_name(key, variant))))
+        # rendering again finds the same files
+        self.assertEqual(render_thumbnails(source, self.media_root), key)
+        # new sizes get new names, so cached copies are never stale
+        with mock.patch.dict(VARIANTS, card=(100, 100)):
+            self.assertNotEqual(render_thumbnails(source, self.media_root), key)
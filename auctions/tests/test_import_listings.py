@@ -0,0 +1,80 @@
+'''
+tests of the import_listings command
+'''
+
+import csv
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..models import Listing, User
+
+
+class ImportListingsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("importer")
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.dir.name, name)
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def import_file(self, path, **options):
+        out = StringIO()
+        call_command("import_listings", path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_rows_with_and_without_an_image_url(self):
+        path = self.write("listings.csv", (
+            "title,description,starting_bid,category,imageURL,seller\n"
+            "Lamp,a lamp,5,TO,https://example.com/lamp.png,importer\n"
+            "Chair,a chair,7,HO,,importer\n"
+            "Vase,a vase,not a number,HO,,importer\n"
+        ))
+        rejects = os.path.join(self.dir.name, "rejects.csv")
+        out = self.import_file(path, rejects=rejects)
+
+        self.assertIn("imported:  2", out)
+        self.assertIn("rejected:  1", out)
+        listings = {listing.title: listing for listing in Listing.objects.all()}
+        self.assertEqual(sorted(listings), ["Chair", "Lamp"])
+        self.assertEqual(listings["Lamp"].imageURL, "https://example.com/lamp.png")
+        self.assertIsNone(listings["Chair"].imageURL)
+        self.assertEqual((listings["Chair"].price, listings["Chair"].seller), (7, self.seller))
+
+        with open(rejects, newline="", encoding="utf-8") as f:
+            rows = list(csv.reader(f))
+        self.assertEqual(rows[0], ["line", "errors"])
+        self.assertEqual(rows[1][0], "4")
+        self.assertIn("starting_bid", rows[1][1])
+
+    def test_jsonl_defaults_and_unknown_sellers(self):
+        path = self.write("listings.jsonl", (
+            '{"title": "Radio", "description": "a radio", "starting_bid": 3}\n'
+            '{"title": "Train", "description": "a train", "starting_bid": 4, "seller": "nobody"}\n'
+            "not json\n"
+        ))
+        out = self.import_file(path, seller="importer")
+
+        self.assertIn("imported:  1", out)
+        self.assertIn("rejected:  2", out)
+        radio = Listing.objects.get()
+        self.assertEqual((radio.category, radio.imageURL, radio.active), (Listing.Category.OTHERS, None, True))
+
+    def test_unreadable_files_are_reported(self):
+        missing = os.path.join(self.dir.name, "missing.csv")
+        with self.assertRaisesMessage(CommandError, f"Can't open {missing}: No such file or directory."):
+            self.import_file(missing, seller="importer")
+        path = self.write("listings.csv", "title,description,starting_bid\n")
+        with self.assertRaisesMessage(CommandError, f"Can't open {self.dir.name}"):
+            self.import_file(path, seller="importer", rejects=self.dir.name)
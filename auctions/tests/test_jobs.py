@@ -0,0 +1,71 @@
+'''
+tests of the database job queue
+'''
+
+from datetime import timedelta
+
+from django.db import transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from ..jobs import Worker, claim, enqueue, lease, queue_depth
+from ..models import Job
+
+ran_jobs = []
+
+
+def record_job(value):
+    ran_jobs.append(value)
+
+
+def failing_job():
+    raise RuntimeError("always fails")
+
+
+class JobTests(TestCase):
+
+    def setUp(self):
+        del ran_jobs[:]
+
+    def test_jobs_run_in_constant_queries_and_retry_with_backoff(self):
+        with transaction.atomic():
+            for i in range(10):
+                enqueue(record_job, i)
+        worker = Worker("test", batch_size=10)
+        # savepoint, lease expiry, claim, mark running, release, delete
+        with self.assertNumQueries(6):
+            self.assertEqual(worker.run_once(), 10)
+        self.assertEqual(ran_jobs, list(range(10)))
+        self.assertFalse(Job.objects.exists())
+
+        job = enqueue(failing_job, max_attempts=2)
+        with self.assertLogs("auctions.jobs", "WARNING"):
+            self.assertEqual(worker.run_once(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.attempts), (Job.State.QUEUED, 1))
+        self.assertIn("always fails", job.last_error)
+        # backed off, so not due yet
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertEqual(worker.run_once(), 0)
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs("auctions.jobs", "ERROR"):
+            self.assertEqual(worker.run_once(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.state, job.attempts), (Job.State.FAILED, 2))
+        self.assertEqual(queue_depth()["failed"], 1)
+
+    def test_jobs_whose_worker_died_are_retried_until_out_of_attempts(self):
+        last = enqueue(record_job, "last", max_attempts=1)
+        again = enqueue(record_job, "again", max_attempts=2)
+        # claimed by a worker that died before finishing them
+        past = timezone.now() - timedelta(seconds=lease() + 1)
+        Job.objects.update(run_at=past)
+        self.assertEqual(len(claim("dead", now=past)), 2)
+
+        with self.assertLogs("auctions.jobs", "WARNING"):
+            self.assertEqual(Worker("alive").run_once(), 1)
+        self.assertEqual(ran_jobs, ["again"])
+        self.assertFalse(Job.objects.filter(pk=again.pk).exists())
+        last.refresh_from_db()
+        self.assertEqual((last.state, last.attempts), (Job.State.FAILED, 1))
+        self.assertIn("lease ran out", last.last_error)
@@ -0,0 +1,119 @@
+'''
+tests of the live listing broker and its event stream handler
+'''
+
+import asyncio
+import json
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.urls import reverse
+
+from ..live import KEEPALIVE, MISSING, InMemoryBroker, events
+
+TIMEOUT = 5
+
+
+def decode(body):
+    return json.loads(body.decode().split("data: ", 1)[1])
+
+
+class LiveTests(SimpleTestCase):
+    '''
+    the database is replaced by ``states``, read the way listing_state is
+    '''
+
+    def setUp(self):
+        self.states = {1: {"id": 1, "price": 5.0, "bidder": None, "active": True}}
+        patcher = mock.patch("auctions.live.listing_state", lambda listing_id: self.states.get(listing_id, MISSING))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.broker = InMemoryBroker()
+        self.broker.heartbeat = 60
+
+    async def next_event(self, subscription):
+        return await asyncio.wait_for(subscription.next(), TIMEOUT)
+
+    async def test_subscribers_share_a_channel_and_skip_to_the_newest_state(self):
+        first = self.broker.subscribe(1)
+        second = self.broker.subscribe(1)
+        self.assertIs(first.channel, second.channel)
+        self.assertEqual(decode(await self.next_event(first))["price"], 5.0)
+
+        for price in (6.0, 7.0):
+            self.broker.notify(1, {"id": 1, "price": price, "bidder": "b", "active": True})
+            await asyncio.sleep(0)
+        # the first saw 6 go by, the second only ever sees the latest
+        self.assertEqual(decode(await self.next_event(first))["price"], 7.0)
+        self.assertEqual(decode(await self.next_event(second))["price"], 7.0)
+
+        first.channel.beat()
+        self.assertEqual(await self.next_event(first), KEEPALIVE)
+
+        first.close()
+        self.assertIn(1, self.broker.channels)
+        second.close()
+        self.assertEqual(self.broker.channels, {})
+
+    async def test_notify_from_another_thread_reads_the_state_back(self):
+        subscription = self.broker.subscribe(1)
+        await self.next_event(subscription)
+        self.states[1] = {"id": 1, "price": 9.0, "bidder": "b", "active": True}
+        thread = threading.Thread(target=self.broker.notify, args=(1,))
+        thread.start()
+        thread.join()
+        self.assertEqual(decode(await self.next_event(subscription))["price"], 9.0)
+        subscription.close()
+
+    async def stream(self, listing_id):
+        received, sent = asyncio.Queue(), asyncio.Queue()
+        handler = asyncio.ensure_future(events({"type": "http"}, received.get, sent.put, listing_id, self.broker))
+
+        async def next_message():
+            return await asyncio.wait_for(sent.get(), TIMEOUT)
+
+        return handler, received, next_message
+
+    async def test_unknown_listing_is_404(self):
+        handler, _, next_message = await self.stream(2)
+        self.assertEqual((await next_message())["status"], 404)
+        self.assertFalse((await next_message()).get("more_body", False))
+        await asyncio.wait_for(handler, TIMEOUT)
+        self.assertEqual(self.broker.channels, {})
+
+    async def test_stream_ends_when_the_listing_is_deleted(self):
+        handler, _, next_message = await self.stream(1)
+        start = await next_message()
+        self.assertEqual(start["status"], 200)
+        self.assertIn((b"content-type", b"text/event-stream"), start["headers"])
+        self.assertEqual(decode((await next_message())["body"])["price"], 5.0)
+
+        self.broker.notify(1, {"id": 1, "price": 6.0, "bidder": "b", "active": True})
+        self.assertEqual(decode((await next_message())["body"])["price"], 6.0)
+
+        del self.states[1]
+        self.broker.notify(1)
+        self.assertEqual(await next_message(), {"type": "http.response.body", "body": b"", "more_body": False})
+        await asyncio.wait_for(handler, TIMEOUT)
+        self.assertEqual(self.broker.channels, {})
+
+    async def test_disconnect_ends_the_stream_quietly(self):
+        handler, received, next_message = await self.stream(1)
+        await next_message()
+        await next_message()
+        await received.put({"type": "http.disconnect"})
+        await asyncio.wait_for(handler, TIMEOUT)
+        self.assertEqual(self.broker.channels, {})
+
+
+class ListingEventsViewTests(SimpleTestCase):
+    '''
+    the events path served by Django rather than the ASGI handler
+    '''
+
+    def test_without_asgi_the_stream_is_not_reopened(self):
+        response = self.client.get(reverse("listingEvents", args=[1]))
+        # EventSource gives up on a 204 instead of reconnecting
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response.content, b"")
@@ -0,0 +1,72 @@
+'''
+tests of the request and SQL instrumentation
+'''
+
+import re
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import metrics
+from .utils import clear_caches
+
+
+def sample(name):
+    '''
+    the value of one sample in the rendered registry, 0 when absent
+    '''
+    match = re.search(rf"^{re.escape(name)} (\S+)$", metrics.render(), re.MULTILINE)
+    return float(match.group(1)) if match else 0
+
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+    def test_server_timing_reports_the_queries(self):
+        response = self.client.get(reverse("index"))
+        match = re.fullmatch(r'db;dur=[\d.]+;desc="(\d+) queries", app;dur=[\d.]+', response["Server-Timing"])
+        self.assertIsNotNone(match)
+        self.assertGreater(int(match.group(1)), 0)
+
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_can_be_turned_off(self):
+        self.assertNotIn("Server-Timing", self.client.get(reverse("index")))
+
+    def test_requests_and_queries_are_counted_by_view(self):
+        requests = 'auctions_requests_total{view="index",method="GET",status="200"}'
+        queries = 'auctions_sql_queries_total{view="index"}'
+        before = sample(requests), sample(queries)
+        response = self.client.get(reverse("index"))
+        count = int(re.search(r'desc="(\d+) queries"', response["Server-Timing"]).group(1))
+        self.assertEqual(sample(requests), before[0] + 1)
+        self.assertEqual(sample(queries), before[1] + count)
+
+    @override_settings(SLOW_QUERY_THRESHOLD=0)
+    def test_queries_over_the_threshold_are_logged(self):
+        slow = 'auctions_slow_queries_total{view="index"}'
+        before = sample(slow)
+        with self.assertLogs("auctions.sql", "WARNING") as logs:
+            self.client.get(reverse("index"))
+        self.assertIn("slow query", logs.output[0])
+        self.assertIn("in index: SELECT", logs.output[0])
+        self.assertEqual(sample(slow), before + len(logs.output))
+
+    @override_settings(SLOW_QUERY_THRESHOLD=60)
+    def test_fast_queries_are_not_logged(self):
+        slow = 'auctions_slow_queries_total{view="index"}'
+        before = sample(slow)
+        with mock.patch("auctions.middleware.logger") as logger:
+            self.client.get(reverse("index"))
+        logger.warning.assert_not_called()
+        self.assertEqual(sample(slow), before)
+
+    def test_the_scrape_endpoint_is_internal(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], metrics.CONTENT_TYPE)
+        self.assertIn("# TYPE auctions_requests_total counter", response.content.decode())
+        self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="203.0.113.7").status_code, 403)
@@ -0,0 +1,103 @@
+'''
+tests of the notifications page and the unread badge
+'''
+
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..bidding import place_bid
+from ..models import Listing, Notification, User
+from ..pagination import keyset_paginate
+from ..settlement import settle_listings
+from .utils import clear_caches
+
+
+class NotificationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("bidder")
+        seller = User.objects.create_user("seller")
+        cls.listing = Listing.objects.create(
+            title="lamp", description="d", starting_bid=1, created=timezone.now(), seller=seller,
+        )
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+        self.client.force_login(self.user)
+
+    def notify(self, count):
+        Notification.objects.bulk_create(
+            Notification(user=self.user, listing=self.listing, kind=Notification.Kind.OUTBID, created=timezone.now())
+            for _ in range(count)
+        )
+        return list(Notification.objects.order_by("-id").values_list("id", flat=True)[:count])
+
+    def unread(self):
+        return set(Notification.objects.filter(read=False).values_list("id", flat=True))
+
+    def test_only_the_notifications_shown_are_marked_read(self):
+        older, *shown = sorted(self.notify(4))
+        with mock.patch("auctions.views.NOTIFICATIONS_PER_PAGE", 3):
+            response = self.client.get(reverse("notifications"))
+            self.assertEqual({note.id for note in response.context["notifications"]}, set(shown))
+            self.assertEqual(self.unread(), {older})
+            # the badge still counts the one not shown
+            self.assertContains(response, '<span class="badge badge-primary">1</span>')
+
+            response = self.client.get(reverse("notifications"), {"cursor": response.context["next_cursor"]})
+        self.assertEqual(self.unread(), set())
+        self.assertNotContains(response, "badge-primary")
+
+    def test_notifications_written_while_the_page_renders_stay_unread(self):
+        self.notify(2)
+        late = []
+
+        def paginate_then_notify(*args, **kwargs):
+            page = keyset_paginate(*args, **kwargs)
+            late.extend(self.notify(1))
+            return page
+
+        with mock.patch("auctions.views.keyset_paginate", paginate_then_notify):
+            self.client.get(reverse("notifications"))
+        self.assertEqual(self.unread(), set(late))
+
+    def test_settlement_notifies_everyone_once_in_constant_queries(self):
+        listing = self.listing
+        first, second, third = (User.objects.create_user(f"bidder{i}") for i in range(3))
+        for user, amount in ((first, 10), (third, 15), (second, 30)):
+            place_bid(listing.id, user, amount)
+        for user in (self.user, first):
+            user.watchlist.add(listing)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(settle_listings([listing.id]), [listing.id])
+        # savepoint, lookup, update, one insert per fan-out, release
+        self.assertLessEqual(len(queries), 6)
+
+        listing.refresh_from_db()
+        self.assertFalse(listing.active)
+        self.assertEqual((listing.winner, listing.final_price), (second, listing.current_bid))
+        kinds = dict(Notification.objects.filter(listing=listing).values_list("user_id", "kind"))
+        self.assertEqual(Notification.objects.filter(listing=listing).count(), len(kinds))
+        self.assertEqual(kinds, {
+            second.pk: Notification.Kind.WON,
+            first.pk: Notification.Kind.OUTBID,
+            third.pk: Notification.Kind.OUTBID,
+            self.user.pk: Notification.Kind.ENDED,
+            listing.seller_id: Notification.Kind.ENDED,
+        })
+        self.assertEqual(settle_listings([listing.id]), [])
+
+        self.client.force_login(second)
+        badge = '<span class="badge badge-primary">1</span>'
+        self.assertContains(self.client.get(reverse("index")), badge)
+        response = self.client.get(reverse("notifications"))
+        self.assertContains(response, "You won")
+        self.assertNotContains(response, badge)
+        self.assertNotContains(self.client.get(reverse("index")), badge)
@@ -0,0 +1,139 @@
+'''
+tests of keyset pagination and the listing feeds built on it
+'''
+
+import random
+import re
+from datetime import timedelta
+from unittest import mock
+
+from django.http import QueryDict
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Listing, User
+from ..pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_paginate
+from ..views import CARD_FIELDS, ListingFilterForm
+from .utils import clear_caches
+
+PRICE_ORDERING = ("price", "id")
+
+
+class ListingFeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user("seller")
+        cls.listings = [
+            Listing.objects.create(
+                title=f"lamp {i}", description="d", starting_bid=10 + i % 3, created=timezone.now(),
+                seller=seller, category=Listing.Category.HOME,
+            )
+            for i in range(7)
+        ]
+
+    def setUp(self):
+        # ids repeat between tests, so cached cards would too
+        clear_caches()
+
+    def test_pages_cover_every_row_once_despite_equal_keys(self):
+        for ordering in (PRICE_ORDERING, ("-price", "-id"), ("-created", "-id")):
+            seen, cursor = [], None
+            while True:
+                page = keyset_paginate(Listing.objects.all(), ordering, cursor, per_page=2)
+                seen.extend(listing.id for listing in page)
+                if not page.has_next:
+                    break
+                cursor = page.next_cursor
+            with self.subTest(ordering=ordering):
+                self.assertEqual(seen, list(Listing.objects.order_by(*ordering).values_list("id", flat=True)))
+
+    def test_malformed_cursors_are_refused(self):
+        cursor = keyset_paginate(Listing.objects.all(), PRICE_ORDERING, per_page=3).next_cursor
+        for bad in ("", "!!!", "bm90IGpzb24", cursor[:-4], encode_cursor(["x", 1], PRICE_ORDERING),
+                    encode_cursor([1], PRICE_ORDERING), encode_cursor([1, 2, 3], PRICE_ORDERING)):
+            with self.subTest(cursor=bad):
+                with self.assertRaises(InvalidCursor):
+                    decode_cursor(bad, Listing, PRICE_ORDERING)
+        for path in (reverse("index"), reverse("category", args=[Listing.Category.HOME])):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path, {"cursor": "!!!"}).status_code, 400)
+
+    def test_cursors_are_refused_under_another_ordering(self):
+        page = keyset_paginate(Listing.objects.all(), PRICE_ORDERING, per_page=3)
+        self.assertTrue(page.has_next)
+        following = keyset_paginate(Listing.objects.all(), PRICE_ORDERING, page.next_cursor, per_page=3)
+        self.assertEqual(len(following), 3)
+        with self.assertRaises(InvalidCursor):
+            keyset_paginate(Listing.objects.all(), ("-price", "id"), page.next_cursor, per_page=3)
+
+        # the next link of a price sort, reused after switching to newest
+        url = reverse("category", args=[Listing.Category.HOME])
+        with mock.patch("auctions.views.LISTINGS_PER_PAGE", 3):
+            response = self.client.get(url, {"sort": "price"})
+        cursor = QueryDict(response.context["next_query"])["cursor"]
+        self.assertEqual(self.client.get(url, {"sort": "newest", "cursor": cursor}).status_code, 400)
+
+    def test_category_cards_show_the_price_they_are_sorted_by(self):
+        Listing.objects.filter(pk=self.listings[0].pk).update(current_bid=99, price=99)
+        response = self.client.get(reverse("category", args=[Listing.Category.HOME]), {"sort": "-price"})
+        self.assertNotContains(response, "Starting Price")
+        self.assertContains(response, "99.0 SEK", count=1)
+
+
+class PriceFilterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        now = timezone.now()
+        seller = User.objects.create_user("seller")
+        listings = [
+            Listing(
+                title=f"lamp {i}", description="d", starting_bid=rng.randint(1, 500), created=now - timedelta(minutes=i),
+                seller=seller, category=rng.choice([Listing.Category.TOY, Listing.Category.HOME]),
+                active=i % 10 != 0, ends_at=now + timedelta(hours=rng.randint(1, 48)) if i % 3 == 0 else None,
+            )
+            for i in range(60)
+        ]
+        for listing in listings:
+            listing.price = listing.starting_bid
+        Listing.objects.bulk_create(listings)
+
+    def setUp(self):
+        clear_caches()
+
+    def test_price_filters_and_sorts_page_through_indexes(self):
+        active = Listing.objects.filter(active=True)
+        toys = Listing.Category.TOY
+        cases = [
+            (reverse("index"), {"min_price": 100, "max_price": 400, "sort": "price"},
+             active.filter(price__gte=100, price__lte=400).order_by("price", "id")),
+            (reverse("index"), {"sort": "-price"}, active.order_by("-price", "-id")),
+            (reverse("category", args=[toys]), {"max_price": 300, "sort": "ending"},
+             active.filter(category=toys, price__lte=300, ends_at__gt=timezone.now()).order_by("ends_at", "id")),
+        ]
+        for path, params, expected in cases:
+            with self.subTest(path=path, **params), mock.patch("auctions.views.LISTINGS_PER_PAGE", 7):
+                seen, url = [], f"{path}?{'&'.join(f'{k}={v}' for k, v in params.items())}"
+                while url:
+                    response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+                    seen += [int(i) for i in re.findall(r'<li value="(\d+)">', response.content.decode())]
+                    url = response.get("Link", "")[1:].split(">", 1)[0]
+                self.assertEqual(seen, list(expected.values_list("id", flat=True)))
+
+        # each order is read off an index instead of sorting the matches
+        for category, params, index in [
+            (None, {"min_price": 100, "sort": "price"}, "listing_price_idx"),
+            (toys, {"max_price": 300, "sort": "-price"}, "listing_category_price_idx"),
+            (toys, {"sort": "ending"}, "listing_category_expiry_idx"),
+        ]:
+            form = ListingFilterForm(params)
+            self.assertTrue(form.is_valid())
+            listings = active.filter(category=category) if category else active
+            listings, ordering = form.filter(listings.only(*CARD_FIELDS))
+            plan = listings.order_by(*ordering).explain()
+            self.assertIn(index, plan)
+            self.assertNotIn("TEMP B-TREE", plan)
@@ -0,0 +1,332 @@
+'''
+performance tests
+
+Every URL in auctions/urls.py is driven through the test client, as an
+anonymous visitor and as a signed in user, against a seeded dataset. The
+number of queries each view issues (with a cold cache) must stay within
+its budget.
+
+Wall-clock latency depends on the machine, so it is only checked on
+request: p95 per scenario must then stay within PERF_THRESHOLD of the
+baseline, which is recorded on the machine it is compared on.
+
+    PERF_LATENCY=1 python manage.py test           check latency too
+    PERF_UPDATE_BASELINE=1 python manage.py test   rewrite the baseline
+    PERF_REPORT=1 python manage.py test            print the latency table
+'''
+
+import json
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import urls
+from ..management.commands._bench import percentile
+from ..models import Bid, Comment, Listing, User
+from .utils import clear_caches
+
+BASELINE = Path(__file__).with_name("perf_baseline.json")
+ITERATIONS = int(os.environ.get("PERF_ITERATIONS", 25))
+# allowed p95 slowdown relative to the baseline, plus an absolute slack
+# so sub-millisecond views don't fail on scheduler noise
+THRESHOLD = float(os.environ.get("PERF_THRESHOLD", 1.0))
+SLACK_MS = float(os.environ.get("PERF_SLACK_MS", 10))
+MEASURE_LATENCY = any(os.environ.get(name) for name in ("PERF_LATENCY", "PERF_UPDATE_BASELINE", "PERF_REPORT"))
+
+ANONYMOUS, USER = "anonymous", "user"
+
+
+class Scenario:
+    '''
+    one request to time: ``path`` and ``data`` are called with the test
+    case (and the iteration number for data) so repeated POSTs can vary
+    '''
+    def __init__(self, name, path, method="get", data=None, relogin=False):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.data = data
+        self.relogin = relogin
+
+    def key(self, role):
+        return f"{self.name}:{self.method}:{role}"
+
+
+def listing_url(name):
+    return lambda t: reverse(name, args=[t.hot.id])
+
+
+SCENARIOS = [
+    Scenario("index", lambda t: reverse("index")),
+    Scenario("index", lambda t: reverse("index") + "?cursor=" + t.second_page_cursor("index")),
+    Scenario("login", lambda t: reverse("login")),
+    Scenario("login", lambda t: reverse("login"), "post",
+             lambda t, i: {"username": "bidder0", "password": "wrong"}),
+    Scenario("logout", lambda t: reverse("logout"), relogin=True),
+    Scenario("register", lambda t: reverse("register")),
+    Scenario("register", lambda t: reverse("register"), "post",
+             lambda t, i: {"username": f"new{t.next_amount()}", "email": "x@example.com",
+                           "password": "pw", "confirmation": "pw"}),
+    Scenario("newListing", lambda t: reverse("newListing")),
+    Scenario("newListing", lambda t: reverse("newListing"), "post",
+             lambda t, i: {"title": f"new {i}", "category": "TO", "description": "d",
+                           "starting_bid": "5", "imageURL": "https://example.com/i.png"}),
+    Scenario("listing", listing_url("listing")),
+    Scenario("listingEvents", listing_url("listingEvents")),
+    Scenario("bidHistory", listing_url("bidHistory")),
+    Scenario("listingComments", lambda t: reverse("listingComments", args=[t.hot.id]) + "?cursor=" + t.comment_cursor()),
+    Scenario("bidHistory", lambda t: reverse("bidHistory", args=[t.hot.id]) + "?cursor=" + t.second_page_cursor("bidHistory")),
+    Scenario("categories", lambda t: reverse("categories")),
+    Scenario("category", lambda t: reverse("category", args=["TO"])),
+    Scenario("search", lambda t: reverse("search") + "?q=lamp"),
+    Scenario("watchListing", lambda t: reverse("watchListing"), "post",
+             lambda t, i: {"listing_id": t.hot.id, "is_watched": "True" if i % 2 else ""}),
+    Scenario("myWatchList", lambda t: reverse("myWatchList")),
+    Scenario("bid", lambda t: reverse("bid"), "post",
+             lambda t, i: {"listing": t.hot.id, "amount": t.next_amount()}),
+    Scenario("closeBid", lambda t: reverse("closeBid"), "post",
+             lambda t, i: {"listing": t.own.id}),
+    Scenario("newComment", lambda t: reverse("newComment"), "post",
+             lambda t, i: {"listing": t.hot.id, "content": f"comment {i}"}),
+    Scenario("notifications", lambda t: reverse("notifications")),
+    Scenario("metrics", lambda t: reverse("metrics")),
+    Scenario("api_listings", lambda t: reverse("api_listings")),
+    Scenario("api_batch", lambda t: reverse("api_batch") + "?ids=" + ",".join(str(i) for i in t.ids[:50])),
+    Scenario("api_listing", listing_url("api_listing")),
+    Scenario("api_bids", listing_url("api_bids")),
+    Scenario("api_comments", listing_url("api_comments")),
+]
+
+# maximum queries per request with a cold cache; anonymous requests to
+# login_required views only redirect, and the API never loads the session
+QUERY_BUDGETS = {
+    "index:get": {ANONYMOUS: 1, USER: 4},
+    "login:get": {ANONYMOUS: 0, USER: 3},
+    "login:post": {ANONYMOUS: 1, USER: 4},
+    "logout:get": {ANONYMOUS: 0, USER: 4},
+    "register:get": {ANONYMOUS: 0, USER: 3},
+    "register:post": {ANONYMOUS: 10, USER: 10},
+    "newListing:get": {ANONYMOUS: 0, USER: 3},
+    "newListing:post": {ANONYMOUS: 0, USER: 5},
+    "listing:get": {ANONYMOUS: 2, USER: 6},
+    "listingEvents:get": {ANONYMOUS: 1, USER: 1},
+    "bidHistory:get": {ANONYMOUS: 2, USER: 5},
+    "listingComments:get": {ANONYMOUS: 1, USER: 1},
+    "categories:get": {ANONYMOUS: 1, USER: 4},
+    "category:get": {ANONYMOUS: 1, USER: 4},
+    "search:get": {ANONYMOUS: 1, USER: 4},
+    "watchListing:post": {ANONYMOUS: 0, USER: 3},
+    "myWatchList:get": {ANONYMOUS: 0, USER: 4},
+    "bid:post": {ANONYMOUS: 0, USER: 11},
+    "closeBid:post": {ANONYMOUS: 0, USER: 8},
+    "newComment:post": {ANONYMOUS: 0, USER: 7},
+    "notifications:get": {ANONYMOUS: 0, USER: 4},
+    "metrics:get": {ANONYMOUS: 0, USER: 0},
+    "api_listings:get": {ANONYMOUS: 1, USER: 1},
+    "api_batch:get": {ANONYMOUS: 1, USER: 1},
+    "api_listing:get": {ANONYMOUS: 1, USER: 1},
+    "api_bids:get": {ANONYMOUS: 1, USER: 1},
+    "api_comments:get": {ANONYMOUS: 1, USER: 1},
+}
+
+
+# counts are flushed by the tests, never by a thread behind their back;
+# the timed scenarios repeat writes far faster than any rate limit allows
+@override_settings(COUNTER_FLUSH_INTERVAL=None, RATE_LIMITS={})
+class PerformanceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        now = timezone.now()
+        cls.user = User.objects.create_user("bidder0", "b0@example.com", "pw")
+        users = [cls.user] + [
+            User.objects.create_user(f"bidder{i}", f"b{i}@example.com", "pw") for i in range(1, 30)
+        ]
+        words = ["lamp", "chair", "phone", "jacket", "train", "vase", "radio", "shoes"]
+        seeded = [
+            Listing(
+                title=f"{rng.choice(words)} {i}",
+                description=f"a {rng.choice(words)} in good condition",
+                starting_bid=rng.randint(1, 500),
+                imageURL="https://example.com/item.png",
+                category=rng.choice(Listing.Category.values),
+                created=now - timedelta(minutes=i),
+                seller=rng.choice(users[1:]),
+                active=i % 10 != 0,
+                ends_at=now + timedelta(days=1) if i % 3 == 0 else None,
+            )
+            for i in range(300)
+        ]
+        for listing in seeded:
+            listing.price = listing.starting_bid
+        Listing.objects.bulk_create(seeded)
+        listings = list(Listing.objects.order_by("id"))
+        cls.ids = [listing.id for listing in listings]
+        cls.hot = listings[1]
+        cls.own = Listing.objects.create(
+            title="own listing", description="d", starting_bid=1, created=now, seller=cls.user,
+        )
+
+        bids = []
+        for listing in listings[:100]:
+            amount = listing.starting_bid
+            # the hot listing has more than a page of history
+            for n in range(120 if listing == cls.hot else rng.randint(1, 15)):
+                amount += rng.randint(1, 20)
+                bids.append(Bid(listing=listing, user=rng.choice(users[1:]), amount=amount,
+                                placed=now - timedelta(minutes=200 - n)))
+        Bid.objects.bulk_create(bids)
+        for listing in listings[:100]:
+            placed = [b for b in bids if b.listing_id == listing.id]
+            top = placed[-1]
+            Listing.objects.filter(pk=listing.pk).update(
+                current_bid=top.amount, price=top.amount, highest_bidder=top.user,
+                bid_count=len(placed), last_bid_at=top.placed,
+            )
+
+        Comment.objects.bulk_create([
+            Comment(listing=cls.hot if i < 30 else rng.choice(listings), author=rng.choice(users),
+                    content=f"comment {i}", datetime=now - timedelta(minutes=i))
+            for i in range(600)
+        ])
+        for user in users:
+            user.watchlist.add(*rng.sample(listings, 20))
+        cls.hot.refresh_from_db()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.results = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        if os.environ.get("PERF_UPDATE_BASELINE"):
+            BASELINE.write_text(json.dumps(cls.results, indent=2, sort_keys=True) + "\n")
+        if os.environ.get("PERF_REPORT"):
+            sys.stderr.write(f"\n{'scenario':<40}{'p50 ms':>10}{'p95 ms':>10}\n")
+            for key, result in sorted(cls.results.items()):
+                sys.stderr.write(f"{key:<40}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}\n")
+        super().tearDownClass()
+
+    def setUp(self):
+        self.amount = 100000
+
+    def next_amount(self):
+        self.amount += 1
+        return self.amount
+
+    def second_page_cursor(self, name):
+        args = [self.hot.id] if name == "bidHistory" else []
+        response = self.client.get(reverse(name, args=args))
+        return response["Link"].split("cursor=", 1)[1].split(">", 1)[0]
+
+    def comment_cursor(self):
+        response = self.client.get(reverse("listing", args=[self.hot.id]))
+        return response.content.decode().split("?cursor=", 1)[1].split('"', 1)[0]
+
+    def client_for(self, role):
+        if role == USER:
+            self.client.force_login(self.user)
+        else:
+            self.client.logout()
+        return self.client
+
+    def request(self, scenario, path, iteration):
+        if scenario.method == "post":
+            return self.client.post(path, scenario.data(self, iteration))
+        return self.client.get(path)
+
+    def test_every_url_is_covered(self):
+        covered = {scenario.name for scenario in SCENARIOS}
+        missing = [pattern.name for pattern in urls.urlpatterns if pattern.name not in covered]
+        self.assertEqual(missing, [], "add a Scenario and a budget for every URL")
+
+    def test_query_budgets(self):
+        for scenario in SCENARIOS:
+            for role in (ANONYMOUS, USER):
+                with self.subTest(scenario=scenario.key(role)):
+                    self.client_for(role)
+                    path = scenario.path(self)
+                    clear_caches()
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.request(scenario, path, 0)
+                    self.assertLess(response.status_code, 500)
+                    budget = QUERY_BUDGETS[f"{scenario.name}:{scenario.method}"][role]
+                    self.assertLessEqual(
+                        len(queries), budget,
+                        f"{path} as {role} ran {len(queries)} queries, budget is {budget}:\n"
+                        + "\n".join(query["sql"] for query in queries.captured_queries),
+                    )
+
+    def test_listing_page_queries_do_not_grow_with_its_history(self):
+        path = reverse("listing", args=[self.own.id])
+
+        def queries_run():
+            clear_caches()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(path)
+            return len(queries)
+
+        for role in (ANONYMOUS, USER):
+            with self.subTest(role=role):
+                self.client_for(role)
+                before = queries_run()
+                # every comment and bid by someone else
+                others = User.objects.exclude(pk=self.user.pk)
+                Comment.objects.bulk_create([
+                    Comment(listing=self.own, author=user, content="c", datetime=timezone.now())
+                    for user in others
+                ])
+                Bid.objects.bulk_create([
+                    Bid(listing=self.own, user=user, amount=n + 2, placed=timezone.now())
+                    for n, user in enumerate(others)
+                ])
+                self.assertEqual(queries_run(), before)
+
+    def measure(self, scenario, role):
+        self.client_for(role)
+        path = scenario.path(self)
+        self.request(scenario, path, 0)
+        samples = []
+        for i in range(1, ITERATIONS + 1):
+            if scenario.relogin:
+                self.client_for(role)
+            began = time.perf_counter()
+            self.request(scenario, path, i)
+            samples.append((time.perf_counter() - began) * 1000)
+        return {"p50_ms": percentile(samples, 50), "p95_ms": percentile(samples, 95)}
+
+    @skipUnless(MEASURE_LATENCY, "timings depend on the machine; set PERF_LATENCY=1")
+    def test_latency_against_baseline(self):
+        baseline = json.loads(BASELINE.read_text()) if BASELINE.exists() else {}
+        regressions = []
+        for scenario in SCENARIOS:
+            for role in (ANONYMOUS, USER):
+                key = scenario.key(role)
+                if key in self.results:
+                    key = f"{key}:{len([k for k in self.results if k.startswith(key)])}"
+                result = self.measure(scenario, role)
+
+                known = baseline.get(key)
+                if known:
+                    allowed = max(known["p95_ms"] * (1 + THRESHOLD), known["p95_ms"] + SLACK_MS)
+                    if result["p95_ms"] > allowed:
+                        # measure once more so a single noisy run doesn't fail
+                        result = min(result, self.measure(scenario, role), key=lambda r: r["p95_ms"])
+                    if result["p95_ms"] > allowed:
+                        regressions.append(
+                            f"{key}: p95 {result['p95_ms']:.2f} ms, baseline {known['p95_ms']:.2f} ms"
+                        )
+                self.results[key] = result
+        self.assertEqual(regressions, [], "latency regressed beyond PERF_THRESHOLD")
@@ -0,0 +1,83 @@
+'''
+tests of full-text listing search
+'''
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Listing, User
+from ..search import FTS_TABLE, install, match_expression, search_listings
+from .utils import clear_caches
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = User.objects.create_user("seller")
+        cls.title_match = cls.listing("Brass lamp", "old and heavy")
+        cls.description_match = cls.listing("Side table", "comes with a lamp")
+        cls.other = cls.listing("Café chair", "wooden")
+
+    @classmethod
+    def listing(cls, title, description, **fields):
+        return Listing.objects.create(
+            title=title, description=description, starting_bid=1, created=timezone.now(), seller=cls.seller,
+            **fields,
+        )
+
+    def ids(self, query, **filters):
+        return [listing.id for listing in search_listings(query, ("id", "title"), **filters)]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.ids("lamp"), [self.title_match.id, self.description_match.id])
+        # every word must match, each as a prefix, accents ignored
+        self.assertEqual(self.ids("la heav"), [self.title_match.id])
+        self.assertEqual(self.ids("cafe"), [self.other.id])
+
+    def test_query_syntax_in_user_input_is_taken_literally(self):
+        self.assertEqual(match_expression('lamp" OR chair NOT *'), '"lamp"* "OR"* "chair"* "NOT"*')
+        self.assertEqual(self.ids('lamp" OR chair'), [])
+        self.assertEqual(self.ids("  -- "), [])
+
+    def test_triggers_keep_the_index_in_step(self):
+        listing = self.title_match
+        listing.title = "Brass candlestick"
+        listing.save()
+        self.assertEqual(self.ids("candlestick"), [listing.id])
+        self.assertEqual(self.ids("lamp"), [self.description_match.id])
+        # a bid touches neither column, the row stays findable
+        Listing.objects.filter(pk=listing.pk).update(current_bid=5, price=5)
+        self.assertEqual(self.ids("candlestick", min_price=5), [listing.id])
+        listing.delete()
+        self.assertEqual(self.ids("candlestick"), [])
+
+    def test_missing_triggers_are_put_back_and_the_index_rebuilt(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TRIGGER auctions_listing_fts_insert")
+        added = self.listing("Lamp shade", "linen")
+        self.assertEqual(self.ids("shade"), [])
+        install(connection)
+        self.assertEqual(self.ids("shade"), [added.id])
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+            self.assertEqual(cursor.fetchone()[0], Listing.objects.count())
+
+    def test_the_search_page(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+        response = self.client.get(reverse("search"), {"q": "lamp"})
+        self.assertContains(response, "Brass lamp")
+        self.assertContains(response, "Side table")
+        self.assertNotContains(response, "chair")
+        response = self.client.get(reverse("search"), {"q": "lamp", "sort": "newest"})
+        content = response.content.decode()
+        self.assertLess(content.index("Side table"), content.index("Brass lamp"))
+
+    def test_pages_beyond_the_last_are_refused(self):
+        for page in ("0", "101", str(10 ** 23)):
+            with self.subTest(page=page):
+                self.assertEqual(self.client.get(reverse("search"), {"q": "lamp", "page": page}).status_code, 400)
+        self.assertEqual(self.client.get(reverse("search"), {"q": "lamp", "page": "100"}).status_code, 200)
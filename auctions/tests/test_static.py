@@ -0,0 +1,73 @@
+'''
+tests of precompressed static files and their negotiation
+'''
+
+import gzip
+import os
+import tempfile
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ..middleware import StaticFilesMiddleware, accepted_encodings
+from ..storage import CompressedManifestStaticFilesStorage, compressors
+
+CSS = b"body { margin: 0; }\n" * 200
+# brotli is optional; without it gzip is the best there is
+BEST = "br" if ".br" in dict(compressors()) else "gzip"
+
+
+class StaticFileTests(SimpleTestCase):
+
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.root = root.name
+        self.storage = CompressedManifestStaticFilesStorage(location=self.root, base_url="/static/")
+        for name, data in (("styles.css", CSS), ("styles.0123abcd.css", CSS), ("tiny.css", b"a{}")):
+            with open(os.path.join(self.root, name), "wb") as f:
+                f.write(data)
+            self.storage.compress(name)
+
+    def middleware(self):
+        storage = mock.Mock(hashed_files={"styles.css": "styles.0123abcd.css"})
+        with override_settings(STATIC_ROOT=self.root, STATIC_URL="/static/"), \
+                mock.patch("auctions.middleware.staticfiles_storage", storage):
+            return StaticFilesMiddleware(lambda request: HttpResponse("view"))
+
+    def get(self, path, **headers):
+        response = self.middleware()(RequestFactory().get(path, **headers))
+        self.addCleanup(response.close)
+        return response
+
+    def test_variants_are_kept_only_when_they_save_bytes(self):
+        self.assertEqual(gzip.decompress(self.storage.open("styles.css.gz").read()), CSS)
+        self.assertEqual(self.storage.exists("styles.css.br"), BEST == "br")
+        self.assertFalse(self.storage.exists("tiny.css.gz"))
+
+    def test_the_best_accepted_encoding_is_served(self):
+        cases = (
+            ("gzip, deflate, br", BEST),
+            ("gzip", "gzip"),
+            ("br;q=0, gzip;q=0.5", "gzip"),
+            ("identity", None),
+            ("", None),
+        )
+        for header, encoding in cases:
+            with self.subTest(accept_encoding=header):
+                response = self.get("/static/styles.css", HTTP_ACCEPT_ENCODING=header)
+                self.assertEqual(response.get("Content-Encoding"), encoding)
+                self.assertEqual(response["Content-Type"], "text/css")
+                self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(accepted_encodings("GZip;q=1.0, br;q=junk"), {"gzip"})
+
+    def test_hashed_names_never_expire(self):
+        self.assertEqual(self.get("/static/styles.0123abcd.css")["Cache-Control"], "public, max-age=31536000, immutable")
+        response = self.get("/static/styles.css")
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")
+        response = self.get("/static/styles.css", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+        # uncompressed assets don't vary, unknown ones reach the views
+        self.assertNotIn("Vary", self.get("/static/tiny.css"))
+        self.assertEqual(self.get("/static/missing.css").content, b"view")
@@ -0,0 +1,94 @@
+'''
+tests of write admission
+'''
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import metrics
+from ..models import Comment, Listing, User
+from ..throttling import take, write_slots
+from .utils import clear_caches
+
+LIMITS = {
+    "newComment": {
+        "user": {"rate": 0.01, "burst": 2},
+        "listing": {"rate": 0.01, "burst": 3},
+    },
+}
+
+
+@override_settings(RATE_LIMITS=LIMITS)
+class ThrottlingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user("seller")
+        cls.listings = [
+            Listing.objects.create(
+                title="lamp", description="d", starting_bid=1, created=timezone.now(), seller=seller,
+            )
+            for _ in range(2)
+        ]
+        cls.users = [User.objects.create_user(f"user{i}") for i in range(3)]
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+
+    def comment(self, user, listing):
+        self.client.force_login(user)
+        return self.client.post(reverse("newComment"), {"listing": listing.id, "content": "nice"}).status_code
+
+    def test_busy_listings_are_limited_across_users(self):
+        first, second, third = self.users
+        hot = self.listings[0]
+        self.assertEqual([self.comment(first, hot), self.comment(second, hot), self.comment(third, hot)],
+                         [302, 302, 302])
+        self.assertEqual(self.comment(third, hot), 429)
+        self.assertIn('auctions_shed_requests_total{view="newComment",reason="listing"}', metrics.render())
+        self.assertEqual(Comment.objects.count(), 3)
+
+    def test_refused_requests_are_not_charged_to_other_buckets(self):
+        first, second, third = self.users
+        hot, quiet = self.listings
+        for user in (first, second, first):
+            self.assertEqual(self.comment(user, hot), 302)
+        # the listing refuses; the user's second token must survive that
+        self.assertEqual(self.comment(second, hot), 429)
+        self.assertEqual(self.comment(second, quiet), 302)
+        self.assertEqual(self.comment(second, quiet), 429)
+
+    def test_buckets_refill_at_their_rate(self):
+        buckets = {"ratelimit:test": (1.0, 2)}
+        self.assertEqual(take(buckets, now=100.0), (None, 0.0))
+        self.assertEqual(take(buckets, now=100.0), (None, 0.0))
+        self.assertEqual(take(buckets, now=100.0), ("ratelimit:test", 1.0))
+        self.assertEqual(take(buckets, now=101.0), (None, 0.0))
+
+    def test_write_bursts_are_shed_with_429(self):
+        self.client.force_login(self.users[0])
+        amounts = iter(range(10, 1000, 10))
+
+        def bid():
+            return self.client.post(reverse("bid"), {"listing": self.listings[0].id, "amount": next(amounts)})
+
+        with override_settings(RATE_LIMITS={"bid": {"user": {"rate": 0.01, "burst": 2}}}):
+            responses = [bid() for _ in range(3)]
+        self.assertEqual([response.status_code for response in responses], [302, 302, 429])
+        self.assertEqual(responses[-1]["Retry-After"], "100")
+
+        # with every slot taken a write is refused without waiting
+        with override_settings(RATE_LIMITS={}, WRITE_CONCURRENCY=1):
+            slots = write_slots()
+            slots.acquire()
+            try:
+                with self.assertNumQueries(0):
+                    self.assertEqual(bid().status_code, 429)
+            finally:
+                slots.release()
+            self.assertEqual(bid().status_code, 302)
+        shed = metrics.render()
+        self.assertIn('auctions_shed_requests_total{view="bid",reason="user"} 1', shed)
+        self.assertIn('auctions_shed_requests_total{view="bid",reason="concurrency"} 1', shed)
@@ -0,0 +1,81 @@
+'''
+tests of watch state and the watchlist
+'''
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..counters import listing_counters
+from ..models import Listing, User
+from ..watching import annotate_watched, is_watching, set_watching
+from .utils import clear_caches, on_commit_callbacks
+
+
+@override_settings(COUNTER_FLUSH_INTERVAL=None, RATE_LIMITS={})
+class WatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user("watcher")
+        seller = User.objects.create_user("seller")
+        cls.listings = [
+            Listing.objects.create(
+                title=f"lamp {i}", description="d", starting_bid=1, created=timezone.now(), seller=seller,
+            )
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        clear_caches()
+        self.addCleanup(clear_caches)
+        listing_counters.pending.clear()
+
+    def toggle(self, listing_id, is_watched):
+        return self.client.post(
+            reverse("watchListing"), {"listing_id": listing_id, "is_watched": is_watched},
+            HTTP_ACCEPT="application/json",
+        )
+
+    def test_watching_twice_counts_once(self):
+        first, second, _ = self.listings
+        with on_commit_callbacks():
+            for watched in (True, True, False, False, True):
+                set_watching(self.user, first.id, watched)
+            set_watching(self.user, second.id, True)
+        self.assertTrue(is_watching(self.user, first.id))
+        watched = dict(annotate_watched(Listing.objects.all(), self.user).values_list("id", "is_watched"))
+        self.assertEqual(watched, {first.id: True, second.id: True, self.listings[2].id: False})
+        listing_counters.flush()
+        first.refresh_from_db()
+        self.assertEqual(first.watcher_count, 1)
+
+    def test_toggling_from_the_page(self):
+        listing = self.listings[0]
+        self.client.force_login(self.user)
+        self.assertEqual(self.toggle(listing.id, "").json(), {"listing_id": listing.id, "is_watched": True})
+        self.assertEqual(self.toggle(listing.id, "true").json(), {"listing_id": listing.id, "is_watched": False})
+        self.assertFalse(is_watching(self.user, listing.id))
+        self.assertEqual(self.toggle("lamp", "").status_code, 400)
+
+    def test_the_watchlist_is_newest_first(self):
+        for listing in self.listings:
+            set_watching(self.user, listing.id, True)
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("myWatchList"))
+        titles = [f"lamp {i}" for i in (2, 1, 0)]
+        content = response.content.decode()
+        self.assertEqual(sorted(titles, key=content.index), titles)
+
+
+@override_settings(RATE_LIMITS={})
+class UnknownListingWatchTests(TransactionTestCase):
+    '''
+    the foreign key is checked at commit, which a TestCase never reaches
+    '''
+    databases = {"default", "replica"}
+
+    def test_watching_an_unknown_listing_is_404(self):
+        self.client.force_login(User.objects.create_user("watcher"))
+        response = self.client.post(reverse("watchListing"), {"listing_id": 10 ** 9, "is_watched": ""})
+        self.assertEqual(response.status_code, 404)
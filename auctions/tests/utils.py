@@ -0,0 +1,28 @@
+'''
+helpers shared by the test modules
+'''
+
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+
+@contextmanager
+def on_commit_callbacks():
+    '''
+    run the on_commit callbacks registered inside the block, which a
+    TestCase otherwise never commits
+    '''
+    start = len(connection.run_on_commit)
+    yield
+    callbacks = connection.run_on_commit[start:]
+    del connection.run_on_commit[start:]
+    for _, callback in callbacks:
+        callback()
+
+
+def clear_caches():
+    for alias in settings.CACHES:
+        caches[alias].clear()
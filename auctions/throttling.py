@@ -0,0 +1,130 @@
+'''
+admission control for write views
+
+In a closing-minute bidding war writes arrive faster than SQLite's single
+writer can take them. Queued behind its lock they hold server threads,
+and pages that only read wait for a thread too. Write views are therefore
+admitted by two checks, and a request failing either is answered at once
+with 429 Too Many Requests and a Retry-After header:
+
+- token buckets per user and per listing, configured per view in
+  RATE_LIMITS: ``burst`` requests at once, refilled at ``rate`` per second.
+  A bucket is one value in the RATE_LIMIT_CACHE cache, its theoretical
+  arrival time (the generic cell rate algorithm), so checking a request's
+  buckets is one get_many and one set_many; a request refused by any
+  bucket takes nothing from the others. Concurrent requests from one user
+  may race past it by a request or two; it is a brake, not an exact
+  quota. The buckets are only shared by processes sharing that cache.
+- WRITE_CONCURRENCY slots per process, taken without waiting.
+
+Every request turned away is counted in auctions_shed_requests_total.
+'''
+
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from . import metrics
+
+_slots = (None, None)
+_slots_lock = threading.Lock()
+
+
+def rate_limit_cache():
+    return caches[getattr(settings, "RATE_LIMIT_CACHE", "default")]
+
+
+def write_slots():
+    '''
+    the semaphore of this process's write slots, None if unlimited
+    '''
+    global _slots
+    size = getattr(settings, "WRITE_CONCURRENCY", None)
+    with _slots_lock:
+        if _slots[0] != size:
+            _slots = (size, threading.BoundedSemaphore(size) if size is not None else None)
+        return _slots[1]
+
+
+def take(buckets, now=None):
+    '''
+    Take a token from every bucket in ``buckets``, a dict of key to
+    (rate, burst), or from none of them. Return (None, 0) if each had one,
+    otherwise the key of an empty bucket and the seconds until it refills.
+    '''
+    now = now or time.time()
+    cache = rate_limit_cache()
+    stored = cache.get_many(list(buckets))
+    arrivals = {}
+    for key, (rate, burst) in buckets.items():
+        interval = 1.0 / rate
+        # the bucket is full again at ``arrival``, and empty burst
+        # intervals before that
+        arrival = max(stored.get(key) or now, now) + interval
+        wait = arrival - now - burst * interval
+        if wait > 0:
+            # refused requests are not charged to the buckets that passed
+            return key, wait
+        arrivals[key] = arrival
+    if arrivals:
+        cache.set_many(arrivals, math.ceil(max(arrivals.values()) - now))
+    return None, 0.0
+
+
+def too_many_requests(view, reason, retry_after):
+    metrics.shed_requests_total.inc(view, reason)
+    response = HttpResponse(f"Too many requests, try again in {retry_after} s.", status=429)
+    response["Retry-After"] = str(retry_after)
+    return response
+
+
+def check_limits(view, request, listing_field):
+    '''
+    the response turning ``request`` away, or None if it may go ahead
+    '''
+    limits = getattr(settings, "RATE_LIMITS", {}).get(view, {})
+    buckets = []
+    if "user" in limits:
+        buckets.append(("user", request.user.pk))
+    if "listing" in limits and listing_field:
+        listing_id = request.POST.get(listing_field, "")
+        # an invalid listing is left to the view to reject
+        if listing_id.isdigit():
+            buckets.append(("listing", int(listing_id)))
+    scopes = {f"ratelimit:{view}:{scope}:{ident}": scope for scope, ident in buckets}
+    empty, wait = take({key: (limits[scope]["rate"], limits[scope]["burst"]) for key, scope in scopes.items()})
+    if empty:
+        return too_many_requests(view, scopes[empty], math.ceil(wait))
+    return None
+
+
+def throttle_writes(view, listing_field=None):
+    '''
+    Admit POSTs to the decorated view, named ``view`` in RATE_LIMITS, as
+    described above. ``listing_field`` names the POST field holding the
+    listing id for the per listing bucket. Goes inside login_required.
+    '''
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "POST":
+                return view_func(request, *args, **kwargs)
+            refused = check_limits(view, request, listing_field)
+            if refused:
+                return refused
+            slots = write_slots()
+            if slots is None:
+                return view_func(request, *args, **kwargs)
+            if not slots.acquire(blocking=False):
+                return too_many_requests(view, "concurrency", 1)
+            try:
+                return view_func(request, *args, **kwargs)
+            finally:
+                slots.release()
+        return wrapper
+    return decorator
@@ -1,10 +1,14 @@
 '''
 paths for the application
 '''
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path
+from django.urls import path, register_converter
 
-from . import views
+from . import api, views
+from .ids import IdConverter
+
+register_converter(IdConverter, "id")
 
 urlpatterns = [
     path("", views.index, name="index"),
@@ -12,12 +16,27 @@ urlpatterns = [
     path("logout", views.logout_view, name="logout"),
     path("register", views.register, name="register"),
     path("newListing", views.newListing, name="newListing"),
-    path("auction/<str:listing_id>", views.getListing, name="listing"),
+    path("auction/<id:listing_id>", views.getListing, name="listing"),
+    path("auction/<id:listing_id>/events", views.listingEvents, name="listingEvents"),
+    path("auction/<id:listing_id>/bids", views.bidHistory, name="bidHistory"),
+    path("auction/<id:listing_id>/comments", views.listingComments, name="listingComments"),
     path("category", views.category, name="categories"),
     path("category/<str:category_name>", views.category, name="category"),
+    path("search", views.search, name="search"),
     path("watchListing", views.watchListing, name="watchListing"),
     path("myWatchList", views.myWatchList, name="myWatchList"),
     path("bid", views.bid, name="bid"),
     path("closeBid", views.closeBid, name="closeBid"),
-    path("newComment", views.newComment, name="newComment")
-]
\ No newline at end of file
+    path("newComment", views.newComment, name="newComment"),
+    path("notifications", views.notifications, name="notifications"),
+    path("metrics", views.metrics, name="metrics"),
+    path("api/listings", api.listings, name="api_listings"),
+    path("api/listings/batch", api.batch, name="api_batch"),
+    path("api/listings/<id:listing_id>", api.listing, name="api_listing"),
+    path("api/listings/<id:listing_id>/bids", api.bids, name="api_bids"),
+    path("api/listings/<id:listing_id>/comments", api.comments, name="api_comments"),
+]
+
+# in production the web server answers MEDIA_URL itself (see settings)
+if settings.DEBUG:
+    urlpatterns.append(path("media/<path:path>", views.media, name="media"))
@@ -3,14 +3,55 @@ from django.contrib import admin
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.db import IntegrityError
-from django.http import HttpResponseRedirect
-from django.shortcuts import render
+from django.core.cache import cache
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.views.static import serve
 from django.urls import reverse
 from django import forms
 from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
 from django.core.exceptions import ValidationError
 
-from .models import User, Listing, Bid, Comment
+from . import metrics as metrics_registry
+from .bidding import BidRejected, place_bid
+from .cards import render_cards
+from .caching import listing_cache_key, listing_cache_timeout, listing_version
+from .counters import count_view
+from .facets import category_counts
+from .ids import MAX_ID, parse_id
+from .images import schedule_thumbnails, store_original, validate_image
+from .models import User, Listing, Bid, Comment, Notification
+from .notifications import mark_read
+from .pagination import InvalidCursor, keyset_paginate
+from .search import matching, search_listings
+from .settlement import settle_listings
+from .throttling import throttle_writes
+from .watching import annotate_watched, is_watching, set_watching, watched_listings
+
+# columns a listing card needs; everything else stays in the database
+CARD_FIELDS = (
+    "id", "title", "description", "starting_bid", "price", "bid_count", "view_count", "watcher_count",
+    "imageURL", "thumbnail_key", "created", "ends_at",
+)
+FEED_ORDERING = ("-created", "-id")
+# sort orders of the listing pages, each read off an index of Listing
+LISTING_SORTS = {
+    "newest": ("Newest first", FEED_ORDERING),
+    "price": ("Lowest price first", ("price", "id")),
+    "-price": ("Highest price first", ("-price", "-id")),
+    "ending": ("Ending soonest", ("ends_at", "id")),
+}
+LISTINGS_PER_PAGE = 50
+# every accepted bid beats the one before, so highest first is newest first
+BID_HISTORY_ORDERING = ("-amount", "-id")
+BIDS_PER_PAGE = 50
+COMMENT_ORDERING = ("-datetime", "-id")
+COMMENTS_PER_PAGE = 20
+NOTIFICATIONS_PER_PAGE = 50
+# best match pages by offset, which gets slower the deeper it goes
+MAX_SEARCH_PAGE = 100
 
 class LoggingMixin(object):
     def add_error(self, field, error):
@@ -24,25 +65,51 @@ class NewListingForm(LoggingMixin, forms.ModelForm):
 
     class Meta:
         model = Listing
-        fields = "__all__"
+        fields = ["title", "category", "description", "starting_bid", "image", "ends_at", "created", "seller"]
         widgets = {
             "category": forms.Select,
             "description": forms.Textarea,
+            "image": forms.FileInput(attrs={"accept": "image/*"}),
+            "ends_at": forms.DateTimeInput(attrs={"type": "datetime-local"}),
         }
 
+    def clean_ends_at(self):
+        ends_at = self.cleaned_data.get("ends_at")
+        if ends_at and ends_at <= timezone.now():
+            raise ValidationError("The auction must end in the future.")
+        return ends_at
+
+    def clean_image(self):
+        image = self.cleaned_data.get("image")
+        if image:
+            self.image_extension = validate_image(image)
+        return image
+
+    def save(self, commit=True):
+        listing = super().save(commit=False)
+        if self.cleaned_data.get("image"):
+            # stored under a content hash instead of the uploaded name
+            listing.image = store_original(self.cleaned_data["image"], self.image_extension)
+        if commit:
+            listing.save()
+        return listing
+
 class WatchForm(forms.Form):
-    listing_id = forms.IntegerField(widget=forms.HiddenInput ,label="listing_id")
+    listing_id = forms.IntegerField(widget=forms.HiddenInput ,label="listing_id", min_value=1, max_value=MAX_ID)
     is_watched = forms.BooleanField(widget=forms.HiddenInput, label="is_watched", required=False)
 
 class BidForm(forms.ModelForm):
     '''
-    form based on the Bid model
+    form based on the Bid model; the bidder is always the signed in user
+    and the amount their maximum
     '''
     class Meta:
         model = Bid
-        fields = "__all__"
+        fields = ["amount", "listing"]
+        labels = {
+            "amount": "Your maximum bid",
+        }
         widgets = {
-            "user": forms.HiddenInput,
             "listing": forms.HiddenInput,
         }
 
@@ -51,7 +118,8 @@ class BidForm(forms.ModelForm):
         listing = cleaned_data.get("listing")
         amount = cleaned_data.get("amount")
 
-        # If fields are correct
+        # Early feedback only, the price may change before the bid is
+        # placed. place_bid makes the final decision atomically.
         if listing and amount:
             if listing.current_bid:
                 current = listing.current_bid
@@ -62,8 +130,57 @@ class BidForm(forms.ModelForm):
                     "Your bid must be higher than the current bid."
                 )
 
+class ListingFilterForm(forms.Form):
+    '''
+    price range and sort order of a listing page
+    '''
+    min_price = forms.FloatField(
+        min_value=0, required=False, widget=forms.NumberInput(attrs={"placeholder": "Min price", "step": "any"}),
+    )
+    max_price = forms.FloatField(
+        min_value=0, required=False, widget=forms.NumberInput(attrs={"placeholder": "Max price", "step": "any"}),
+    )
+    sort = forms.ChoiceField(
+        choices=[(name, label) for name, (label, _) in LISTING_SORTS.items()],
+        required=False,
+    )
+
+    def filter(self, listings):
+        '''
+        return ``listings`` within the price range and the ordering to page
+        them in
+        '''
+        if self.cleaned_data["min_price"] is not None:
+            listings = listings.filter(price__gte=self.cleaned_data["min_price"])
+        if self.cleaned_data["max_price"] is not None:
+            listings = listings.filter(price__lte=self.cleaned_data["max_price"])
+        sort = self.cleaned_data["sort"] or "newest"
+        if sort == "ending":
+            # auctions without an end are never about to end
+            listings = listings.filter(ends_at__gt=timezone.now())
+        return listings, LISTING_SORTS[sort][1]
+
+class SearchForm(ListingFilterForm):
+    STATUS = {"active": True, "closed": False, "all": None}
+
+    q = forms.CharField(max_length=200, required=False)
+    category = forms.ChoiceField(
+        choices=[("", "All categories")] + Listing.Category.choices,
+        required=False,
+    )
+    status = forms.ChoiceField(
+        choices=[("active", "Active"), ("closed", "Closed"), ("all", "All")],
+        required=False,
+    )
+    # best match has no stored key, so it pages by number
+    sort = forms.ChoiceField(
+        choices=[("relevance", "Best match")] + ListingFilterForm.base_fields["sort"].choices,
+        required=False,
+    )
+    page = forms.IntegerField(min_value=1, max_value=MAX_SEARCH_PAGE, required=False)
+
 class CloseBidForm(forms.Form):
-    listing = forms.CharField(label="listing", required=True)
+    listing = forms.IntegerField(widget=forms.HiddenInput, label="listing", min_value=1, max_value=MAX_ID)
 
 class NewCommentForm(forms.ModelForm):
     '''
@@ -80,160 +197,386 @@ class NewCommentForm(forms.ModelForm):
             "starting_bid": forms.NumberInput(attrs={"class": "form-control"})
         }
 
+def listingPage(request, listings, form):
+    '''
+    return the page of ``listings`` selected by the valid ListingFilterForm
+    ``form`` and the request's cursor, and the query string of the next
+    page or None
+    '''
+    listings, ordering = form.filter(listings)
+    page = keyset_paginate(listings, ordering, request.GET.get("cursor"), LISTINGS_PER_PAGE)
+    next_query = None
+    if page.has_next:
+        query = request.GET.copy()
+        query["cursor"] = page.next_cursor
+        next_query = query.urlencode()
+    return page, next_query
+
 def index(request):
-    listings = Listing.objects.all()
-    return render(request, "auctions/index.html", {
-        "listings": listings,
+    form = ListingFilterForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest("Invalid filter.")
+    listings = annotate_watched(Listing.objects.filter(active=True).only(*CARD_FIELDS), request.user)
+    try:
+        page, next_query = listingPage(request, listings, form)
+    except InvalidCursor:
+        return HttpResponseBadRequest("Invalid cursor.")
+
+    response = render(request, "auctions/index.html", {
+        "form": form,
+        "cards": render_cards(page),
+        "next_query": next_query,
     })
+    if next_query:
+        response["Link"] = f'<{reverse("index")}?{next_query}>; rel="next"'
+    return response
 
 @login_required
+@throttle_writes("newListing")
 def newListing(request):
     if request.method == "POST":
         request.POST._mutable = True
         request.POST["created"] = timezone.now()
         request.POST["seller"] = request.user
-        form = NewListingForm(request.POST)
+        form = NewListingForm(request.POST, request.FILES)
 
         if form.is_valid():
-            form.save()
-        else:
-            print("invalid form")
-
-        return HttpResponseRedirect(reverse("index"))
-
+            listing = form.save()
+            if listing.image:
+                schedule_thumbnails(listing.id, listing.image.name)
+            return HttpResponseRedirect(reverse("index"))
+    else:
+        form = NewListingForm()
 
-    form = NewListingForm()
     return render(request, "auctions/newListing.html", {
         "form": form
     })
 
-def getListing(request, listing_id):
-    listing = Listing.objects.get(pk=listing_id)
-    ## check if the listing is being watched
+def commentPage(listing_id, cursor=None):
+    '''
+    one page of a listing's comments, newest first, authors joined in
+    '''
+    comments = (
+        Comment.objects.filter(listing_id=listing_id)
+        .select_related("author")
+        .only("id", "datetime", "content", "author", "author__username")
+    )
+    return keyset_paginate(comments, COMMENT_ORDERING, cursor, COMMENTS_PER_PAGE)
+
+def listingContext(listing, version, **extra):
+    '''
+    context shared by every render of the listing page; the comments are
+    left lazy so a cached comment fragment costs no query
+    '''
+    return {
+        "listing": listing,
+        "category": listing.category,
+        "seller": listing.seller,
+        "comments": SimpleLazyObject(lambda: commentPage(listing.id)),
+        "cache_version": version,
+        "cache_timeout": listing_cache_timeout(),
+        **extra,
+    }
+
+def listingForms(request, listing, **forms):
+    '''
+    the forms a signed in user sees on the listing page; ``forms`` replaces
+    some with the bound form of a failed submission
+    '''
+    return {
+        "watchform": WatchForm({
+            "listing_id": listing.id,
+            "is_watched": is_watching(request.user, listing.id)
+        }),
+        "bidform": BidForm(initial={"listing": listing.id}),
+        "commentform": NewCommentForm(initial={"listing": listing.id}),
+        **forms,
+    }
+
+def renderListing(request, listing_id, version):
+    listing = get_object_or_404(Listing.objects.select_related("seller"), pk=listing_id)
 
     if request.user.is_authenticated:
-        watchform = WatchForm({
-            "listing_id": listing.id,
-            "is_watched": listing in request.user.watchlist.all()
-        })
-        bidform = BidForm({
-            "user": request.user,
-            "listing": listing
-        })
-        commentform = NewCommentForm({
-            "author": request.user,
-            "listing": listing
-        })
-        return render(request, "auctions/listing.html", {
-            "listing": listing,
-            "seller": User.objects.get(pk=listing.seller.id),
-            "watchform": watchform,
-            "bidform": bidform,
-            "commentform": commentform,
-            "comments": Comment.objects.filter(listing=listing)
-        })
+        return render(request, "auctions/listing.html", listingContext(
+            listing, version, **listingForms(request, listing),
+        ))
+
+    return render(request, "auctions/listing.html", listingContext(listing, version))
 
-    return render(request, "auctions/listing.html", {
+def getListing(request, listing_id):
+    # read the version before the data so a concurrent write can only
+    # retire what is cached here, never hide behind it
+    version = listing_version(listing_id)
+    if request.user.is_authenticated:
+        response = renderListing(request, listing_id, version)
+    else:
+        # anonymous visitors all see the same page
+        key = listing_cache_key(listing_id, "page", version)
+        response = cache.get(key)
+        if response is None:
+            response = renderListing(request, listing_id, version)
+            # the whole response, so its headers come back with the page;
+            # it is stored before the middleware adds per request headers
+            cache.set(key, response, listing_cache_timeout())
+    # buffered, so a view costs no write; counted only once the listing
+    # was found, so made up ids never reach the buffer
+    count_view(listing_id)
+    return response
+
+def listingEvents(request, listing_id):
+    '''
+    Under ASGI this path is streamed by auctions.live. Served by Django
+    there is nothing to stream; 204 tells EventSource not to reconnect,
+    so the page just stays as rendered instead of polling.
+    '''
+    return HttpResponse(status=204)
+
+def bidHistory(request, listing_id):
+    listing = get_object_or_404(
+        Listing.objects.only("id", "title", "starting_bid", "current_bid", "bid_count", "last_bid_at"),
+        pk=listing_id,
+    )
+    bids = (
+        Bid.objects.filter(listing_id=listing.id)
+        .select_related("user")
+        .only("id", "amount", "placed", "automatic", "user", "user__username")
+    )
+    try:
+        page = keyset_paginate(bids, BID_HISTORY_ORDERING, request.GET.get("cursor"), BIDS_PER_PAGE)
+    except InvalidCursor:
+        return HttpResponseBadRequest("Invalid cursor.")
+
+    response = render(request, "auctions/bidHistory.html", {
         "listing": listing,
-        "category": listing.category,
-        "seller": User.objects.get(pk=listing.seller.id),
-        "comments": Comment.objects.filter(listing=listing)
+        "bids": page,
+        "next_cursor": page.next_cursor,
+    })
+    if page.has_next:
+        response["Link"] = f'<{reverse("bidHistory", args=[listing.id])}?cursor={page.next_cursor}>; rel="next"'
+    return response
+
+def listingComments(request, listing_id):
+    '''
+    the next page of comments as an HTML fragment, for "load more"
+    '''
+    try:
+        page = commentPage(listing_id, request.GET.get("cursor"))
+    except InvalidCursor:
+        return HttpResponseBadRequest("Invalid cursor.")
+    return render(request, "auctions/commentPage.html", {
+        "comments": page,
+        "listing_id": listing_id,
+        "more": True,
     })
 
+def redirectToListing(listing_id):
+    return HttpResponseRedirect(reverse("listing", args=[listing_id]))
+
 def category(request, category_name=None):
     if category_name:
-        # display the list of all listings in that category
-        listings = Listing.objects.filter(category=category_name)
+        if category_name not in Listing.Category.values:
+            raise Http404("No such category.")
+        form = ListingFilterForm(request.GET)
+        if not form.is_valid():
+            return HttpResponseBadRequest("Invalid filter.")
+        # display the active listings in that category
+        listings = Listing.objects.filter(category=category_name, active=True).only(*CARD_FIELDS)
+        try:
+            page, next_query = listingPage(request, listings, form)
+        except InvalidCursor:
+            return HttpResponseBadRequest("Invalid cursor.")
         return render(request, "auctions/category.html", {
-            "category": category_name,
-            "listings": listings
+            "category": Listing.Category(category_name).label,
+            "category_name": category_name,
+            "form": form,
+            "cards": render_cards(page),
+            "next_query": next_query,
         })
     # display the list of all categories
-    categories = [value.label for name, value in vars(Listing.Category).items() if name.isupper()]
+    counts = category_counts()
+    categories = [(value, label, counts[value]) for value, label in Listing.Category.choices]
     return render(request, "auctions/category.html", {
         "categories": categories
     })
 
+def search(request):
+    form = SearchForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest("Invalid search.")
+
+    category = form.cleaned_data["category"] or None
+    active = SearchForm.STATUS[form.cleaned_data["status"] or "active"]
+    sort = form.cleaned_data["sort"] or "relevance"
+    next_page = None
+    if sort != "relevance":
+        condition = matching(form.cleaned_data["q"])
+        results = []
+        if condition is not None:
+            listings = Listing.objects.filter(condition).only(*CARD_FIELDS)
+            if category:
+                listings = listings.filter(category=category)
+            if active is not None:
+                listings = listings.filter(active=active)
+            try:
+                results, next_page = listingPage(request, listings, form)
+            except InvalidCursor:
+                return HttpResponseBadRequest("Invalid cursor.")
+    else:
+        page = form.cleaned_data["page"] or 1
+        results = search_listings(
+            form.cleaned_data["q"],
+            CARD_FIELDS,
+            category=category,
+            active=active,
+            min_price=form.cleaned_data["min_price"],
+            max_price=form.cleaned_data["max_price"],
+            limit=LISTINGS_PER_PAGE + 1,
+            offset=(page - 1) * LISTINGS_PER_PAGE,
+        )
+        if len(results) > LISTINGS_PER_PAGE:
+            results = results[:LISTINGS_PER_PAGE]
+            query = request.GET.copy()
+            query["page"] = page + 1
+            next_page = query.urlencode()
+
+    return render(request, "auctions/search.html", {
+        "form": form,
+        "query": form.cleaned_data["q"],
+        "cards": render_cards(results),
+        "next_page": next_page,
+    })
+
 @login_required
+@throttle_writes("watchListing", listing_field="listing_id")
 def watchListing(request):
     if request.method == "POST":
         form = WatchForm(request.POST)
         if form.is_valid():
-            # Get the Listing
             listing_id = form.cleaned_data["listing_id"]
-            listing = Listing.objects.get(pk=listing_id)
-            # Get the User
-            user = request.user
-            if form.cleaned_data["is_watched"]:
-                user.watchlist.remove(listing)
-            else:
-                user.watchlist.add(listing)
-
-            return getListing(request, listing_id)
+            # the form carries the current state, so toggling needs no
+            # lookup of the listing or the rest of the watchlist
+            watched = not form.cleaned_data["is_watched"]
+            try:
+                set_watching(request.user, listing_id, watched)
+            except IntegrityError:
+                raise Http404("No such listing.")
+
+            if request.headers.get("Accept", "").startswith("application/json"):
+                return JsonResponse({"listing_id": listing_id, "is_watched": watched})
+            return redirectToListing(listing_id)
+        return HttpResponseBadRequest("Invalid listing.")
 
 @login_required
+@throttle_writes("bid", listing_field="listing")
 def bid(request):
     '''
-    create a new Bid instance for the current User and Listing
+    bid up to a maximum for the current User on a Listing
     '''
     if request.method == "POST":
+        # checked first, the form would look up an id of any size
+        listing_id = parse_id(request.POST.get("listing"))
+        if listing_id is None:
+            raise Http404("No such listing.")
         bidform = BidForm(request.POST)
         if bidform.is_valid():
-            # Create a new Bid from the form
-            newBid = bidform.save()
-            # make User highest_bid of the Listing
-            listing = newBid.listing
-            listing.current_bid = bidform.cleaned_data["amount"]
-            listing.highest_bidder = request.user
-            listing.save()
-            return getListing(request, listing.id)
-
-        listing = Listing.objects.get(id=bidform.data["listing"])
-        watchform = WatchForm({
-            "listing_id": listing.id,
-            "is_watched": listing in request.user.watchlist.all()
-        })
-
-        return render(request, "auctions/listing.html", {
-            "listing": listing,
-            "seller": User.objects.get(pk=listing.seller.id),
-            "watchform": watchform,
-            "bidform": bidform
-        })   
+            listing_id = bidform.cleaned_data["listing"].id
+            try:
+                outcome = place_bid(listing_id, request.user, bidform.cleaned_data["amount"])
+                if outcome.leading:
+                    return redirectToListing(listing_id)
+                bidform.add_error(None, f"Another bidder's maximum is higher, the price is now {outcome.price} SEK.")
+            except BidRejected as e:
+                bidform.add_error(None, str(e))
+
+        listing = get_object_or_404(Listing.objects.select_related("seller"), id=listing_id)
+        return render(request, "auctions/listing.html", listingContext(
+            listing, listing_version(listing.id), **listingForms(request, listing, bidform=bidform),
+        ))
 
 @login_required
 def myWatchList(request):
-    watchlist = request.user.watchlist.all()
+    watches = watched_listings(request.user, CARD_FIELDS)
+    try:
+        page = keyset_paginate(watches, ("-id",), request.GET.get("cursor"), LISTINGS_PER_PAGE)
+    except InvalidCursor:
+        return HttpResponseBadRequest("Invalid cursor.")
+
     return render(request, "auctions/myWatchList.html", {
-        "watchlist": watchlist
+        "cards": render_cards([watch.listing for watch in page], starting_price=True),
+        "next_cursor": page.next_cursor,
     })
 
 @login_required
+@throttle_writes("closeBid", listing_field="listing")
 def closeBid(request):
+    '''
+    settle the signed in seller's listing
+    '''
     if request.method == "POST":
         form = CloseBidForm(request.POST)
-        
-        if form.is_valid():
-            listing = Listing.objects.get(title=form.cleaned_data["listing"])
-            if request.user == listing.seller:
-                listing.active = False
-                listing.save()
- 
-        return getListing(request, listing.id)
+        if not form.is_valid():
+            return HttpResponseBadRequest("Invalid listing.")
+
+        listing_id = form.cleaned_data["listing"]
+        settled = settle_listings([listing_id], seller=request.user)
+        # someone else's listing or one already closed just shows the listing
+        if not settled and not Listing.objects.filter(pk=listing_id).exists():
+            raise Http404("No such listing.")
+        return redirectToListing(listing_id)
 
 @login_required
+def notifications(request):
+    '''
+    the signed in user's notifications, newest first; showing them marks
+    them read
+    '''
+    notes = (
+        Notification.objects.filter(user_id=request.user.pk)
+        .select_related("listing")
+        .only("id", "kind", "created", "read", "listing__id", "listing__title", "listing__final_price")
+    )
+    try:
+        page = keyset_paginate(notes, ("-id",), request.GET.get("cursor"), NOTIFICATIONS_PER_PAGE)
+    except InvalidCursor:
+        return HttpResponseBadRequest("Invalid cursor.")
+
+    context = {
+        "notifications": page,
+        "next_cursor": page.next_cursor,
+    }
+    # the page keeps its unread flags for display; notifications on later
+    # pages, or written since, stay unread
+    unread = [note.id for note in page if not note.read]
+    if unread:
+        mark_read(request.user, unread)
+        if not page.has_next:
+            # every notification was on the page, the badge need not count
+            context["unread_notifications"] = 0
+    return render(request, "auctions/notifications.html", context)
+
+@login_required
+@throttle_writes("newComment", listing_field="listing")
 def newComment(request):
-    if request.method == "POST":
-        request.POST._mutable = True
-        request.POST["datetime"] = timezone.now()
-        request.POST["author"] = request.user
-        form = NewCommentForm(request.POST)
+    if request.method != "POST":
+        return HttpResponseRedirect(reverse("index"))
+    # checked first, the form would look up an id of any size
+    listing_id = parse_id(request.POST.get("listing"))
+    if listing_id is None:
+        raise Http404("No such listing.")
+    request.POST._mutable = True
+    request.POST["datetime"] = timezone.now()
+    request.POST["author"] = request.user
+    form = NewCommentForm(request.POST)
+
+    if form.is_valid():
+        form.save()
+        return redirectToListing(listing_id)
+
+    listing = get_object_or_404(Listing.objects.select_related("seller"), id=listing_id)
+    return render(request, "auctions/listing.html", listingContext(
+        listing, listing_version(listing.id), **listingForms(request, listing, commentform=form),
+    ))
 
-        if form.is_valid():
-            form.save()
-            listing = Listing.objects.get(title=form.cleaned_data["listing"])
-            return getListing(request, listing.id)
-        
 def login_view(request):
     if request.method == "POST":
 
@@ -285,3 +628,20 @@ def register(request):
         return HttpResponseRedirect(reverse("index"))
     else:
         return render(request, "auctions/register.html")
+
+def metrics(request):
+    '''
+    Prometheus scrape endpoint, only for addresses in INTERNAL_IPS
+    '''
+    if request.META.get("REMOTE_ADDR") not in settings.INTERNAL_IPS:
+        return HttpResponseForbidden()
+    return HttpResponse(metrics_registry.render(), content_type=metrics_registry.CONTENT_TYPE)
+
+def media(request, path):
+    '''
+    uploaded images and thumbnails; their names are content hashes, so
+    browsers may keep them forever
+    '''
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
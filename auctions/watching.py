@@ -0,0 +1,69 @@
+'''
+watchlist lookups
+
+The watchlist is read through its through table, whose unique
+(user, listing) index answers "is this listing watched?" with a single
+index probe instead of loading the user's whole watchlist.
+'''
+
+from django.db import connections, router
+from django.db.models import BooleanField, Exists, OuterRef, Value
+
+from .counters import count_watchers
+from .models import User
+
+Watch = User.watchlist.through
+
+
+def is_watching(user, listing_id):
+    if not user.is_authenticated:
+        return False
+    return Watch.objects.filter(user_id=user.pk, listing_id=listing_id).exists()
+
+
+def annotate_watched(listings, user):
+    '''
+    Annotate each listing of a queryset with ``is_watched`` for ``user``,
+    evaluated by the database in the same query.
+    '''
+    if not user.is_authenticated:
+        return listings.annotate(is_watched=Value(False, output_field=BooleanField()))
+    return listings.annotate(is_watched=Exists(
+        Watch.objects.filter(user_id=user.pk, listing_id=OuterRef("pk"))
+    ))
+
+
+def set_watching(user, listing_id, watched):
+    '''
+    Watch or stop watching, with one statement either way. Only an actual
+    change is counted towards the listing's watcher_count.
+    '''
+    if watched:
+        connection = connections[router.db_for_write(Watch)]
+        qn = connection.ops.quote_name
+        # the unique (user, listing) index turns watching twice into a no-op
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"{connection.ops.insert_statement(ignore_conflicts=True)} {qn(Watch._meta.db_table)} "
+                f"({qn('user_id')}, {qn('listing_id')}) VALUES (%s, %s) "
+                f"{connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}",
+                [user.pk, listing_id],
+            )
+            changed = cursor.rowcount
+    else:
+        changed, _ = Watch.objects.filter(user_id=user.pk, listing_id=listing_id).delete()
+    if changed:
+        count_watchers(listing_id, 1 if watched else -1)
+
+
+def watched_listings(user, fields):
+    '''
+    the user's watch rows, newest first, each joined to its listing so a
+    page of them loads in one query
+    '''
+    return (
+        Watch.objects
+        .filter(user_id=user.pk)
+        .select_related("listing")
+        .only("id", "listing", *(f"listing__{name}" for name in fields))
+    )
@@ -2,15 +2,32 @@
 ASGI config for commerce project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Live listing updates are streamed by ``auctions.live`` directly, everything
+else is handled by Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 """
 
 import os
+import re
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'commerce.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from auctions import live  # noqa: E402  (needs the app registry)
+from auctions.ids import parse_id  # noqa: E402
+
+LISTING_EVENTS = re.compile(r"^/auction/(\d+)/events$")
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "http":
+        match = LISTING_EVENTS.match(scope["path"])
+        # an id out of range falls through to Django, which answers 404
+        if match and parse_id(match.group(1)):
+            return await live.events(scope, receive, send, int(match.group(1)))
+    return await django_application(scope, receive, send)
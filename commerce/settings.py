@@ -31,7 +31,7 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
-    'auctions',
+    'auctions.apps.AuctionsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -41,7 +41,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'auctions.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'auctions.middleware.StaticFilesMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -52,6 +54,10 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'commerce.urls'
 
+# With DEBUG off Django wraps the loaders in the cached loader, so every
+# template is compiled once per process. Leave 'loaders' unset to keep
+# that; listing cards are cached as rendered markup on top of it (see
+# auctions/cards.py).
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -63,6 +69,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'auctions.context_processors.notifications',
             ],
         },
     },
@@ -74,15 +81,154 @@ WSGI_APPLICATION = 'commerce.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
+# WAL lets readers and the writer work at the same time; synchronous
+# NORMAL is durable in WAL mode except for the last commits on power loss.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 268435456,
+    'temp_store': 'memory',
+}
+
+# 'replica' is a read-only connection to the same file; the router sends
+# reads made outside a transaction there. Connections are kept open for
+# CONN_MAX_AGE seconds instead of being reopened on every request.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'auctions.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+        },
+    },
+    'replica': {
+        'ENGINE': 'auctions.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 60,
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+            'read_only': True,
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+# The bench_* management commands write (and delete) rows, so they refuse
+# to run unless these settings point at a scratch copy of the database and
+# say so here, or they are given --yes.
+SCRATCH_DATABASE = False
+
+DATABASE_ROUTERS = ['auctions.routers.ReadWriteRouter']
+READ_DATABASE = 'replica'
+
 AUTH_USER_MODEL = 'auctions.User'
 
+# Sessions are read from the cache and written through to the database;
+# the user row is cached too (see auctions/backends/auth.py).
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'sessions'
+AUTHENTICATION_BACKENDS = ['auctions.backends.auth.CachedModelBackend']
+USER_CACHE_TIMEOUT = 300
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.0/topics/cache/
+# The local-memory cache is per process; run several workers against a
+# shared backend (memcached, redis) so listing versions are seen by all.
+# `manage.py check --deploy` warns (auctions.W001, W002) while they aren't.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # sessions and signed in users, kept apart so rendered pages can't
+    # evict them. Use a shared cache (memcached, redis) when running more
+    # than one process, or a logout, password change or deactivation is
+    # only seen by the process serving it; check --deploy warns.
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        },
+    },
+    # rate limit buckets. Local memory keeps a set of buckets per process,
+    # so N processes let through N times the configured rates; point this
+    # at the shared cache too when running more than one.
+    'ratelimit': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'ratelimit',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+# Seconds a rendered listing page or fragment is kept. Writes retire
+# cached copies immediately by bumping the listing version.
+LISTING_CACHE_TIMEOUT = 300
+
+# Seconds the per-category listing counts are trusted before recounting.
+CATEGORY_COUNTS_TIMEOUT = 300
+
+# Seconds a user's unread notification count is cached. Settling an
+# auction drops the counts of everyone it notifies.
+NOTIFICATION_COUNT_TIMEOUT = 300
+
+
+# Seconds listing view and watcher counts are buffered in each process
+# before being written (see auctions/counters.py); None writes them only
+# when auctions.counters.listing_counters.flush() is called.
+COUNTER_FLUSH_INTERVAL = 5.0
+
+
+# Write admission (see auctions/throttling.py)
+# Write views answer 429 at once rather than queue for the database when
+# all WRITE_CONCURRENCY slots of the process are taken (None: no cap), or
+# when a token bucket in RATE_LIMITS is empty. Buckets hold "burst"
+# requests and refill at "rate" per second, per user and per listing.
+
+WRITE_CONCURRENCY = 8
+RATE_LIMIT_CACHE = 'ratelimit'
+RATE_LIMITS = {
+    'bid': {
+        'user': {'rate': 1.0, 'burst': 5},
+        'listing': {'rate': 20.0, 'burst': 40},
+    },
+    'newComment': {
+        'user': {'rate': 0.2, 'burst': 3},
+        'listing': {'rate': 5.0, 'burst': 20},
+    },
+    'newListing': {
+        'user': {'rate': 0.05, 'burst': 5},
+    },
+}
+
+
+# Live listing updates (served under ASGI, see commerce/asgi.py)
+# InMemoryBroker only sees bids placed in the same process. Use
+# auctions.live.PollingBroker when writes are served by other processes.
+
+LIVE_BROKER = 'auctions.live.InMemoryBroker'
+LIVE_POLL_INTERVAL = 1.0
+LIVE_HEARTBEAT = 15.0
+
+# Request metrics (see auctions/middleware.py)
+# /metrics is served to INTERNAL_IPS only. Queries taking longer than
+# SLOW_QUERY_THRESHOLD seconds are logged to the auctions.sql logger.
+
+INTERNAL_IPS = ['127.0.0.1']
+SLOW_QUERY_THRESHOLD = 0.1
+SERVER_TIMING = True
+
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
 
@@ -120,3 +266,28 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# hashed names plus gzip/brotli copies, written by collectstatic and served
+# by auctions.middleware.StaticFilesMiddleware (see auctions/storage.py)
+STATICFILES_STORAGE = 'auctions.storage.CompressedManifestStaticFilesStorage'
+
+# Uploaded listing images and their thumbnails (see auctions/images.py)
+# Django serves MEDIA_URL only while DEBUG is on; in production point the
+# web server at MEDIA_ROOT, with a far-future Cache-Control since the file
+# names are content hashes.
+
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_URL = '/media/'
+MAX_IMAGE_UPLOAD_SIZE = 5 * 1024 * 1024
+# processes make_thumbnails renders with; None means one per CPU
+THUMBNAIL_WORKERS = None
+
+# Background jobs (see auctions/jobs.py), run by manage.py run_workers
+# A claimed job not finished within JOB_LEASE seconds is run again. Failed
+# jobs are retried after JOB_BACKOFF seconds, doubling up to
+# JOB_BACKOFF_MAX, until they have been tried JOB_MAX_ATTEMPTS times.
+
+JOB_LEASE = 300
+JOB_MAX_ATTEMPTS = 5
+JOB_BACKOFF = 2.0
+JOB_BACKOFF_MAX = 600